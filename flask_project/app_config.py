@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 # import SECRET_KEY into current namespace
 # noinspection PyUnresolvedReferences
@@ -10,6 +11,11 @@ try:
     DATA_FOLDER = os.environ['DATA_FOLDER']
 except KeyError:
     DATA_FOLDER = '/home/web/field-campaigner-data'
+try:
+    CACHE_FOLDER = os.environ['CACHE_FOLDER']
+except KeyError:
+    CACHE_FOLDER = os.path.join(
+        tempfile.gettempdir(), 'field-campaigner-cache')
 
 
 class Config(object):
@@ -28,6 +34,27 @@ class Config(object):
     # CAMPAIGN DATA
     campaigner_data_folder = DATA_FOLDER
 
+    # Derived data that can be rebuilt from campaign data,
+    # kept out of the git tracked data folder
+    campaigner_cache_folder = CACHE_FOLDER
+
+    # Seconds between scans of campaign folder for changes made
+    # outside this process, e.g. by git pull
+    CAMPAIGN_CATALOG_SCAN_INTERVAL = 2
+
+    # SQLite catalog of campaign metadata used by listing and nearest
+    # queries, rebuilt from campaign data. None to query in memory.
+    CAMPAIGN_METADATA_DATABASE = os.path.join(
+        CACHE_FOLDER, 'campaign_metadata.sqlite3')
+
+    # Seconds between flushes of participant counts to disk
+    PARTICIPANT_COUNT_FLUSH_INTERVAL = 30
+
+    # Saves within window (seconds) are pushed to git as one commit
+    GIT_COALESCE_WINDOW = 5
+    GIT_MAX_RETRIES = 3
+    GIT_RETRY_BACKOFF = 2
+
 
 class ProductionConfig(Config):
     """Production environment.
@@ -1,36 +1,128 @@
+from datetime import date
+import hashlib
+import json
+
 from flask_restful import Resource, Api
-from flask import request
+from flask import request, Response
 import logging
 from flask import current_app
+from werkzeug.http import quote_etag
 
 from campaign_manager import campaign_manager
-from campaign_manager.models.campaign import Campaign
+from campaign_manager.models.campaign import (
+    Campaign,
+    catalog,
+    participant_counter_store
+)
 from campaign_manager.insights_functions.mapper_engagement import \
     MapperEngagement
+from campaign_manager.git_utilities import persistence_queue
 from campaign_manager.utilities import get_coordinate_from_ip
+from reporter.overpass_endpoints import endpoint_pool
 
 api = Api(campaign_manager)
 
 
+def get_fields(args):
+    """Return campaign fields that are requested by `fields` argument.
+
+    It is comma separated names of fields, `card` is replaced by
+    fields of compact card of campaign.
+
+    :param args: arguments of request
+    :type args: dict
+
+    :return: names of fields, None if all fields are requested
+    :rtype: list
+    """
+    fields = args.get('fields')
+    if not fields:
+        return None
+    names = []
+    for name in fields.split(','):
+        name = name.strip()
+        if name == 'card':
+            names.extend(Campaign.CARD_FIELDS)
+        elif name:
+            names.append(name)
+    return names
+
+
+def campaigns_etag(*parts):
+    """Return strong ETag of campaign list of current request.
+
+    It changes when a campaign file, the current date (campaign status
+    depends on it) or a participant count changes.
+
+    :param parts: other values that response depends on
+    :type parts: list
+
+    :rtype: str
+    """
+    values = [
+        catalog.digest(),
+        date.today().isoformat(),
+        participant_counter_store.last_updated(),
+        request.full_path
+    ]
+    values.extend(parts)
+    return hashlib.sha1(json.dumps(values).encode('utf-8')).hexdigest()
+
+
+def not_modified(etag):
+    """Return 304 response if client has the response of ETag.
+
+    :param etag: ETag of response
+    :type etag: str
+
+    :return: 304 response or None if client needs the response
+    :rtype: Response
+    """
+    if etag not in request.if_none_match:
+        return None
+    return Response(status=304, headers={'ETag': quote_etag(etag)})
+
+
 class CampaignList(Resource):
     """Shows a list of all campaigns"""
 
-    def get_all_campaign(self, campaign_status, args):
+    def get_all_campaign(self, campaign_status, args={}):
         """Returns all campaign from model.
         """
         return Campaign.all(campaign_status=campaign_status, **args)
 
     def get(self, campaign_status):
         """Get all campaigns.
+
+        Page is selected with cursor, or page, and limit (or per_page)
+        arguments, cursor of next page is returned in X-Next-Cursor
+        header.
         """
         args = request.args
-        campaigns = self.get_all_campaign(campaign_status, args)
+        etag = campaigns_etag()
+        response = not_modified(etag)
+        if response:
+            return response
+        try:
+            campaigns, next_cursor = Campaign.paginate(
+                campaign_status=campaign_status,
+                sort_by=args.get('sort_by'),
+                per_page=args.get('limit', args.get('per_page')),
+                page=args.get('page'),
+                cursor=args.get('cursor'),
+                tags=args.get('tags'))
+        except ValueError as e:
+            return {'message': '%s' % e}, 400
+        fields = get_fields(args)
         campaigns_json = []
 
         for campaign in campaigns:
-            campaigns_json.append(campaign.json())
+            campaigns_json.append(campaign.json(fields))
 
-        return campaigns_json
+        headers = {'ETag': quote_etag(etag)}
+        if next_cursor:
+            headers['X-Next-Cursor'] = next_cursor
+        return campaigns_json, 200, headers
 
 
 class CampaignNearestList(Resource):
@@ -59,17 +151,22 @@ class CampaignNearestList(Resource):
             coordinate = lat + ',' + lon
         else:
             coordinate = get_coordinate_from_ip()
+        etag = campaigns_etag(coordinate)
+        response = not_modified(etag)
+        if response:
+            return response
         campaigns = self.get_nearest_campaigns(
                 coordinate,
                 campaign_status,
                 args
         )
+        fields = get_fields(args)
         campaigns_json = []
 
         for campaign in campaigns:
-            campaigns_json.append(campaign.json())
+            campaigns_json.append(campaign.json(fields))
 
-        return campaigns_json
+        return campaigns_json, 200, {'ETag': quote_etag(etag)}
 
 
 class CampaignNearestWithTagList(Resource):
@@ -84,15 +181,20 @@ class CampaignNearestWithTagList(Resource):
         :param tag: tag to filter
         :type tag: str
         """
-        campaigns = Campaign.nearest_campaigns(coordinate, **{
+        etag = campaigns_etag()
+        response = not_modified(etag)
+        if response:
+            return response
+        campaigns = Campaign.nearest_campaigns(coordinate, 'all', **{
                 'tags': tag
         })
+        fields = get_fields(request.args)
         campaigns_json = []
 
         for campaign in campaigns:
-            campaigns_json.append(campaign.json())
+            campaigns_json.append(campaign.json(fields))
 
-        return campaigns_json
+        return campaigns_json, 200, {'ETag': quote_etag(etag)}
 
 
 class CampaignTagList(Resource):
@@ -104,7 +206,7 @@ class CampaignTagList(Resource):
         :param tag: tag to filter
         :type tag: str
         """
-        return Campaign.all(**{
+        return Campaign.all('all', **{
                     'tags': tag
                 })
 
@@ -114,13 +216,18 @@ class CampaignTagList(Resource):
         :param tag: tag to filter
         :type tag: str
         """
+        etag = campaigns_etag()
+        response = not_modified(etag)
+        if response:
+            return response
         campaigns = self.get_campaigns(tag)
+        fields = get_fields(request.args)
         campaigns_json = []
 
         for campaign in campaigns:
-            campaigns_json.append(campaign.json())
+            campaigns_json.append(campaign.json(fields))
 
-        return campaigns_json
+        return campaigns_json, 200, {'ETag': quote_etag(etag)}
 
 
 class CampaignTotal(Resource):
@@ -136,8 +243,10 @@ class CampaignTotal(Resource):
         campaigns = self.get_campaigns()
         participants_total = 0
         for campaign in campaigns:
-            if campaign.total_participants_count:
-                participants_total += campaign.total_participants_count
+            participants_count_per_type, total_participants_count = \
+                campaign.get_participants_count()
+            if total_participants_count:
+                participants_total += total_participants_count
 
         return {
             'campaign_total': len(campaigns),
@@ -151,7 +260,7 @@ class CampaignContributors(Resource):
 
     def get_campaign(self, uuid):
         """Return campaign."""
-        return Campaign(uuid=uuid)
+        return Campaign.get(uuid)
 
     def get(self, uuid, feature):
         """Get total contributors."""
@@ -174,6 +283,22 @@ class CampaignContributors(Resource):
         return {'contributors_total': contributors_total}
 
 
+class OverpassEndpointStatus(Resource):
+    """Show health, latency and error rate of Overpass endpoints."""
+
+    def get(self):
+        """Get stats of endpoints."""
+        return endpoint_pool.stats()
+
+
+class GitPersistenceStatus(Resource):
+    """Show status of git persistence of campaigns."""
+
+    def get(self):
+        """Get queue depth and latency of last push."""
+        return persistence_queue.status()
+
+
 # Setup the Api resource routing here
 api.add_resource(
         CampaignList,
@@ -193,3 +318,9 @@ api.add_resource(
 api.add_resource(
         CampaignContributors,
         '/campaign/total_contributors/<string:uuid>/<string:feature>')
+api.add_resource(
+        GitPersistenceStatus,
+        '/git_persistence_status')
+api.add_resource(
+        OverpassEndpointStatus,
+        '/overpass_endpoint_status')
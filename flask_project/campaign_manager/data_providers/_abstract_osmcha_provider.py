@@ -2,9 +2,9 @@ __author__ = 'Irwan Fathurrahman <irwan@kartoza.com>'
 __date__ = '12/06/17'
 
 import json
-import requests
 from app_config import Config
 from urllib.error import HTTPError
+from reporter.http_client import http_client
 from campaign_manager.utilities import multi_feature_to_polygon
 from campaign_manager.data_providers._abstract_data_provider import (
     AbstractDataProvider
@@ -61,11 +61,11 @@ class AbstractOsmchaProvider(AbstractDataProvider):
                 'area_lt': 2,
                 'is_suspect': True
             }
-            request = requests.get(
+            request = http_client.get(
                 self.get_api_url(),
                 params=payload,
-                timeout=60,
             )
+            http_client.raise_for_status(request)
             print(request.url)
             data = request.json()
         except HTTPError as e:
@@ -1,15 +1,35 @@
 import datetime
 import json
-import hashlib
-import os
 import re
+import time
+from concurrent import futures
 
 from urllib.parse import quote
 
 from reporter import config
+from reporter import LOGGER
 from reporter.exceptions import OverpassTimeoutException
-from reporter.queries import TAG_MAPPING, OVERPASS_QUERY_MAP_POLYGON
-from reporter.utilities import split_polygon
+from reporter.overpass_cache import overpass_cache
+from reporter.osm_document_chain import OsmDocumentChain
+from reporter.overpass_tiles import (
+    polygon_from_overpass,
+    grid_tiles,
+    merge_tile_elements
+)
+from reporter.parsed_document_cache import parsed_document_cache
+from reporter.overpass_endpoints import ATTIC, CURRENT, endpoint_pool
+from reporter.overpass_query import (
+    ELEMENT_TYPES,
+    OverpassQuery,
+    feature_filters
+)
+from reporter.queries import TAG_MAPPING
+from reporter.contribution_store import contribution_store
+from reporter.utilities import (
+    split_polygon,
+    contribution_records,
+    osm_element_contributions
+)
 from campaign_manager.data_providers._abstract_data_provider import (
     AbstractDataProvider
 )
@@ -18,40 +38,27 @@ from campaign_manager.utilities import (
 )
 
 
+def parse_feature(feature):
+    """Return key and values of feature.
+
+    :param feature: feature e.g. 'building' or 'amenity=school,hospital'
+    :type feature: str
+
+    :return: key and list of values, None when feature has no values
+    :rtype: tuple
+    """
+    if '=' in feature:
+        key, values = feature.split('=', 1)
+        return key, values.split(',')
+    return feature, None
+
+
+query_executor = futures.ThreadPoolExecutor(
+    max_workers=config.OVERPASS_QUERY_WORKERS)
+
+
 class OverpassProvider(AbstractDataProvider):
     """Provider from overpass"""
-    query = (
-        '('
-        'way["%(KEY)s"]'
-        '(poly:"{polygon}");'
-        'node["%(KEY)s"]'
-        '(poly:"{polygon}");'
-        'relation["%(KEY)s"]'
-        '(poly:"{polygon}");'
-        ');'
-        '(._;>;);'
-        'out {print_mode};'
-    )
-    query_with_value = (
-        '('
-        'way["%(KEY)s"~"%(VALUE)s"]'
-        '(poly:"{polygon}");'
-        'node["%(KEY)s"~"%(VALUE)s"]'
-        '(poly:"{polygon}");'
-        'relation["%(KEY)s"~"%(VALUE)s"]'
-        '(poly:"{polygon}");'
-        ');'
-        '(._;>;);'
-        'out {print_mode};'
-    )
-
-    query_with_id = (
-        '('
-        '{element_parameters}'
-        ');'
-        '(._;>;);'
-        'out {print_mode};'
-    )
 
     def get_data(
             self,
@@ -62,13 +69,18 @@ class OverpassProvider(AbstractDataProvider):
             date_from=None,
             date_to=None,
             returns_json=True,
-            need_attic_data=False):
+            need_attic_data=False,
+            priority=0,
+            tiled=None,
+            features=None):
         """Get osm data.
 
         :param polygon: list of array describing polygon area e.g.
         '[[28.01513671875,-25.77516058680343],[28.855590820312504,-25.567220388070023],
         [29.168701171875004,-26.34265280938059]]
-        :type polygon: list
+            or polygon string that already split e.g.
+            '50.7 7.1 50.7 7.12 50.71 7.11'
+        :type polygon: list, str
 
         :param feature_key: The type of feature to extract:
             buildings, building-points, roads, potential-idp, boundary-[1,11]
@@ -93,33 +105,52 @@ class OverpassProvider(AbstractDataProvider):
         :param need_attic_data: Request need attic data
         :type need_attic_data: bool
 
+        :param priority: Priority of refreshing cached data
+        :type priority: float
+
+        :param tiled: Fetch polygon as grid tiles, default is
+            OVERPASS_TILED of config. Only json data without date range
+            is fetched as tiles.
+        :type tiled: bool
+
+        :param features: Features that are queried together instead of
+            feature key and values, e.g. ['building', 'amenity=school']
+        :type features: list
+
         :raises: OverpassTimeoutException
 
         :returns: A dict from retrieved OSM dataset.
         :rtype: dict
         """
-        default_server_url = os.environ['DEFAULT_OVERPASS_URL']
-        attic_data_server_url = os.environ['ATTIC_DATA_SERVER_URL']
-
-        if need_attic_data:
-            server_url = attic_data_server_url
-        else:
-            server_url = default_server_url
+        server_url = endpoint_pool.route(
+            ATTIC if need_attic_data else CURRENT)
+
+        if tiled is None:
+            tiled = config.OVERPASS_TILED
+        if tiled and returns_json and not (date_from and date_to):
+            return self.get_tiled_data(
+                server_url,
+                polygon,
+                feature_key,
+                overpass_verbosity=overpass_verbosity,
+                feature_values=feature_values,
+                priority=priority,
+                features=features)
 
-        query = self.parse_url_parameters(
+        query = self.build_query(
                 polygon=polygon,
                 feature_key=feature_key,
                 feature_values=feature_values,
                 overpass_verbosity=overpass_verbosity,
                 response_format='json' if returns_json else 'xml',
                 date_from=date_from,
-                date_to=date_to
+                date_to=date_to,
+                features=features
         )
 
-        safe_name = hashlib.md5(query.encode('utf-8')).hexdigest() + '.osm'
-        file_path = os.path.join(config.CACHE_DIR, safe_name)
         osm_data, osm_doc_time, updating = load_osm_document_cached(
-                file_path, server_url, query, returns_json)
+                query.cache_path(), server_url, str(query), returns_json,
+                priority=priority)
 
         if returns_json:
             regex = 'runtime error:'
@@ -143,7 +174,183 @@ class OverpassProvider(AbstractDataProvider):
                 'updating_status': updating
             }
 
-    def parse_url_parameters(
+    def get_tiled_data(
+            self,
+            server_url,
+            polygon,
+            feature_key,
+            overpass_verbosity='meta',
+            feature_values=None,
+            priority=0,
+            features=None):
+        """Get osm data of polygon as grid tiles.
+
+        Tiles are fetched concurrently by the query executor and cached
+        one by one, so they are shared by campaigns that cover them.
+        Elements of tiles are clipped to polygon and deduplicated.
+
+        :param server_url: url of overpass server
+        :type server_url: str
+
+        :param polygon: polygon as in `get_data`
+        :type polygon: list, str
+
+        :param feature_key: The type of feature to extract
+        :type feature_key: str
+
+        :param overpass_verbosity: Output verbosity in Overpass.
+        :type overpass_verbosity: str
+
+        :param feature_values: The value of features as query
+        :type feature_values: list
+
+        :param priority: Priority of refreshing cached data
+        :type priority: float
+
+        :param features: Features that are queried together
+        :type features: list
+
+        :raises: OverpassTimeoutException
+
+        :returns: A dict from retrieved OSM dataset.
+        :rtype: dict
+        """
+        try:
+            shape = polygon_from_overpass(polygon)
+        except ValueError:
+            shape = polygon_from_overpass(config.POLYGON)
+
+        def load_tile(tile):
+            query = self.build_query(
+                bbox=tile,
+                feature_key=feature_key,
+                feature_values=feature_values,
+                overpass_verbosity=overpass_verbosity,
+                response_format='json',
+                features=features
+            )
+            return load_osm_document_cached(
+                query.cache_path(), server_url, str(query), True,
+                priority=priority)
+
+        tiles = list(query_executor.map(
+            load_tile, grid_tiles(shape, config.OVERPASS_TILE_SIZE)))
+
+        documents = []
+        osm_doc_time = None
+        updating = False
+        for osm_data, tile_time, tile_updating in tiles:
+            if 'remark' in osm_data and \
+                    re.search('runtime error:', osm_data['remark']):
+                raise OverpassTimeoutException
+            documents.append(osm_data['elements'])
+            if osm_doc_time is None or tile_time < osm_doc_time:
+                osm_doc_time = tile_time
+            updating = updating or tile_updating
+
+        return {
+            'features': merge_tile_elements(documents, shape),
+            'last_update': datetime.datetime.fromtimestamp(
+                    osm_doc_time or time.time()).strftime(
+                    '%Y-%m-%d %H:%M:%S'),
+            'updating_status': updating
+        }
+
+    def get_batched_data(
+            self,
+            polygon,
+            features,
+            overpass_verbosity='meta',
+            priority=0):
+        """Get osm data of several features with one query.
+
+        Features are queried as one union query that is cached once,
+        elements are then given to each feature by its tag filter.
+
+        :param polygon: polygon as in `get_data`
+        :type polygon: list, str
+
+        :param features: Features e.g. ['building', 'amenity=school']
+        :type features: list
+
+        :param overpass_verbosity: Output verbosity in Overpass.
+        :type overpass_verbosity: str
+
+        :param priority: Priority of refreshing cached data
+        :type priority: float
+
+        :raises: OverpassTimeoutException
+
+        :returns: A dict from retrieved OSM dataset, features are
+            elements per feature.
+        :rtype: dict
+        """
+        features = sorted(set(features))
+        overpass_data = self.get_data(
+            polygon,
+            feature_key=None,
+            overpass_verbosity=overpass_verbosity,
+            priority=priority,
+            features=features)
+        elements = overpass_data['features']
+        overpass_data['features'] = {
+            feature: self.filter_elements(elements, *parse_feature(feature))
+            for feature in features
+        }
+        return overpass_data
+
+    @staticmethod
+    def filter_elements(elements, feature_key, feature_values=None):
+        """Return elements that a feature query returns, elements that
+        match its tag filter with their members and nodes.
+
+        :param elements: elements of a query
+        :type elements: list
+
+        :param feature_key: Key of tag filter
+        :type feature_key: str
+
+        :param feature_values: Values of tag filter, matched as regular
+            expression like overpass does
+        :type feature_values: list
+
+        :rtype: list
+        """
+        value_regex = None
+        if feature_values:
+            value_regex = re.compile('|'.join(feature_values))
+
+        elements_by_key = {}
+        selected = set()
+        for element in elements:
+            key = (element.get('type'), element.get('id'))
+            elements_by_key[key] = element
+            tags = element.get('tags', {})
+            if feature_key in tags and (
+                    not value_regex or
+                    value_regex.search(tags[feature_key])):
+                selected.add(key)
+
+        pending = list(selected)
+        while pending:
+            element = elements_by_key.get(pending.pop())
+            if not element:
+                continue
+            members = [
+                ('node', node) for node in element.get('nodes', ())]
+            members += [
+                (member.get('type'), member.get('ref'))
+                for member in element.get('members', ())]
+            for member in members:
+                if member not in selected:
+                    selected.add(member)
+                    pending.append(member)
+
+        return [
+            element for element in elements
+            if (element.get('type'), element.get('id')) in selected]
+
+    def build_query(
             self,
             polygon=None,
             feature_key=None,
@@ -152,9 +359,13 @@ class OverpassProvider(AbstractDataProvider):
             response_format='xml',
             date_from=None,
             date_to=None,
-            element_ids=None
+            element_ids=None,
+            bbox=None,
+            features=None,
+            recurse=True,
+            augmented=False
     ):
-        """Parse Overpass query.
+        """Build Overpass query.
 
         :param polygon: list of array describing polygon area e.g.
         '[[28.01513671875,-25.77516058680343],[28.855590820312504,-25.567220388070023],
@@ -183,85 +394,324 @@ class OverpassProvider(AbstractDataProvider):
 
         :param element_ids: Ids of node,way,relation
         :type element_ids: Dict[str, list]
-        """
-        parameters = dict()
 
-        if polygon:
+        :param bbox: Bbox that is queried instead of polygon, as
+            (south, west, north, east)
+        :type bbox: tuple
+
+        :param features: Features that are queried together instead of
+            feature key and values, e.g. ['building', 'amenity=school']
+        :type features: list
+
+        :param recurse: Query members of elements of element ids too
+        :type recurse: bool
+
+        :param augmented: Query augmented diff of date range
+        :type augmented: bool
+
+        :rtype: OverpassQuery
+        """
+        if not bbox and polygon and not isinstance(polygon, str):
             try:
-                polygon_string = split_polygon(polygon)
+                polygon = split_polygon(polygon)
             except ValueError:
                 error = "Invalid area"
                 print(error)
-                polygon_string = config.POLYGON
-            parameters['polygon'] = polygon_string
-
-        if element_ids:
-            query = self.query_with_id
-            element_parameters = ''
-            if len(element_ids['node']) > 0:
-                node_parameter = 'node(id:{NODE_IDS});'
-                node_parameter = node_parameter.format(
-                    NODE_IDS=','.join(element_ids['node'])
-                )
-                element_parameters += node_parameter
-
-            if len(element_ids['way']) > 0:
-                way_parameter = 'way(id:{WAY_IDS});'
-                way_parameter = way_parameter.format(
-                    WAY_IDS=','.join(element_ids['way'])
-                )
-                element_parameters += way_parameter
-
-            if len(element_ids['relation']) > 0:
-                relation_parameter = 'relation(id:{REL_IDS});'
-                relation_parameter = relation_parameter.format(
-                    REL_IDS=','.join(element_ids['relation'])
-                )
-                element_parameters += relation_parameter
-            parameters['element_parameters'] = element_parameters
-
-        elif feature_values:
-            query = self.query_with_value % {
-                'KEY': feature_key,
-                'VALUE': '|'.join(feature_values)
-            }
-        else:
-            query = self.query % {
-                'KEY': feature_key
-            }
+                polygon = config.POLYGON
+        parameters = dict(
+            polygon=None if bbox else polygon,
+            bbox=bbox,
+            date_from=date_from,
+            date_to=date_to,
+            augmented=augmented,
+            verbosity=overpass_verbosity,
+            response_format=response_format
+        )
+
+        if element_ids is not None:
+            return OverpassQuery(
+                element_ids=element_ids, recurse=recurse, **parameters)
+        if features:
+            selectors = [
+                (element_type, feature_filters(*parse_feature(feature)))
+                for feature in features
+                for element_type in ELEMENT_TYPES
+            ]
+            return OverpassQuery(selectors, **parameters)
+        return OverpassQuery.feature(
+            feature_key, feature_values, **parameters)
+
+    def parse_url_parameters(self, **kwargs):
+        """Parse Overpass query, see `build_query` for arguments.
+
+        :return: canonical Overpass QL
+        :rtype: str
+        """
+        return str(self.build_query(**kwargs))
+
+    def get_current_element_ids(
+            self,
+            server_url,
+            polygon,
+            feature_key,
+            overpass_verbosity='meta',
+            feature_values=None,
+            priority=0):
+        """Get ids of current elements of feature in polygon.
+
+        :param server_url: url of overpass server
+        :type server_url: str
 
-        parameters['print_mode'] = overpass_verbosity
-        query = query.format(**parameters)
+        :param polygon: polygon as in `get_data`
+        :type polygon: list, str
 
-        if date_from and date_to:
+        :param feature_key: The type of feature to extract
+        :type feature_key: str
+
+        :param overpass_verbosity: Output verbosity in Overpass.
+        :type overpass_verbosity: str
+
+        :param feature_values: The value of features as query
+        :type feature_values: list
+
+        :param priority: Priority of refreshing cached data
+        :type priority: float
+
+        :returns: Ids of node,way,relation, None when there is no data
+        :rtype: Dict[str, list]
+        """
+        query = self.build_query(
+                polygon=polygon,
+                feature_key=feature_key,
+                feature_values=feature_values,
+                overpass_verbosity=overpass_verbosity,
+                response_format='json'
+        )
+        file_path = query.cache_path()
+        osm_data = None
+
+        if overpass_cache.get(file_path):
             try:
-                datetime_from = datetime.datetime.utcfromtimestamp(
-                        float(date_from) / 1000.)
-                datetime_to = datetime.datetime.utcfromtimestamp(
-                        float(date_to) / 1000.)
-                date_format = "%Y-%m-%dT%H:%M:%S.%fZ"
-                diff_query = '[diff:"{date_from}", "{date_to}"];'.format(
-                        date_from=datetime_from.strftime(date_format),
-                        date_to=datetime_to.strftime(date_format)
-                )
-                query = diff_query + query
-            except ValueError as e:
-                print(e)
+                osm_data = parsed_document_cache.load(file_path)
+            except (OSError, EOFError, ValueError):
                 pass
 
-        if response_format == 'json':
-            query = '[out:json];' + query
+        if not osm_data:
+            osm_data, osm_doc_time, updating = load_osm_document_cached(
+                    file_path, server_url, str(query), True,
+                    priority=priority)
+
+        if not osm_data:
+            return None
+        element_ids = {
+            'node': [],
+            'way': [],
+            'relation': []
+        }
+        for element in osm_data['elements']:
+            try:
+                element_ids[element['type']].append(str(element['id']))
+            except ValueError:
+                pass
+        return element_ids
+
+    def get_element_attic_data(
+            self,
+            server_url,
+            element_ids,
+            date_from=None,
+            date_to=None,
+            priority=0,
+            augmented=False):
+        """Get attic xml of elements by their ids.
+
+        Ids are queried in chunks of OVERPASS_ATTIC_CHUNK_SIZE that are
+        fetched concurrently and cached one by one. Every chunk recurses
+        to members of its elements like one query of all ids would, so
+        attic nodes and members that do not exist today are included.
+        Documents of chunks are read in order as one document, members
+        that chunks share are in it more than once.
+
+        :param server_url: url of overpass server
+        :type server_url: str
+
+        :param element_ids: Ids of node,way,relation
+        :type element_ids: Dict[str, list]
+
+        :param date_from: First date for date range.
+        :type date_from: str
+
+        :param date_to: Second date for date range.
+        :type date_to: str
+
+        :param priority: Priority of refreshing cached data
+        :type priority: float
+
+        :param augmented: Query augmented diff of date range
+        :type augmented: bool
+
+        :returns: xml stream or None when it is not fetched yet,
+            last update time and updating status
+        :rtype: tuple
+        """
+        ids = [
+            (element_type, element_id)
+            for element_type in ('node', 'way', 'relation')
+            for element_id in element_ids[element_type]
+        ]
+        chunk_size = config.OVERPASS_ATTIC_CHUNK_SIZE
+        chunks = []
+        for index in range(0, len(ids), chunk_size):
+            chunk = {'node': [], 'way': [], 'relation': []}
+            for element_type, element_id in ids[index:index + chunk_size]:
+                chunk[element_type].append(element_id)
+            chunks.append(chunk)
+        if not chunks:
+            chunks.append(element_ids)
+
+        def load_chunk(chunk):
+            query = self.build_query(
+                date_from=date_from,
+                date_to=date_to,
+                element_ids=chunk,
+                recurse=True,
+                augmented=augmented
+            )
+            return load_osm_document_cached(
+                query.cache_path(), server_url, str(query), False,
+                priority=priority)
+
+        if len(chunks) == 1:
+            return load_chunk(chunks[0])
+
+        results = list(query_executor.map(load_chunk, chunks))
+        streams = [osm_data for osm_data, _, _ in results if osm_data]
+        osm_doc_time = min(
+            [doc_time for _, doc_time, _ in results] or [time.time()])
+        updating = any(updating for _, _, updating in results)
+        if len(streams) < len(results):
+            for stream in streams:
+                stream.close()
+            return None, osm_doc_time, True
+        return OsmDocumentChain(streams), osm_doc_time, updating
+
+    def get_attic_contributions(
+            self,
+            state_key,
+            polygon,
+            feature_key,
+            tag_name,
+            overpass_verbosity='meta',
+            feature_values=None,
+            date_from=None,
+            date_to=None,
+            priority=0):
+        """Get contributions of users to feature with incremental updates.
+
+        The first call merges a diff of the whole date range into the
+        contribution store. Later calls fetch an augmented diff from the
+        high-water time of the store up to now, at most once per
+        OVERPASS_CACHE_TTL, and merge it, so only new edits are queried.
+
+        :param state_key: Key of contributions, e.g. campaign and feature
+        :type state_key: str
+
+        :param polygon: polygon as in `get_data`
+        :type polygon: list, str
+
+        :param feature_key: The type of feature to extract
+        :type feature_key: str
+
+        :param tag_name: The tag name that counted objects have
+        :type tag_name: str
+
+        :param overpass_verbosity: Output verbosity in Overpass.
+        :type overpass_verbosity: str
 
-        return query
+        :param feature_values: The value of features as query
+        :type feature_values: list
+
+        :param date_from: First date for date range, in milliseconds.
+        :type date_from: str
+
+        :param date_to: Second date for date range, in milliseconds.
+        :type date_to: str
+
+        :param priority: Priority of refreshing cached data
+        :type priority: float
+
+        :raises: OverpassTimeoutException
+
+        :returns: A dict of sorted user list, last update and updating
+            status, None when there is no data.
+        :rtype: dict
+        """
+        server_url = endpoint_pool.route(ATTIC)
+        key = '%s|%s|%s|%s' % (state_key, tag_name, date_from, date_to)
+        state = contribution_store.state(key)
+        now = time.time()
+        date_end = float(date_to)
+        if state is None:
+            start = float(date_from)
+        else:
+            start = state[0]
+        end = min(now // 60 * 60 * 1000, date_end)
+        updating = False
+
+        if state is None or (
+                start < end and
+                now - state[1] >= config.OVERPASS_CACHE_TTL):
+            element_ids = self.get_current_element_ids(
+                server_url,
+                polygon,
+                feature_key,
+                overpass_verbosity=overpass_verbosity,
+                feature_values=feature_values,
+                priority=priority)
+            if element_ids is None:
+                return None
+            osm_data, osm_doc_time, updating = self.get_element_attic_data(
+                server_url,
+                element_ids,
+                date_from=str(start),
+                date_to=str(end if state else date_end),
+                priority=priority,
+                augmented=state is not None)
+            if osm_data is not None:
+                try:
+                    elements, osm_base = osm_element_contributions(
+                        osm_data, tag_name, float(date_from), date_end)
+                finally:
+                    osm_data.close()
+                high_water = min(osm_base or osm_doc_time * 1000, end)
+                contribution_store.merge(
+                    key, elements, max(high_water, start), element_ids)
+                state = contribution_store.state(key)
+            elif state is None:
+                return {
+                    'user_list': [],
+                    'last_update': None,
+                    'updating_status': True
+                }
+
+        return {
+            'user_list': contribution_records(
+                *contribution_store.counts(key)),
+            'last_update': datetime.datetime.fromtimestamp(
+                    state[1]).strftime(
+                    '%Y-%m-%d %H:%M:%S'),
+            'updating_status': updating
+        }
 
     def get_attic_data(
-        self,
-        polygon,
-        feature_key,
-        overpass_verbosity='meta',
-        feature_values=None,
-        date_from=None,
-        date_to=None):
+            self,
+            polygon,
+            feature_key,
+            overpass_verbosity='meta',
+            feature_values=None,
+            date_from=None,
+            date_to=None,
+            priority=0):
         """Get osm data.
 
         :param polygon: list of array describing polygon area e.g.
@@ -286,61 +736,32 @@ class OverpassProvider(AbstractDataProvider):
         :param date_to: Second date for date range.
         :type date_to: str
 
+        :param priority: Priority of refreshing cached data
+        :type priority: float
+
         :raises: OverpassTimeoutException
 
         :returns: A dict from retrieved OSM dataset.
         :rtype: dict
         """
 
-        server_url = os.environ['ATTIC_DATA_SERVER_URL']
-
-        query = self.parse_url_parameters(
-                polygon=polygon,
-                feature_key=feature_key,
-                feature_values=feature_values,
-                overpass_verbosity=overpass_verbosity,
-                response_format='json'
-        )
-
-        safe_name = hashlib.md5(query.encode('utf-8')).hexdigest() + '.osm'
-        file_path = os.path.join(config.CACHE_DIR, safe_name)
-        osm_data = None
-
-        if os.path.exists(file_path):
-            file_handle = open(file_path, 'rb')
-            try:
-                osm_data = json.loads(file_handle.read().decode('utf-8'))
-            except ValueError:
-                pass
-
-        if not osm_data:
-            safe_name = hashlib.md5(query.encode('utf-8')).hexdigest() + '.osm'
-            file_path = os.path.join(config.CACHE_DIR, safe_name)
-            osm_data, osm_doc_time, updating = load_osm_document_cached(
-                    file_path, server_url, query, True)
-
-        if osm_data:
-            element_ids = {
-                'node': [],
-                'way': [],
-                'relation': []
-            }
-            for element in osm_data['elements']:
-                try:
-                    element_ids[element['type']].append(str(element['id']))
-                except ValueError:
-                    pass
-            element_query = self.parse_url_parameters(
+        server_url = endpoint_pool.route(ATTIC)
+        element_ids = self.get_current_element_ids(
+            server_url,
+            polygon,
+            feature_key,
+            overpass_verbosity=overpass_verbosity,
+            feature_values=feature_values,
+            priority=priority)
+
+        if element_ids is not None:
+            LOGGER.debug('Query attic data from %s' % server_url)
+            osm_data, osm_doc_time, updating = self.get_element_attic_data(
+                server_url,
+                element_ids,
                 date_from=date_from,
                 date_to=date_to,
-                element_ids=element_ids
-            )
-            safe_name = hashlib.md5(
-                    element_query.encode('utf-8')).hexdigest() + '.osm'
-            file_path = os.path.join(config.CACHE_DIR, safe_name)
-            print('Query attic data')
-            osm_data, osm_doc_time, updating = load_osm_document_cached(
-                    file_path, server_url, element_query, False)
+                priority=priority)
 
             return {
                 'file': osm_data,
@@ -1,8 +1,7 @@
-from urllib.request import urlopen
 # noinspection PyPep8Naming
 from urllib.error import HTTPError
-from urllib.request import Request
 from reporter import LOGGER
+from reporter.http_client import http_client
 
 
 class TaskingManagerProvider(object):
@@ -50,11 +49,10 @@ class TaskingManagerProvider(object):
         return self.request_data(url_request)
 
     def request_data(self, url_request):
-        web_request = Request(url_request, None, self.headers)
         try:
-            url_handle = urlopen(web_request, timeout=60)
-            data = url_handle.read().decode('utf-8')
-            return data
+            response = http_client.get(url_request, headers=self.headers)
+            http_client.raise_for_status(response)
+            return response.text
         except HTTPError as e:
             LOGGER.exception('Error with request')
             return e.msg
@@ -1,35 +1,74 @@
 __author__ = 'Irwan Fathurrahman <irwan@kartoza.com>'
 __date__ = '16/05/17'
 
-import datetime
 import os
 import subprocess
-from subprocess import call
+import threading
+import time
 from app_config import Config
+from campaign_manager.utilities import TEMPORARY_FILE_SUFFIX
+from reporter import LOGGER
 
 file_path = os.path.dirname(os.path.abspath(__file__))
-git_folder = Config.campaigner_data_folder
+
+
+class GitCommandError(Exception):
+    """Git command returns non zero exit status."""
+    pass
+
+
+def git_folder():
+    """ Folder of git repository of campaign data.
+    """
+    return Config.campaigner_data_folder
+
+
+def run_git(*args):
+    """ Run git command in data folder without changing working directory.
+
+    :param args: arguments of git command
+    :type args: str
+
+    :return: output of command
+    :rtype: str
+    """
+    process = subprocess.run(
+        ['git'] + list(args),
+        cwd=git_folder(),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT
+    )
+    output = process.stdout.decode('utf-8')
+    if process.returncode != 0:
+        raise GitCommandError(
+            'git %s: %s' % (' '.join(args), output.strip()))
+    return output
+
+
+_branches = {}
+
+
+def git_branch():
+    """ Current branch of data folder, it is only asked once per folder.
+    """
+    folder = git_folder()
+    if folder not in _branches:
+        _branches[folder] = run_git(
+            'rev-parse', '--abbrev-ref', 'HEAD').strip()
+    return _branches[folder]
 
 
 def git_pull():
     """ Pulling git.
     """
-    os.chdir(git_folder)
-    branch = subprocess.check_output(
-        ['git', 'rev-parse', '--abbrev-ref', 'HEAD']).decode("utf-8")
-    call(
-        ["git",
-         "pull",
-         "origin",
-         branch]
-    )
+    run_git('pull', '--no-rebase', '--no-edit', 'origin', git_branch())
 
 
 def git_add():
-    """ Add new files to git git.
+    """ Add new files to git git, temporary files of writes in progress
+    are left out.
     """
-    os.chdir(git_folder)
-    call(["git", "add", "-A"])
+    run_git('add', '-A', '--', '.', ':(exclude)*%s' % TEMPORARY_FILE_SUFFIX)
 
 
 def git_commit(commit_message=''):
@@ -37,25 +76,216 @@ def git_commit(commit_message=''):
 
     :param commit_name: Commit name
     :type commit_name: str
+
+    :return: False if there is nothing to commit
+    :rtype: bool
     """
-    os.chdir(git_folder)
-    call(["git", "commit", "-m", commit_message])
+    if not run_git('status', '--porcelain', '--untracked-files=no').strip():
+        return False
+    run_git('commit', '-m', commit_message)
+    return True
 
 
 def git_push():
     """ Push commit
     """
-    os.chdir(git_folder)
-    branch = subprocess.check_output(
-        ['git', 'rev-parse', '--abbrev-ref', 'HEAD']).decode("utf-8")
-    call("git push origin %s" % branch, shell=True)
+    run_git('push', 'origin', git_branch())
+
+
+class GitPersistenceQueue(object):
+    """
+    Background worker that persists saved campaigns with git.
+
+    Saves that land within the coalesce window are committed together,
+    pull and push are retried with exponential backoff. Commits that
+    could not be pushed are tried again with the next save or after
+    failure retry interval.
+    """
+    failure_retry_interval = 60
+
+    def __init__(self, coalesce_window=5, max_retries=3, retry_backoff=2):
+        """
+        :param coalesce_window: seconds to wait for more saves after
+            the first one before committing
+        :type coalesce_window: float
+
+        :param max_retries: attempts of pull and push before giving up
+        :type max_retries: int
+
+        :param retry_backoff: seconds before first retry, doubled
+            on every retry
+        :type retry_backoff: float
+        """
+        self.coalesce_window = coalesce_window
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.last_push_latency = None
+        self.last_push_at = None
+        self.last_error = None
+        self._messages = []
+        self._first_queued_at = None
+        self._persisting = False
+        self._failed_at = None
+        self._worker = None
+        self._condition = threading.Condition()
+
+    @property
+    def queue_depth(self):
+        """Number of saves that are not pushed yet."""
+        with self._condition:
+            return len(self._messages)
+
+    def status(self):
+        """Return status of queue.
+
+        :rtype: dict
+        """
+        return {
+            'queue_depth': self.queue_depth,
+            'last_push_latency': self.last_push_latency,
+            'last_push_at': self.last_push_at,
+            'last_error': self.last_error
+        }
+
+    def put(self, commit_message):
+        """Queue a save to be committed and pushed.
+
+        :param commit_message: commit message of the save
+        :type commit_message: str
+        """
+        with self._condition:
+            if not self._messages:
+                self._first_queued_at = time.time()
+            self._messages.append(commit_message)
+            self._failed_at = None
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name='git-persistence')
+                self._worker.daemon = True
+                self._worker.start()
+            self._condition.notify_all()
+
+    def flush(self, timeout=None):
+        """Wait until every queued save is persisted.
+
+        :param timeout: seconds to wait, None waits forever
+        :type timeout: float
+
+        :return: True if queue is empty
+        :rtype: bool
+        """
+        deadline = None
+        if timeout is not None:
+            deadline = time.time() + timeout
+        with self._condition:
+            while self._messages or self._persisting:
+                if self._failed_at and not self._persisting:
+                    return False
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        return False
+                self._condition.wait(remaining)
+            return True
+
+    @staticmethod
+    def commit_message(messages):
+        """Return one commit message for coalesced saves.
+
+        :param messages: commit messages of saves
+        :type messages: [str]
+
+        :rtype: str
+        """
+        unique_messages = []
+        for message in messages:
+            if message not in unique_messages:
+                unique_messages.append(message)
+        if len(unique_messages) == 1:
+            return unique_messages[0]
+        return 'Update %s campaigns\n\n%s' % (
+            len(unique_messages), '\n'.join(unique_messages))
+
+    def _retry(self, function, *args):
+        """Call function, retry it with exponential backoff on errors."""
+        for attempt in range(self.max_retries):
+            try:
+                return function(*args)
+            except GitCommandError:
+                if attempt == self.max_retries - 1:
+                    raise
+                time.sleep(self.retry_backoff * (2 ** attempt))
+
+    def persist(self, messages):
+        """Commit the saves, then pull and push them.
+
+        :param messages: commit messages of saves
+        :type messages: [str]
+        """
+        git_add()
+        git_commit(self.commit_message(messages))
+        self._retry(git_pull)
+        self._retry(git_push)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._messages or self._failed_at:
+                    idle_timeout = 60
+                    if self._failed_at:
+                        idle_timeout = self._failed_at + \
+                            self.failure_retry_interval - time.time()
+                        if idle_timeout <= 0:
+                            # try failed saves again without a new save
+                            self._failed_at = None
+                            continue
+                    if not self._condition.wait(idle_timeout) and \
+                            not self._messages:
+                        # stop idle worker, it is started again by put
+                        self._worker = None
+                        return
+                wait = self._first_queued_at + self.coalesce_window - \
+                    time.time()
+                if wait > 0:
+                    self._condition.wait(wait)
+                    continue
+                messages = self._messages
+                first_queued_at = self._first_queued_at
+                self._messages = []
+                self._persisting = True
+
+            try:
+                self.persist(messages)
+                self.last_push_at = time.time()
+                self.last_push_latency = self.last_push_at - first_queued_at
+                self.last_error = None
+            except (GitCommandError, OSError) as e:
+                LOGGER.exception('Campaigns are not persisted to git')
+                self.last_error = '%s' % e
+                with self._condition:
+                    # keep them, they are persisted with the next save
+                    self._messages = messages + self._messages
+                    self._first_queued_at = first_queued_at
+                    self._failed_at = time.time()
+            finally:
+                with self._condition:
+                    self._persisting = False
+                    self._condition.notify_all()
+
+
+persistence_queue = GitPersistenceQueue(
+    coalesce_window=Config.GIT_COALESCE_WINDOW,
+    max_retries=Config.GIT_MAX_RETRIES,
+    retry_backoff=Config.GIT_RETRY_BACKOFF
+)
 
 
 def save_with_git(commit_message=''):
-    """ Saving files with git.
-    # 1. pull
-    # 2. add
-    # 3. commit
+    """ Saving files with git in background.
+    # 1. add
+    # 2. commit
+    # 3. pull
     # 4. push
 
     :param commit_message: commit_message
@@ -63,7 +293,4 @@ def save_with_git(commit_message=''):
     """
     from app import osm_app
     if not osm_app.config['DEBUG']:
-        git_pull()
-        git_add()
-        git_commit(commit_message)
-        git_push()
+        persistence_queue.put(commit_message)
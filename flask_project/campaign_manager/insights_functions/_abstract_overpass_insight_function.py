@@ -8,6 +8,7 @@ from campaign_manager.insights_functions._abstract_insights_function import (
 )
 
 from campaign_manager.data_providers.overpass_provider import OverpassProvider
+from reporter import config
 
 
 class AbstractOverpassInsightFunction(AbstractInsightsFunction):
@@ -56,19 +57,34 @@ class AbstractOverpassInsightFunction(AbstractInsightsFunction):
         features = self.feature.split('=')
         if len(features) == 0:
             return []
-        elif len(features) == 2:
+
+        if config.OVERPASS_BATCHED:
+            campaign_features = self.campaign.get_overpass_features()
+            if self.feature in campaign_features:
+                overpass_data = OverpassProvider().get_batched_data(
+                    self.campaign.get_overpass_polygon(),
+                    campaign_features,
+                    priority=self.campaign.get_refresh_priority()
+                )
+                self.last_update = overpass_data['last_update']
+                self.is_updating = overpass_data['updating_status']
+                return overpass_data['features'][self.feature]
+
+        if len(features) == 2:
             feature_key = features[0]
             feature_values = features[1].split(',')
             overpass_data = OverpassProvider().get_data(
-                self.campaign.corrected_coordinates(),
+                self.campaign.get_overpass_polygon(),
                 feature_key=feature_key,
-                feature_values=feature_values
+                feature_values=feature_values,
+                priority=self.campaign.get_refresh_priority()
             )
         else:
             feature_key = features[0]
             overpass_data = OverpassProvider().get_data(
-                self.campaign.corrected_coordinates(),
+                self.campaign.get_overpass_polygon(),
                 feature_key=feature_key,
+                priority=self.campaign.get_refresh_priority()
             )
         self.last_update = overpass_data['last_update']
         self.is_updating = overpass_data['updating_status']
@@ -20,6 +20,7 @@ from reporter.utilities import (
 )
 from campaign_manager.data_providers.overpass_provider import OverpassProvider
 from reporter.queries import TAG_MAPPING_REVERSE
+from reporter import config
 
 
 class AbstractOverpassUserFunction(AbstractInsightsFunction):
@@ -36,6 +37,41 @@ class AbstractOverpassUserFunction(AbstractInsightsFunction):
         if 'type' in additional_data:
             self.feature_type = additional_data['type']
 
+    def get_tag_name(self):
+        """ Tag name that counted objects of feature have.
+        :return: tag name, None when feature has no known tag
+        :rtype: str
+        """
+        if '=' in self.feature:
+            return self.feature.split('=')[0]
+        return TAG_MAPPING_REVERSE.get(self.feature)
+
+    def get_contributions_from_provider(self, start_date, end_date):
+        """ Get contributions of users that are updated incrementally.
+        :param start_date: start of campaign in milliseconds
+        :type start_date: int
+
+        :param end_date: end of campaign in milliseconds
+        :type end_date: int
+
+        :return: dict of user list and update status
+        :rtype: dict
+        """
+        features = self.feature.split('=')
+        feature_values = None
+        if len(features) == 2:
+            feature_values = features[1].split(',')
+        return OverpassProvider().get_attic_contributions(
+            state_key='%s|%s' % (self.campaign.uuid, self.feature),
+            polygon=self.campaign.get_overpass_polygon(),
+            feature_key=features[0],
+            tag_name=self.get_tag_name(),
+            feature_values=feature_values,
+            date_from=str(start_date),
+            date_to=str(end_date),
+            priority=self.campaign.get_refresh_priority()
+        )
+
     def get_data_from_provider(self):
         """ Get required attrbiutes for function provider.
         :return: dict of user list and update status
@@ -55,25 +91,30 @@ class AbstractOverpassUserFunction(AbstractInsightsFunction):
                 features = self.feature.split('=')
                 if len(features) == 0:
                     return []
+                elif config.OVERPASS_INCREMENTAL_ATTIC:
+                    overpass_data = self.get_contributions_from_provider(
+                        start_date, end_date)
                 elif len(features) == 2:
                     feature_key = features[0]
                     feature_values = features[1].split(',')
                     overpass_data = OverpassProvider().get_attic_data(
-                        polygon=self.campaign.corrected_coordinates(),
+                        polygon=self.campaign.get_overpass_polygon(),
                         overpass_verbosity='meta',
                         feature_key=feature_key,
                         feature_values=feature_values,
                         date_from=str(start_date),
-                        date_to=str(end_date)
+                        date_to=str(end_date),
+                        priority=self.campaign.get_refresh_priority()
                     )
                 else:
                     feature_key = features[0]
                     overpass_data = OverpassProvider().get_attic_data(
-                        polygon=self.campaign.corrected_coordinates(),
+                        polygon=self.campaign.get_overpass_polygon(),
                         overpass_verbosity='meta',
                         feature_key=feature_key,
                         date_from=str(start_date),
-                        date_to=str(end_date)
+                        date_to=str(end_date),
+                        priority=self.campaign.get_refresh_priority()
                     )
             except OverpassTimeoutException:
                 error = 'Timeout, try a smaller area.'
@@ -91,15 +132,12 @@ class AbstractOverpassUserFunction(AbstractInsightsFunction):
                 try:
                     last_update = overpass_data['last_update']
                     is_updating = overpass_data['updating_status']
-                    tag_name = ''
-                    if '=' in self.feature:
-                        tag_name = self.feature.split('=')[0]
-                    else:
-                        try:
-                            tag_name = TAG_MAPPING_REVERSE[self.feature]
-                        except KeyError:
-                            error = 'No key found'
-                    if isinstance(overpass_data['file'], io.IOBase):
+                    tag_name = self.get_tag_name()
+                    if 'user_list' in overpass_data:
+                        sorted_user_list = overpass_data['user_list']
+                    elif tag_name is None:
+                        error = 'No key found'
+                    elif isinstance(overpass_data['file'], io.IOBase):
                         sorted_user_list = osm_object_contributions(
                             overpass_data['file'],
                             tag_name,
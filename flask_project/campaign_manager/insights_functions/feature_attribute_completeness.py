@@ -67,6 +67,8 @@ class FeatureAttributeCompleteness(AbstractOverpassInsightFunction):
                 if not feature_key_found_in_tags:
                     continue
 
+                # features are shared with other functions, annotate a copy
+                value = dict(value)
                 self._function_good_data.append(value)
                 self.check_feature_completeness(
                     value, required_attributes)
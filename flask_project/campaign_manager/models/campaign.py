@@ -2,15 +2,12 @@ __author__ = 'Irwan Fathurrahman <irwan@kartoza.com>'
 __date__ = '10/05/17'
 
 from datetime import datetime, date, timedelta
-import bisect
 import math
 import copy
 import hashlib
-import requests
 import shutil
 import json
 import os
-import pygeoj
 import time
 
 from flask import render_template
@@ -21,46 +18,115 @@ import numpy
 
 from app_config import Config
 import campaign_manager.insights_functions as insights_functions
+from campaign_manager.insights_functions._abstract_overpass_insight_function \
+    import AbstractOverpassInsightFunction
 from campaign_manager.models.json_model import JsonModel
+from campaign_manager.models.schema import Field, serialize_date
+from campaign_manager.models.campaign_catalog import (
+    CampaignCatalog,
+    CampaignSortIndex
+)
+from campaign_manager.models.campaign_geometry import DerivedGeometry
+from campaign_manager.models.campaign_metadata_store import (
+    CampaignMetadataStore
+)
+from campaign_manager.models.participant_counter_store import (
+    ParticipantCounterStore
+)
+from campaign_manager.models.campaign_spatial_index import (
+    CampaignSpatialIndex,
+    polygon_distance
+)
 from campaign_manager.git_utilities import save_with_git
 from campaign_manager.utilities import (
     get_survey_json,
     parse_json_string,
-    simplify_polygon
+    simplify_polygon,
+    write_file_durably
 )
+from reporter import config
+from reporter import LOGGER
+from reporter.http_client import http_client
+
+# Radius of nearest campaigns query in km, about 4 degrees
+NEAREST_CAMPAIGNS_RADIUS = 445
+
+
+def parse_types(types):
+    """Parse types of campaign, tags in list format
+    e.g. ['amenity[hospital,clinic]'] are converted to dictionary.
+
+    :param types: types of campaign
+    :type types: dict
+
+    :return: types with tags in dictionary
+    :rtype: dict
+    """
+    for type, value in types.items():
+        json_tags = {}
+        tags = value['tags']
+        if (isinstance(tags, list)):
+            for tag in value['tags']:
+                tag = tag.replace(']', '')
+                tag_splitted = tag.split('[')
+                tag_key = tag_splitted[0].strip()
+                if len(tag_splitted) == 2:
+                    json_tags[tag_key] = tag_splitted[1].split(',')
+                else:
+                    json_tags[tag_key] = []
+            value['tags'] = json_tags
+    return types
 
 
 class Campaign(JsonModel):
     """
     Class campaign model that hold campaign information and functions.
     """
-    uuid = ''
-    name = ''
-    campaign_creator = ''
-    participants_count_per_type = {}
-    total_participants_count = 0
-    coverage = {}
-    geometry = None
-    start_date = None
-    end_date = None
-    campaign_managers = []
-    selected_functions = []
-    remote_projects = []
-    types = []
-    description = ''
-    _content_json = None
-    map_type = ''
-    dashboard_settings = ''
-    link_to_omk = False
-    thumbnail = ''
-
-    def __init__(self, uuid=None):
+    schema = (
+        Field('uuid', ''),
+        Field('name', ''),
+        Field('campaign_creator', ''),
+        Field('participants_count_per_type', dict),
+        Field('total_participants_count', 0),
+        Field('coverage', dict, lazy=True),
+        Field('geometry', None, in_json=False, lazy=True),
+        Field('start_date', None, serialize=serialize_date),
+        Field('end_date', None, serialize=serialize_date),
+        Field('campaign_managers', list),
+        Field('selected_functions', list, lazy=True),
+        Field('remote_projects', list),
+        Field('types', list, parse=parse_types),
+        Field('description', ''),
+        Field('map_type', ''),
+        Field('dashboard_settings', ''),
+        Field('link_to_omk', False),
+        Field('thumbnail', ''),
+        Field('geojson_path', None, in_json=False, public=False),
+        Field('_derived_geometries', dict, in_json=False, public=False),
+    )
+
+    # Fields of compact card of campaign, e.g. for campaign lists
+    CARD_FIELDS = (
+        'uuid', 'name', 'description', 'thumbnail', 'start_date',
+        'end_date', 'campaign_creator', 'campaign_managers', 'types'
+    )
+
+    def __init__(self, uuid=None, summary=False):
+        """
+        :param uuid: UUID of campaign that is loaded from json folder
+        :type uuid: str
+
+        :param summary: do not load geometry, coverage and selected
+            functions, they are loaded from disk when first accessed
+        :type summary: bool
+        """
+        self.init_fields(summary=bool(uuid) and summary)
         if uuid:
             self.uuid = uuid
             self.json_path = Campaign.get_json_file(uuid)
             self.edited_at = time.ctime(os.path.getmtime(self.json_path))
             self.geojson_path = Campaign.get_geojson_file(uuid)
-            self.parse_json_file()
+            self.parse_json_file(summary=summary)
 
     def save(self, uploader=None, save_to_git=True):
         """Save current campaign
@@ -75,38 +141,48 @@ class Campaign(JsonModel):
         # Generate map
         self.generate_static_map()
 
-        data = self.to_dict()
+        data = self.to_json(summary=True)
+        data['selected_functions'] = self.selected_functions
+        data['participants_count_per_type'], \
+            data['total_participants_count'] = self.get_participants_count()
         Campaign.validate(data, self.uuid)
+        geometry = self.geometry
 
-        geometry = data['geometry']
-        del data['geometry']
+        # save coverage to its own file, it is not in json anymore
+        coverage_path = Campaign.get_coverage_file(self.uuid)
+        if self.is_loaded('coverage') or not os.path.exists(coverage_path):
+            write_file_durably(coverage_path, json.dumps(self.coverage))
 
         # save updated campaign to json
         json_str = Campaign.serialize(data)
         json_path = os.path.join(
             Campaign.get_json_folder(), '%s.json' % self.uuid
         )
-        _file = open(json_path, 'w+')
-        _file.write(json_str)
-        _file.close()
+        write_file_durably(json_path, json_str)
 
         # save geometry campaign to geojson
         geometry_str = json.dumps(geometry)
         geometry_path = os.path.join(
             Campaign.get_json_folder(), '%s.geojson' % self.uuid
         )
-        _file = open(geometry_path, 'w+')
-        _file.write(geometry_str)
-        _file.close()
-
-        # create commit as git
+        write_file_durably(geometry_path, geometry_str)
+        catalog.invalidate(self.uuid)
+        try:
+            spatial_index.update(self)
+        except (KeyError, IndexError, TypeError, ValueError):
+            # it will be indexed again on next nearest query
+            LOGGER.exception('Campaign %s is not indexed' % self.uuid)
+        if metadata_store:
+            metadata_store.update(catalog.entry(self.uuid))
+
+        # commit and push with git in background
         if save_to_git:
             try:
                 save_with_git(
                     'Update campaign - %s' % self.uuid
                 )
-            except Exception as e:
-                print(e)
+            except Exception:
+                LOGGER.exception('Campaign %s is not saved to git' % self.uuid)
 
     def generate_static_map(self):
         """
@@ -155,7 +231,7 @@ class Campaign(JsonModel):
         )
 
         if not os.path.exists(image_path):
-            request = requests.get(url, stream=True)
+            request = http_client.get(url, stream=True)
             if request.status_code == 200:
                 with open(image_path, 'wb') as f:
                     request.raw.decode_content = True
@@ -172,13 +248,29 @@ class Campaign(JsonModel):
         :param campaign_type: Campaign type
         :type campaign_type: str
         """
-        if campaign_type in self.participants_count_per_type:
-            self.total_participants_count -= self.participants_count_per_type[
-                campaign_type
-            ]
-        self.participants_count_per_type[campaign_type] = participants_count
-        self.total_participants_count += participants_count
-        self.save()
+        participant_counter_store.set(
+            self.uuid, campaign_type, participants_count)
+
+    def get_participants_count(self):
+        """ Get participant counts from counter store, counts that are
+        saved in campaign are used for types that are not counted yet.
+
+        :return: participant count per type and total count
+        :rtype: (dict, int)
+        """
+        counted = participant_counter_store.get(self.uuid)
+        if not counted:
+            return (
+                self.participants_count_per_type,
+                self.total_participants_count
+            )
+        participants_count_per_type = dict(
+            self.participants_count_per_type or {})
+        participants_count_per_type.update(counted)
+        return (
+            participants_count_per_type,
+            sum(participants_count_per_type.values())
+        )
 
     def update_data(self, data, uploader):
         """ Update data with new dict.
@@ -189,8 +281,7 @@ class Campaign(JsonModel):
         :param uploader: uploader who created
         :type uploader: str
         """
-        for key, value in data.items():
-            setattr(self, key, value)
+        self.update(data)
         self.geometry = parse_json_string(self.geometry)
         self.types = Campaign.parse_types_string(self.types.replace('\'', '"'))
         self.selected_functions = parse_json_string(self.selected_functions)
@@ -201,7 +292,9 @@ class Campaign(JsonModel):
         :return: Get selected function in string
         :rtype: str
         """
-        for key, value in self.selected_functions.items():
+        # campaign could be shared by catalog, so work on a copy
+        selected_functions = copy.deepcopy(self.selected_functions)
+        for key, value in selected_functions.items():
             try:
                 SelectedFunction = getattr(
                     insights_functions, value['function'])
@@ -220,13 +313,16 @@ class Campaign(JsonModel):
                 value['name'] = selected_function.name()
             except AttributeError:
                 value = None
-        return json.dumps(self.selected_functions).replace('None', 'null')
+        return json.dumps(selected_functions).replace('None', 'null')
 
-    def parse_json_file(self):
+    def parse_json_file(self, summary=False):
         """ Parse json file for this campaign.
 
         If file is corrupted,
         it will raise Campaign.CorruptedFile exception.
+
+        :param summary: skip geometry, coverage and selected functions
+        :type summary: bool
         """
         # campaign data
         if self.json_path:
@@ -235,29 +331,101 @@ class Campaign(JsonModel):
                 content = _file.read()
                 content_json = parse_json_string(content)
                 Campaign.validate(content_json, self.uuid)
-                self._content_json = content_json
-                attributes = self.get_attributes()
-                for key, value in content_json.items():
-                    if key in attributes:
-                        setattr(self, key, value)
+                self.from_json(content_json, summary=summary)
             except json.decoder.JSONDecodeError:
                 raise JsonModel.CorruptedFile
-        self.types = Campaign.parse_types_string(json.dumps(self.types))
 
-        # geometry data
-        if self.geojson_path:
-            try:
-                _file = open(self.geojson_path, 'r', encoding='utf-8')
-                content = _file.read()
-                geometry = parse_json_string(content)
-                self.geometry = geometry
-                self._content_json['geometry'] = geometry
-            except json.decoder.JSONDecodeError:
-                raise JsonModel.CorruptedFile
+        if not summary:
+            self.geometry = self.load_lazy_field('geometry')
+            coverage_path = Campaign.get_coverage_file(self.uuid)
+            if os.path.exists(coverage_path):
+                self.coverage = self.load_lazy_field('coverage')
+
+    def load_lazy_field(self, name):
+        """ Load field that is not loaded in summary mode.
+
+        Geometry is read from geojson file, coverage from coverage file
+        or json of campaigns that are saved before it has own file.
+
+        :param name: name of field
+        :type name: str
+
+        :return: value of field
+        :rtype: dict
+        """
+        if name == 'geometry':
+            path = self.geojson_path
+        elif name == 'coverage':
+            path = Campaign.get_coverage_file(self.uuid)
+            if not os.path.exists(path):
+                path = self.json_path
+        else:
+            path = self.json_path
+        if not path:
+            return None
+
+        try:
+            _file = open(path, 'r', encoding='utf-8')
+            content = _file.read()
+            _file.close()
+        except (IOError, OSError):
+            content = None
+        value = parse_json_string(content)
+
+        if path == self.json_path:
+            field = [field for field in self.fields if field.name == name][0]
+            default = field.default() if callable(field.default) \
+                else field.default
+            if not isinstance(value, dict):
+                return default
+            value = value.get(name, default)
+        return value
+
+    def json(self, fields=None):
+        """Returns summary of campaign as json format.
+
+        Geometry is union of campaign areas that is cached for version
+        of campaign, so geojson file is not read.
+
+        :param fields: names of fields that are returned, all fields
+            of summary if None. Geometry and participant counts are
+            only computed when they are requested.
+        :type fields: list
 
-    def json(self):
-        """Returns campaign as json format."""
-        return self._content_json
+        :rtype: dict
+        """
+        content_json = self.to_json(summary=True)
+        if fields is not None:
+            fields = set(fields)
+            content_json = {
+                key: value for key, value in content_json.items()
+                if key in fields
+            }
+        if fields is None or 'geometry' in fields:
+            try:
+                content_json['geometry'] = {
+                    'type': 'FeatureCollection',
+                    'features': [{
+                        'type': 'Feature',
+                        'properties': {},
+                        'geometry':
+                            self.get_derived_geometry().to_geojson()
+                    }]
+                }
+            except (KeyError, IndexError, TypeError, ValueError):
+                content_json['geometry'] = None
+        if fields is None or \
+                'participants_count_per_type' in fields or \
+                'total_participants_count' in fields:
+            participants_count_per_type, total_participants_count = \
+                self.get_participants_count()
+            if fields is None or 'participants_count_per_type' in fields:
+                content_json['participants_count_per_type'] = \
+                    participants_count_per_type
+            if fields is None or 'total_participants_count' in fields:
+                content_json['total_participants_count'] = \
+                    total_participants_count
+        return content_json
 
     def render_insights_function(
             self,
@@ -340,8 +508,49 @@ class Campaign(JsonModel):
         except AttributeError as e:
             return {}
 
+    def get_derived_geometry(self):
+        """Return geometry products derived for current version.
+
+        They are memoized on the campaign, memo is shared with copies
+        of the campaign, and saved as sidecar file in cache folder that
+        is used while version and geojson file are unchanged.
+
+        :rtype: DerivedGeometry
+        """
+        derived_geometry = self._derived_geometries.get(self.version)
+        if derived_geometry:
+            return derived_geometry
+
+        sidecar_path = os.path.join(
+            Config.campaigner_cache_folder,
+            'geometry',
+            '%s.json' % self.uuid
+        )
+        try:
+            signature = CampaignCatalog.file_signature(
+                os.stat(self.geojson_path))
+        except (OSError, TypeError):
+            signature = None
+        derived_geometry = DerivedGeometry.load(
+            sidecar_path, self.version, signature)
+        if not derived_geometry:
+            derived_geometry = DerivedGeometry.compute(self, signature)
+            try:
+                derived_geometry.save(sidecar_path)
+            except OSError:
+                LOGGER.exception(
+                    'Derived geometry of %s is not saved' % self.uuid)
+        # memo dict is shared with copies, so it is updated in place
+        self._derived_geometries.clear()
+        self._derived_geometries[self.version] = derived_geometry
+        return derived_geometry
+
     def get_union_polygons(self):
         """Return union polygons"""
+        return self.get_derived_geometry().union
+
+    def compute_union_polygons(self):
+        """Compute union polygons from geometry"""
         simplify = False
         if len(self.geometry['features']) > 1:
             polygons = []
@@ -375,8 +584,19 @@ class Campaign(JsonModel):
         :return: corrected coordinated
         :rtype: [str]
         """
-        cascaded_polygons = self.get_union_polygons()
+        if coordinate_to_correct:
+            return self.swap_coordinates(coordinate_to_correct)
+        return self.get_derived_geometry().corrected_coordinates
 
+    def compute_corrected_coordinates(self, cascaded_polygons):
+        """ Compute corrected coordinates of union polygons.
+
+        :param cascaded_polygons: union polygons of campaign
+        :type cascaded_polygons: shapely.geometry.base.BaseGeometry
+
+        :return: corrected coordinated
+        :rtype: [str]
+        """
         coordinates = []
         if cascaded_polygons:
             if cascaded_polygons.type == 'Polygon':
@@ -391,6 +611,19 @@ class Campaign(JsonModel):
         correct_coordinates = self.swap_coordinates(coordinates)
         return correct_coordinates
 
+    def get_overpass_polygon(self):
+        """ Corrected coordinates of campaign as overpass poly string.
+        Corrected coordinates are returned when they are not a valid
+        polygon, so overpass provider could handle them.
+
+        :return: poly string e.g. 50.7 7.1 50.7 7.12 50.71 7.11
+        :rtype: str
+        """
+        derived_geometry = self.get_derived_geometry()
+        if derived_geometry.poly_string:
+            return derived_geometry.poly_string
+        return derived_geometry.corrected_coordinates
+
     def swap_coordinates(self, coordinates):
         """ Swap coordinate lat and lon for overpass
 
@@ -409,18 +642,13 @@ class Campaign(JsonModel):
         return correct_coordinate
 
     def get_bbox(self):
-        """ Corrected geometry of campaign.
-        :return: corrected coordinated
-        :rtype: [str]
+        """ Bbox of corrected coordinates of campaign.
+        :return: bbox in [min lat, min lon, max lat, max lon]
+        :rtype: list
         """
         if not self.geometry:
             return []
-
-        geometry = copy.deepcopy(self.geometry)
-        geometry['features'][0]['geometry']['coordinates'][0] = \
-            self.corrected_coordinates()
-        geojson = pygeoj.load(data=geometry)
-        return geojson.bbox
+        return self.get_derived_geometry().bbox
 
     def get_json_type(self, type):
         """ Get survey of campaign types in json.
@@ -440,6 +668,40 @@ class Campaign(JsonModel):
         )
         return get_survey_json(survey_file)
 
+    def get_overpass_features(self):
+        """Features that overpass insight functions of campaign query,
+        so they could be fetched with one query.
+
+        :return: sorted features e.g. ['amenity=school', 'building']
+        :rtype: list
+        """
+        features = set()
+        for value in (self.selected_functions or {}).values():
+            SelectedFunction = getattr(
+                insights_functions, value.get('function') or '', None)
+            feature = value.get('feature')
+            if not feature or not isinstance(SelectedFunction, type) or \
+                    not issubclass(
+                        SelectedFunction, AbstractOverpassInsightFunction):
+                continue
+            features.add(
+                SelectedFunction.FEATURES_MAPPING.get(feature, feature))
+        return sorted(features)
+
+    def get_refresh_priority(self):
+        """Priority of refreshing overpass data of campaign, data of
+        active campaigns is refreshed first.
+
+        :rtype: float
+        """
+        try:
+            status = self.get_current_status()
+        except (TypeError, ValueError):
+            return 0
+        if status == 'active':
+            return config.OVERPASS_ACTIVE_CAMPAIGN_PRIORITY
+        return 0
+
     def get_current_status(self):
         """ Get campaign status based on start/end date.
 
@@ -467,6 +729,22 @@ class Campaign(JsonModel):
                 status = 'remote-mapping'
         return status
 
+    def get_tags(self):
+        """ Get OSM tag keys that are used by types of campaign.
+
+        :return: tag keys e.g. {'building', 'amenity'}
+        :rtype: set
+        """
+        tags = set()
+        if not isinstance(self.types, dict):
+            return tags
+        for campaign_type in self.types.values():
+            try:
+                tags.update(campaign_type['tags'].keys())
+            except (AttributeError, KeyError, TypeError):
+                continue
+        return tags
+
     # ----------------------------------------------------------
     # coverage functions
     # ----------------------------------------------------------
@@ -536,21 +814,7 @@ class Campaign(JsonModel):
 
     @staticmethod
     def parse_types_string(types_string):
-        types = parse_json_string(types_string)
-        for type, value in types.items():
-            json_tags = {}
-            tags = value['tags']
-            if (isinstance(tags, list)):
-                for tag in value['tags']:
-                    tag = tag.replace(']', '')
-                    tag_splitted = tag.split('[')
-                    tag_key = tag_splitted[0].strip()
-                    if len(tag_splitted) == 2:
-                        json_tags[tag_key] = tag_splitted[1].split(',')
-                    else:
-                        json_tags[tag_key] = []
-                value['tags'] = json_tags
-        return types
+        return parse_types(parse_json_string(types_string))
 
     @staticmethod
     def create(data, uploader):
@@ -575,26 +839,33 @@ class Campaign(JsonModel):
         json_path = os.path.join(
             Campaign.get_json_folder(), '%s.json' % campaign_data['uuid']
         )
-        _file = open(json_path, 'w+')
-        _file.write(json_str)
-        _file.close()
+        write_file_durably(json_path, json_str)
 
         # save geometry campaign to geojson
         geojson_path = os.path.join(
             Campaign.get_json_folder(),
             '%s.geojson' % campaign_data['uuid']
         )
-        _file = open(geojson_path, 'w+')
-        _file.write(json.dumps(parse_json_string(geometry)))
-        _file.close()
-
-        # create commit as git
+        write_file_durably(
+            geojson_path, json.dumps(parse_json_string(geometry)))
+        catalog.invalidate(campaign_data['uuid'])
+        try:
+            spatial_index.update(catalog.get(campaign_data['uuid']))
+        except (KeyError, IndexError, TypeError, ValueError):
+            # it will be indexed again on next nearest query
+            LOGGER.exception(
+                'Campaign %s is not indexed' % campaign_data['uuid'])
+        if metadata_store:
+            metadata_store.update(catalog.entry(campaign_data['uuid']))
+
+        # commit and push with git in background
         try:
             save_with_git(
                 'Create campaign - %s' % data['uuid']
             )
-        except Exception as e:
-            print(e)
+        except Exception:
+            LOGGER.exception(
+                'Campaign %s is not saved to git' % data['uuid'])
 
     @staticmethod
     def all(campaign_status=None, **kwargs):
@@ -606,130 +877,180 @@ class Campaign(JsonModel):
         :return: Campaigns that found or none
         :rtype: [Campaign]
         """
-        sort_list = []
-        campaigns = []
-        for root, dirs, files in os.walk(Campaign.get_json_folder()):
-            for file in files:
-                try:
-                    campaign_uuid, extension = os.path.splitext(file)
-                    if extension != '.json':
-                        continue
-                    campaign = Campaign.get(campaign_uuid)
-
-                    if campaign_status == 'all':
-                        allowed = True
-                    elif campaign_status == campaign.get_current_status():
-                        allowed = True
-                    else:
-                        allowed = False
-
-                    if allowed:
-                        sort_object = campaign.name
-
-                        if 'sort_by' in kwargs:
-                            if kwargs['sort_by'][0] == 'recent':
-                                sort_object = int(
-                                    datetime.today().strftime('%s')
-                                ) - int(
-                                    datetime.strptime(
-                                        campaign.edited_at,
-                                        "%a %b %d %H:%M:%S %Y"
-                                    ).strftime('%s'))
-
-                        position = bisect.bisect(sort_list, sort_object)
-                        bisect.insort(sort_list, sort_object)
-                        campaigns.insert(position, campaign)
-                except Campaign.DoesNotExist:
-                    pass
-
-        if 'per_page' in kwargs:
-            per_page = int(kwargs['per_page'][0])
+        campaigns, next_cursor = Campaign.paginate(
+            campaign_status, **kwargs)
+        return campaigns
 
-            page = 1
-            if 'page' in kwargs:
-                page = int(kwargs['page'][0])
+    @staticmethod
+    def get_argument(kwargs, name):
+        """Return value of argument, it could be a string or in request
+        arguments format.
 
-            start_index = (page - 1) * per_page
+        :rtype: str
+        """
+        value = kwargs.get(name)
+        if isinstance(value, (list, tuple)):
+            value = value[0] if value else ''
+        return value
 
-            campaigns = campaigns[start_index:start_index + per_page]
+    @staticmethod
+    def get_tag_argument(kwargs):
+        """Return tag filter from arguments, it could be a string
+        or in request arguments format.
 
-        return campaigns
+        :rtype: str
+        """
+        return Campaign.get_argument(kwargs, 'tags')
 
     @staticmethod
-    def nearest_campaigns(coordinate, campaign_status, **kwargs):
-        """Return nearest campaigns based on coordinate
+    def paginate(campaign_status=None, **kwargs):
+        """Get a page of campaigns from catalog sort index.
+
+        Arguments are strings, e.g. sort_by='recent', per_page='10',
+        page='2' or cursor='' for the first page of cursor based paging,
+        or lists of them in request arguments format. Campaigns are
+        filtered by OSM tag key with tags argument.
 
         :param campaign_status: status of campaign, active or inactive
         :type campaign_status: str
 
-        :param coordinate: lat, long coordinate string
-        :type coordinate: str
+        :return: Campaigns of the page and cursor of next page
+        :rtype: ([Campaign], str)
         """
-        campaigns = []
-        sort_list = []
-        coordinates = coordinate.split(',')
-        point = shapely_geometry.Point(
-            [float(coordinates[1]), float(coordinates[0])])
+        sort_by = 'name'
+        if Campaign.get_argument(kwargs, 'sort_by') == 'recent':
+            sort_by = 'recent'
+
         per_page = None
-        is_close = False
-        circle_buffer = None
+        if Campaign.get_argument(kwargs, 'per_page'):
+            per_page = int(Campaign.get_argument(kwargs, 'per_page'))
 
-        if 'per_page' in kwargs:
-            is_close = True
-            per_page = int(kwargs['per_page'][0])
-        else:
-            circle_buffer = point.buffer(4)
+        page = 1
+        if Campaign.get_argument(kwargs, 'page'):
+            page = int(Campaign.get_argument(kwargs, 'page'))
 
-        for root, dirs, files in os.walk(Campaign.get_json_folder()):
-            for file in files:
-                try:
-                    campaign_uuid, extension = os.path.splitext(file)
-                    if extension != '.json':
-                        continue
-                    campaign = Campaign.get(campaign_uuid)
+        cursor = Campaign.get_argument(kwargs, 'cursor')
 
-                    polygon = campaign.get_union_polygons()
+        tag = Campaign.get_tag_argument(kwargs)
 
-                    if circle_buffer:
-                        if circle_buffer.contains(polygon):
-                            is_close = True
+        if not metadata_store:
+            return catalog.page(
+                campaign_status,
+                sort_by=sort_by,
+                per_page=per_page,
+                page=page,
+                cursor=cursor,
+                tag=tag
+            )
 
-                    if is_close:
+        after = None
+        if cursor is not None:
+            page = 1
+            if cursor:
+                after = CampaignSortIndex.decode_cursor(cursor)
+
+        entries = metadata_store.sync(catalog)
+        rows, has_more = metadata_store.page(
+            campaign_status,
+            tag=tag,
+            sort_by=sort_by,
+            per_page=per_page,
+            page=page,
+            after=after
+        )
+        campaigns = [
+            copy.copy(entries[uuid].campaign) for sort_key, uuid in rows
+            if uuid in entries
+        ]
+        next_cursor = None
+        if has_more:
+            next_cursor = CampaignSortIndex.encode_cursor(rows[-1])
+        return campaigns, next_cursor
 
-                        if campaign_status == 'all':
-                            allowed = True
-                        elif campaign_status == campaign.get_current_status():
-                            allowed = True
-                        else:
-                            allowed = False
+    @staticmethod
+    def nearest_campaigns(coordinate, campaign_status, **kwargs):
+        """Return nearest campaigns based on coordinate
 
-                        if allowed:
-                            if per_page:
-                                distance = point.distance(polygon.centroid)
-                                position = bisect.bisect(sort_list,
-                                                         distance)
-                                bisect.insort(sort_list, distance)
-                                campaigns.insert(position, campaign)
-                            else:
-                                campaigns.append(campaign)
+        With per_page, campaigns are ordered by haversine distance of
+        their centroid. Otherwise campaigns that have area within radius
+        (in km) of the coordinate are returned. Arguments are strings,
+        e.g. per_page='10', page='2' and radius='250', or lists of them
+        in request arguments format.
 
-                        if not per_page:
-                            is_close = False
+        :param campaign_status: status of campaign, active or inactive
+        :type campaign_status: str
 
-                except Campaign.DoesNotExist:
-                    pass
+        :param coordinate: lat, long coordinate string
+        :type coordinate: str
+        """
+        coordinates = coordinate.split(',')
+        lat = float(coordinates[0])
+        lon = float(coordinates[1])
+        tag = Campaign.get_tag_argument(kwargs)
 
-        if per_page:
+        per_page = None
+        start_index = 0
+        if Campaign.get_argument(kwargs, 'per_page'):
+            per_page = int(Campaign.get_argument(kwargs, 'per_page'))
 
             page = 1
-            if 'page' in kwargs:
-                page = int(kwargs['page'][0])
+            if Campaign.get_argument(kwargs, 'page'):
+                page = int(Campaign.get_argument(kwargs, 'page'))
 
             start_index = (page - 1) * per_page
 
-            campaigns = campaigns[start_index:start_index + per_page]
+        radius = NEAREST_CAMPAIGNS_RADIUS
+        if Campaign.get_argument(kwargs, 'radius'):
+            radius = float(Campaign.get_argument(kwargs, 'radius'))
 
-        return campaigns
+        if metadata_store:
+            entries = metadata_store.sync(catalog)
+            if per_page:
+                rows = metadata_store.nearest(
+                    lon, lat, campaign_status, tag=tag,
+                    limit=per_page, offset=start_index)
+            else:
+                rows = []
+                for uuid in metadata_store.intersects_radius(
+                        lon, lat, radius, campaign_status, tag=tag):
+                    if uuid not in entries:
+                        continue
+                    distance = polygon_distance(
+                        entries[uuid].campaign.get_union_polygons(),
+                        lon, lat)
+                    if distance <= radius:
+                        rows.append((uuid, distance))
+                rows.sort(key=lambda row: (row[1], row[0]))
+            return [
+                copy.copy(entries[uuid].campaign) for uuid, distance in rows
+                if uuid in entries
+            ]
+
+        entries = catalog.entries()
+        spatial_index.sync(
+            [entry.campaign for entry in entries.values()])
+
+        def allowed(uuid):
+            if uuid not in entries:
+                return False
+            campaign = entries[uuid].campaign
+            if tag and tag not in campaign.get_tags():
+                return False
+            if campaign_status == 'all':
+                return True
+            return campaign_status == campaign.get_current_status()
+
+        if per_page:
+            rows = spatial_index.nearest(
+                lon, lat, k=start_index + per_page, accept=allowed)
+            rows = rows[start_index:]
+        else:
+            rows = [
+                row for row in spatial_index.within(lon, lat, radius)
+                if allowed(row[0])
+            ]
+
+        return [copy.copy(entries[uuid].campaign) for uuid, distance in rows]
 
     @staticmethod
     def get(uuid):
@@ -741,7 +1062,7 @@ class Campaign(JsonModel):
         :return: Campaign that found or none
         :rtype: Campaign
         """
-        return Campaign(uuid)
+        return catalog.get(uuid)
 
     @staticmethod
     def get_json_file(uuid):
@@ -760,6 +1081,19 @@ class Campaign(JsonModel):
         else:
             raise Campaign.DoesNotExist()
 
+    @staticmethod
+    def get_coverage_file(uuid):
+        """ Get path of coverage file of uuid.
+        :param uuid: UUID of campaign
+        :type uuid: str
+
+        :return: path of coverage file, it may not exist
+        :rtype: str
+        """
+        return os.path.join(
+            Campaign.get_json_folder(), '%s.coverage' % uuid
+        )
+
     @staticmethod
     def get_geojson_file(uuid):
         """ Get path of geojson file of uuid.
@@ -818,3 +1152,23 @@ class Campaign(JsonModel):
             super(
                 Campaign.InsightsFunctionNotAssignedToCampaign, self). \
                 __init__(self.message)
+
+
+# Process-wide catalog of parsed campaigns
+catalog = CampaignCatalog(
+    Campaign, scan_interval=Config.CAMPAIGN_CATALOG_SCAN_INTERVAL)
+
+# Union polygons and centroids of campaigns for nearest queries
+spatial_index = CampaignSpatialIndex(
+    os.path.join(
+        Config.campaigner_cache_folder, 'campaign_spatial_index.json'))
+
+# Participant counts that are flushed to disk periodically
+participant_counter_store = ParticipantCounterStore(
+    os.path.join(Config.campaigner_cache_folder, 'participant_counts.json'),
+    flush_interval=Config.PARTICIPANT_COUNT_FLUSH_INTERVAL)
+
+# Optional sqlite catalog of campaign metadata for listing queries
+metadata_store = None
+if Config.CAMPAIGN_METADATA_DATABASE:
+    metadata_store = CampaignMetadataStore(Config.CAMPAIGN_METADATA_DATABASE)
@@ -0,0 +1,423 @@
+import base64
+import bisect
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import date
+
+
+class CatalogEntry(object):
+    """Parsed campaign held by the catalog with the stat signature
+    of the files it was parsed from.
+    """
+
+    def __init__(self, campaign, signature):
+        self.campaign = campaign
+        self.signature = signature
+
+
+class CampaignCatalog(object):
+    """
+    Process-wide catalog of parsed campaigns keyed by uuid.
+
+    Campaign files are only parsed again when the mtime or size
+    of the json or geojson file changes, so listing campaigns costs
+    a stat per file instead of reading and parsing them.
+    """
+
+    def __init__(self, model, scan_interval=0):
+        """
+        :param model: Model class used to parse a campaign from its uuid
+            and summary flag, it needs `get_json_folder` and
+            a `DoesNotExist` exception.
+        :type model: class
+
+        :param scan_interval: Seconds between scans of json folder,
+            0 scans it on every listing.
+        :type scan_interval: float
+        """
+        self.model = model
+        self.scan_interval = scan_interval
+        self.version = 0
+        self.sort_index = CampaignSortIndex(self)
+        self._entries = {}
+        self._scanned_at = 0
+        self._digest = None
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def file_signature(file_stat):
+        """Return signature of a file stat that used to detect changes.
+
+        :param file_stat: stat result of the file, could be None
+        :type file_stat: os.stat_result
+
+        :return: mtime and size of file
+        :rtype: tuple
+        """
+        if not file_stat:
+            return None
+        return file_stat.st_mtime_ns, file_stat.st_size
+
+    def _stat(self, uuid):
+        """Stat json and geojson files of a campaign.
+
+        :param uuid: UUID of campaign
+        :type uuid: str
+
+        :return: stat signature of json and geojson file
+        :rtype: tuple
+        """
+        folder = self.model.get_json_folder()
+        try:
+            json_stat = os.stat(os.path.join(folder, '%s.json' % uuid))
+        except OSError:
+            raise self.model.DoesNotExist()
+        try:
+            geojson_stat = os.stat(os.path.join(folder, '%s.geojson' % uuid))
+        except OSError:
+            geojson_stat = None
+        return (
+            self.file_signature(json_stat),
+            self.file_signature(geojson_stat)
+        )
+
+    def _scan(self):
+        """Stat every campaign in json folder with one directory scan.
+
+        :return: signature of campaign files per uuid
+        :rtype: dict
+        """
+        json_stats = {}
+        geojson_stats = {}
+        folder = self.model.get_json_folder()
+        if not os.path.exists(folder):
+            return {}
+
+        for entry in os.scandir(folder):
+            uuid, extension = os.path.splitext(entry.name)
+            if extension == '.json':
+                json_stats[uuid] = entry
+            elif extension == '.geojson':
+                geojson_stats[uuid] = entry
+
+        signatures = {}
+        for uuid, entry in json_stats.items():
+            try:
+                json_stat = entry.stat()
+            except OSError:
+                continue
+            geojson_stat = None
+            if uuid in geojson_stats:
+                try:
+                    geojson_stat = geojson_stats[uuid].stat()
+                except OSError:
+                    pass
+            signatures[uuid] = (
+                self.file_signature(json_stat),
+                self.file_signature(geojson_stat)
+            )
+        return signatures
+
+    def _load(self, uuid, signature):
+        """Return cached campaign, parse it when signature is changed.
+
+        :param uuid: UUID of campaign
+        :type uuid: str
+
+        :param signature: current stat signature of campaign files
+        :type signature: tuple
+
+        :return: campaign that is shared by catalog
+        :rtype: Campaign
+        """
+        entry = self._entries.get(uuid)
+        if entry and entry.signature == signature:
+            return entry.campaign
+
+        campaign = self.model(uuid, summary=True)
+        with self._lock:
+            self._entries[uuid] = CatalogEntry(campaign, signature)
+            self.version += 1
+        return campaign
+
+    def entry(self, uuid):
+        """Get catalog entry of campaign, it is shared by catalog.
+
+        :param uuid: UUID of campaign
+        :type uuid: str
+
+        :rtype: CatalogEntry
+        """
+        self._load(uuid, self._stat(uuid))
+        with self._lock:
+            return self._entries[uuid]
+
+    def get(self, uuid):
+        """Get campaign by uuid.
+
+        :param uuid: UUID of campaign that to be returned
+        :type uuid: str
+
+        :return: copy of campaign, so changes on it is not shared
+        :rtype: Campaign
+        """
+        try:
+            signature = self._stat(uuid)
+        except self.model.DoesNotExist:
+            self.invalidate(uuid)
+            raise
+        return copy.copy(self._load(uuid, signature))
+
+    def refresh(self):
+        """Synchronise catalog with campaign files in json folder.
+
+        The folder is scanned at most once per scan interval, campaigns
+        that are saved through this process invalidate it themselves.
+        """
+        now = time.time()
+        if self.scan_interval and \
+                now - self._scanned_at < self.scan_interval:
+            return
+
+        signatures = self._scan()
+        with self._lock:
+            for uuid in list(self._entries.keys()):
+                if uuid not in signatures:
+                    del self._entries[uuid]
+                    self.version += 1
+
+        for uuid, signature in signatures.items():
+            try:
+                self._load(uuid, signature)
+            except self.model.DoesNotExist:
+                continue
+        self._scanned_at = now
+
+    def entries(self, refresh=True):
+        """Return snapshot of catalog entries.
+
+        :param refresh: synchronise catalog with json folder first
+        :type refresh: bool
+
+        :return: catalog entry per uuid
+        :rtype: dict
+        """
+        if refresh:
+            self.refresh()
+        with self._lock:
+            return dict(self._entries)
+
+    def digest(self):
+        """Return digest of campaign files in the catalog.
+
+        Unlike version, digest does not depend on the process, so it is
+        the same for every worker that sees the same files. It is
+        computed again only when version of catalog changes.
+
+        :return: sha1 of uuid and file signature of campaigns
+        :rtype: str
+        """
+        entries = self.entries()
+        with self._lock:
+            version = self.version
+            if self._digest and self._digest[0] == version:
+                return self._digest[1]
+        signatures = sorted(
+            (uuid, entry.signature) for uuid, entry in entries.items())
+        digest = hashlib.sha1(
+            json.dumps(signatures).encode('utf-8')).hexdigest()
+        with self._lock:
+            self._digest = (version, digest)
+        return digest
+
+    def all(self):
+        """Get all campaigns in json folder.
+
+        :return: campaigns that found, sorted by uuid
+        :rtype: [Campaign]
+        """
+        entries = self.entries()
+        return [
+            copy.copy(entries[uuid].campaign) for uuid in sorted(entries)
+        ]
+
+    def page(self, status, sort_by='name', per_page=None, page=1,
+             cursor=None, tag=None):
+        """Get one page of campaigns from sort index.
+
+        Only campaigns in the page are copied from catalog.
+
+        :param status: status of campaign, 'all' for every status
+        :type status: str
+
+        :param tag: OSM tag key that campaign types should have
+        :type tag: str
+
+        :param sort_by: 'name' or 'recent'
+        :type sort_by: str
+
+        :param per_page: campaigns per page, None returns all of them
+        :type per_page: int
+
+        :param page: page number, starts from 1
+        :type page: int
+
+        :param cursor: cursor returned by previous page, it is used
+            instead of page when provided. Empty string is first page.
+        :type cursor: str
+
+        :return: campaigns of the page and cursor of next page
+        :rtype: ([Campaign], str)
+        """
+        entries = self.entries()
+        rows = self.sort_index.rows(status, sort_by)
+        if tag:
+            rows = [
+                row for row in rows if
+                row[1] in entries and
+                tag in entries[row[1]].campaign.get_tags()
+            ]
+
+        if cursor is not None:
+            start_index = 0
+            if cursor:
+                try:
+                    start_index = bisect.bisect_right(
+                        rows, CampaignSortIndex.decode_cursor(cursor))
+                except TypeError:
+                    # cursor of another sort order
+                    raise ValueError('Invalid cursor %s' % cursor)
+        elif per_page:
+            start_index = (page - 1) * per_page
+        else:
+            start_index = 0
+
+        if per_page:
+            end_index = start_index + per_page
+        else:
+            end_index = len(rows)
+        page_rows = rows[start_index:end_index]
+
+        campaigns = []
+        for sort_key, uuid in page_rows:
+            if uuid in entries:
+                campaigns.append(copy.copy(entries[uuid].campaign))
+
+        next_cursor = None
+        if page_rows and end_index < len(rows):
+            next_cursor = CampaignSortIndex.encode_cursor(page_rows[-1])
+        return campaigns, next_cursor
+
+    def invalidate(self, uuid=None):
+        """Drop campaign from catalog, it will be parsed again when needed.
+
+        :param uuid: UUID of campaign, drop all campaigns if None
+        :type uuid: str
+        """
+        with self._lock:
+            if uuid is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(uuid, None)
+            self.version += 1
+            self._scanned_at = 0
+
+
+class CampaignSortIndex(object):
+    """
+    Sorted rows of campaigns per status and sort order.
+
+    Rows are (sort key, uuid) tuples, they are rebuilt when catalog
+    version or the current date changes, as status depends on it.
+    """
+    SORT_BY = ('name', 'recent')
+
+    def __init__(self, catalog):
+        """
+        :param catalog: catalog that provides the campaigns
+        :type catalog: CampaignCatalog
+        """
+        self.catalog = catalog
+        self._built_for = None
+        self._rows = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def sort_key(entry, sort_by):
+        """Return sort key of catalog entry.
+
+        :param entry: catalog entry
+        :type entry: CatalogEntry
+
+        :param sort_by: 'name' or 'recent'
+        :type sort_by: str
+        """
+        if sort_by == 'recent':
+            # newest json file first
+            return -entry.signature[0][0]
+        return entry.campaign.name
+
+    @staticmethod
+    def encode_cursor(row):
+        """Encode sort index row as url safe cursor.
+
+        :param row: (sort key, uuid) of last campaign in a page
+        :type row: tuple
+
+        :rtype: str
+        """
+        return base64.urlsafe_b64encode(
+            json.dumps(list(row)).encode('utf-8')).decode('utf-8')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """Decode cursor to sort index row.
+
+        :param cursor: cursor that returned by encode_cursor
+        :type cursor: str
+
+        :rtype: tuple
+        """
+        try:
+            row = json.loads(
+                base64.urlsafe_b64decode(cursor.encode('utf-8')).decode(
+                    'utf-8'))
+            return tuple(row)
+        except (ValueError, TypeError):
+            raise ValueError('Invalid cursor %s' % cursor)
+
+    def build(self):
+        """Build sorted rows for every status and sort order.
+        """
+        rows = {}
+        for uuid, entry in self.catalog.entries(refresh=False).items():
+            status = entry.campaign.get_current_status()
+            for sort_by in self.SORT_BY:
+                row = (self.sort_key(entry, sort_by), uuid)
+                rows.setdefault(('all', sort_by), []).append(row)
+                rows.setdefault((status, sort_by), []).append(row)
+        for key_rows in rows.values():
+            key_rows.sort()
+        self._rows = rows
+
+    def rows(self, status, sort_by='name'):
+        """Return sorted rows of campaigns with the status.
+
+        :param status: status of campaign, 'all' for every status
+        :type status: str
+
+        :param sort_by: 'name' or 'recent'
+        :type sort_by: str
+
+        :rtype: [tuple]
+        """
+        with self._lock:
+            built_for = (self.catalog.version, date.today())
+            if self._built_for != built_for:
+                self.build()
+                self._built_for = built_for
+            return self._rows.get((status, sort_by), [])
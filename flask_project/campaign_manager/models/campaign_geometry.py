@@ -0,0 +1,182 @@
+import json
+import os
+
+from shapely import wkb
+from shapely.geometry import mapping
+
+from campaign_manager.utilities import write_file_durably
+from reporter.utilities import split_polygon
+
+
+class DerivedGeometry(object):
+    """
+    Geometry products derived from campaign geojson for one version
+    of campaign.
+
+    It is saved as a sidecar file so insight functions, thumbnails
+    and nearest queries do not recompute them from the raw geojson.
+    The sidecar records the stat signature of the geojson file too, so
+    a geojson edited without a new version is derived again.
+    """
+
+    def __init__(
+            self,
+            version,
+            union_wkb,
+            corrected_coordinates,
+            poly_string,
+            bbox,
+            centroid,
+            signature=None):
+        """
+        :param version: version of campaign
+        :type version: int
+
+        :param union_wkb: union polygon of campaign in WKB
+        :type union_wkb: bytes
+
+        :param corrected_coordinates: lat, lon coordinates for overpass
+        :type corrected_coordinates: list
+
+        :param poly_string: overpass poly filter string of coordinates
+        :type poly_string: str
+
+        :param bbox: bbox of corrected coordinates
+        :type bbox: list
+
+        :param centroid: lon, lat of union polygon centroid
+        :type centroid: tuple
+
+        :param signature: mtime and size of geojson file it is derived
+            from, None when there is no file
+        :type signature: tuple
+        """
+        self.version = version
+        self.union_wkb = union_wkb
+        self.corrected_coordinates = corrected_coordinates
+        self.poly_string = poly_string
+        self.bbox = bbox
+        self.centroid = centroid
+        self.signature = signature
+        self._union = None
+
+    @property
+    def union(self):
+        """Union polygon of campaign, parsed from WKB on first access.
+
+        :rtype: shapely.geometry.base.BaseGeometry
+        """
+        if self._union is None:
+            self._union = wkb.loads(self.union_wkb)
+        return self._union
+
+    def to_geojson(self):
+        """Union polygon as geojson geometry.
+
+        :rtype: dict
+        """
+        return mapping(self.union)
+
+    def to_dict(self):
+        """Derived geometry as json dict, WKB of union is hex encoded.
+
+        :rtype: dict
+        """
+        return {
+            'version': self.version,
+            'union_wkb': self.union_wkb.hex(),
+            'corrected_coordinates': self.corrected_coordinates,
+            'poly_string': self.poly_string,
+            'bbox': self.bbox,
+            'centroid': list(self.centroid),
+            'signature': list(self.signature) if self.signature else None
+        }
+
+    @staticmethod
+    def compute(campaign, signature=None):
+        """Compute derived geometry from campaign geojson.
+
+        :param campaign: campaign with geometry
+        :type campaign: Campaign
+
+        :param signature: mtime and size of geojson file
+        :type signature: tuple
+
+        :rtype: DerivedGeometry
+        """
+        union = campaign.compute_union_polygons()
+        corrected_coordinates = campaign.compute_corrected_coordinates(
+            union)
+        try:
+            poly_string = split_polygon(corrected_coordinates)
+        except ValueError:
+            poly_string = None
+
+        bbox = []
+        if corrected_coordinates:
+            first_values = [
+                coordinate[0] for coordinate in corrected_coordinates]
+            second_values = [
+                coordinate[1] for coordinate in corrected_coordinates]
+            bbox = [
+                min(first_values), min(second_values),
+                max(first_values), max(second_values)
+            ]
+
+        derived_geometry = DerivedGeometry(
+            version=campaign.version,
+            union_wkb=wkb.dumps(union),
+            corrected_coordinates=corrected_coordinates,
+            poly_string=poly_string,
+            bbox=bbox,
+            centroid=(union.centroid.x, union.centroid.y),
+            signature=signature
+        )
+        derived_geometry._union = union
+        return derived_geometry
+
+    @staticmethod
+    def load(path, version, signature=None):
+        """Load derived geometry sidecar if it is for the version and
+        geojson file.
+
+        :param path: path of sidecar file
+        :type path: str
+
+        :param version: version of campaign
+        :type version: int
+
+        :param signature: mtime and size of geojson file
+        :type signature: tuple
+
+        :return: derived geometry or None if not found or outdated
+        :rtype: DerivedGeometry
+        """
+        try:
+            with open(path) as sidecar_file:
+                data = json.load(sidecar_file)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(data, dict) or data.get('version') != version:
+            return None
+        try:
+            if data.get('signature'):
+                data['signature'] = tuple(data['signature'])
+            if data.get('signature') != signature:
+                return None
+            data['union_wkb'] = bytes.fromhex(data['union_wkb'])
+            data['centroid'] = tuple(data['centroid'])
+            return DerivedGeometry(**data)
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def save(self, path):
+        """Save derived geometry as sidecar file atomically.
+
+        :param path: path of sidecar file
+        :type path: str
+        """
+        folder = os.path.dirname(path)
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        write_file_durably(path, json.dumps(self.to_dict()))
@@ -0,0 +1,488 @@
+import json
+import math
+import os
+import sqlite3
+import threading
+from datetime import date
+
+from campaign_manager.utilities import haversine_distance
+
+KILOMETERS_PER_DEGREE = 111.32
+EARTH_RADIUS = 6371.0088
+# radius in kilometers that nearest campaigns are first searched in,
+# it grows by NEAREST_RADIUS_GROWTH until enough campaigns are found
+NEAREST_START_RADIUS = 50.
+NEAREST_RADIUS_GROWTH = 4
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS campaign (
+    id INTEGER PRIMARY KEY,
+    uuid TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    start_date TEXT,
+    end_date TEXT,
+    has_remote_projects INTEGER NOT NULL DEFAULT 0,
+    types TEXT,
+    campaign_managers TEXT,
+    participants_count_per_type TEXT,
+    total_participants_count INTEGER NOT NULL DEFAULT 0,
+    min_x REAL,
+    min_y REAL,
+    max_x REAL,
+    max_y REAL,
+    centroid_x REAL,
+    centroid_y REAL,
+    version INTEGER,
+    edited_at INTEGER,
+    signature TEXT
+);
+CREATE INDEX IF NOT EXISTS campaign_name ON campaign (name, uuid);
+CREATE INDEX IF NOT EXISTS campaign_edited_at ON campaign (edited_at, uuid);
+CREATE INDEX IF NOT EXISTS campaign_dates ON campaign (end_date, start_date);
+CREATE TABLE IF NOT EXISTS campaign_tag (
+    tag TEXT NOT NULL,
+    campaign_id INTEGER NOT NULL,
+    PRIMARY KEY (tag, campaign_id)
+) WITHOUT ROWID;
+CREATE VIRTUAL TABLE IF NOT EXISTS campaign_bbox USING rtree (
+    id, min_x, max_x, min_y, max_y
+);
+"""
+
+STATUS_CONDITIONS = {
+    'active': 'start_date <= :today AND end_date > :today',
+    'inactive': (
+        'NOT coalesce(start_date <= :today AND end_date > :today, 0) '
+        'AND has_remote_projects = 0'),
+    'remote-mapping': (
+        'NOT coalesce(start_date <= :today AND end_date > :today, 0) '
+        'AND has_remote_projects = 1'),
+}
+
+
+def radius_bbox(lon, lat, radius):
+    """Return bbox that covers circle of radius around point.
+
+    :param lon: longitude of point
+    :type lon: float
+
+    :param lat: latitude of point
+    :type lat: float
+
+    :param radius: radius in kilometers
+    :type radius: float
+
+    :return: (min_x, min_y, max_x, max_y), None when circle covers
+        the whole world
+    :rtype: tuple
+    """
+    if radius >= math.pi * EARTH_RADIUS:
+        return None
+    lat_delta = math.degrees(radius / EARTH_RADIUS)
+    min_y = lat - lat_delta
+    max_y = lat + lat_delta
+    if min_y <= -90 or max_y >= 90:
+        # circle contains a pole, so every longitude
+        return -180., max(min_y, -90.), 180., min(max_y, 90.)
+    lon_delta = lat_delta / math.cos(
+        math.radians(max(abs(min_y), abs(max_y))))
+    if lon - lon_delta < -180 or lon + lon_delta > 180:
+        # circle crosses the antimeridian
+        return -180., min_y, 180., max_y
+    return lon - lon_delta, min_y, lon + lon_delta, max_y
+
+
+def sql_haversine_distance(lon1, lat1, lon2, lat2):
+    """Haversine distance for sql queries, NULL without coordinates."""
+    if None in (lon1, lat1, lon2, lat2):
+        return None
+    return float(haversine_distance(lon1, lat1, lon2, lat2))
+
+
+class CampaignMetadataStore(object):
+    """
+    SQLite catalog of campaign metadata that campaigns are filtered
+    and sorted on.
+
+    Json and geojson files stay the source of truth, rows are synced
+    from the campaign catalog using the stat signature of the files
+    and can always be rebuilt from scratch. Queries return uuids,
+    campaigns themselves are taken from the campaign catalog.
+    """
+
+    def __init__(self, database_path):
+        """
+        :param database_path: path of sqlite database file
+        :type database_path: str
+        """
+        self.database_path = database_path
+        self._synced_version = None
+        self._local = threading.local()
+        self._lock = threading.RLock()
+
+    def connection(self):
+        """Return sqlite connection of current thread.
+
+        :rtype: sqlite3.Connection
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            folder = os.path.dirname(self.database_path)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder)
+            connection = sqlite3.connect(self.database_path, timeout=30)
+            connection.row_factory = sqlite3.Row
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.executescript(SCHEMA)
+            connection.create_function(
+                'haversine', 4, sql_haversine_distance)
+            self._local.connection = connection
+        return connection
+
+    def _insert(self, connection, entry):
+        """Insert row of catalog entry, old row should be deleted first.
+
+        :param connection: connection in a transaction
+        :type connection: sqlite3.Connection
+
+        :param entry: catalog entry of campaign
+        :type entry: CatalogEntry
+        """
+        campaign = entry.campaign
+        participants_count_per_type, total_participants_count = \
+            campaign.get_participants_count()
+        bounds = (None, None, None, None)
+        centroid = (None, None)
+        try:
+            polygon = campaign.get_union_polygons()
+            if not polygon.is_empty:
+                bounds = polygon.bounds
+                centroid = (polygon.centroid.x, polygon.centroid.y)
+        except (KeyError, IndexError, TypeError, ValueError):
+            # campaign without valid geometry
+            pass
+
+        cursor = connection.execute(
+            'INSERT INTO campaign ('
+            'uuid, name, start_date, end_date, has_remote_projects, types, '
+            'campaign_managers, participants_count_per_type, '
+            'total_participants_count, min_x, min_y, max_x, max_y, '
+            'centroid_x, centroid_y, version, edited_at, signature) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (
+                campaign.uuid,
+                campaign.name or '',
+                campaign.start_date,
+                campaign.end_date,
+                1 if campaign.remote_projects else 0,
+                json.dumps(campaign.types),
+                json.dumps(campaign.campaign_managers),
+                json.dumps(participants_count_per_type),
+                total_participants_count or 0,
+                bounds[0], bounds[1], bounds[2], bounds[3],
+                centroid[0], centroid[1],
+                getattr(campaign, 'version', None),
+                entry.signature[0][0],
+                json.dumps(entry.signature)
+            )
+        )
+        campaign_id = cursor.lastrowid
+        connection.executemany(
+            'INSERT INTO campaign_tag (tag, campaign_id) VALUES (?, ?)',
+            [(tag, campaign_id) for tag in campaign.get_tags()]
+        )
+        if bounds[0] is not None:
+            connection.execute(
+                'INSERT INTO campaign_bbox VALUES (?, ?, ?, ?, ?)',
+                (campaign_id, bounds[0], bounds[2], bounds[1], bounds[3])
+            )
+
+    def _delete(self, connection, uuid):
+        """Delete rows of campaign.
+
+        :param connection: connection in a transaction
+        :type connection: sqlite3.Connection
+
+        :param uuid: UUID of campaign
+        :type uuid: str
+        """
+        row = connection.execute(
+            'SELECT id FROM campaign WHERE uuid = ?', (uuid,)).fetchone()
+        if not row:
+            return
+        connection.execute(
+            'DELETE FROM campaign_tag WHERE campaign_id = ?', (row['id'],))
+        connection.execute(
+            'DELETE FROM campaign_bbox WHERE id = ?', (row['id'],))
+        connection.execute(
+            'DELETE FROM campaign WHERE id = ?', (row['id'],))
+
+    def update(self, entry):
+        """Add or replace row of a campaign.
+
+        :param entry: catalog entry of campaign
+        :type entry: CatalogEntry
+        """
+        with self._lock:
+            connection = self.connection()
+            with connection:
+                self._delete(connection, entry.campaign.uuid)
+                self._insert(connection, entry)
+
+    def sync(self, catalog):
+        """Make rows match campaigns of catalog, only campaigns with
+        changed files are written again.
+
+        :param catalog: campaign catalog
+        :type catalog: CampaignCatalog
+
+        :return: catalog entry per uuid
+        :rtype: dict
+        """
+        entries = catalog.entries()
+        version = catalog.version
+        with self._lock:
+            if self._synced_version == version:
+                return entries
+            connection = self.connection()
+            signatures = {
+                row['uuid']: row['signature'] for row in connection.execute(
+                    'SELECT uuid, signature FROM campaign')
+            }
+            with connection:
+                for uuid in signatures:
+                    if uuid not in entries:
+                        self._delete(connection, uuid)
+                for uuid, entry in entries.items():
+                    if signatures.get(uuid) == json.dumps(entry.signature):
+                        continue
+                    self._delete(connection, uuid)
+                    self._insert(connection, entry)
+            self._synced_version = version
+        return entries
+
+    def rebuild(self, catalog):
+        """Drop every row and build the store again from json files.
+
+        :param catalog: campaign catalog
+        :type catalog: CampaignCatalog
+
+        :return: number of campaigns in store
+        :rtype: int
+        """
+        catalog.invalidate()
+        entries = catalog.entries()
+        version = catalog.version
+        with self._lock:
+            connection = self.connection()
+            with connection:
+                connection.execute('DELETE FROM campaign_tag')
+                connection.execute('DELETE FROM campaign_bbox')
+                connection.execute('DELETE FROM campaign')
+                for uuid in sorted(entries):
+                    self._insert(connection, entries[uuid])
+            self._synced_version = version
+        return len(entries)
+
+    @staticmethod
+    def _filters(status, tag):
+        """Return sql conditions and parameters of status and tag filter.
+
+        :param status: status of campaign, 'all' for every status
+        :type status: str
+
+        :param tag: OSM tag key that campaign types should have
+        :type tag: str
+
+        :rtype: ([str], dict)
+        """
+        conditions = []
+        parameters = {'today': date.today().strftime('%Y-%m-%d')}
+        if status != 'all':
+            conditions.append(STATUS_CONDITIONS.get(status, '0'))
+        if tag:
+            conditions.append(
+                'id IN (SELECT campaign_id FROM campaign_tag '
+                'WHERE tag = :tag)')
+            parameters['tag'] = tag
+        return conditions, parameters
+
+    def page(self, status, tag=None, sort_by='name', per_page=None, page=1,
+             after=None):
+        """Return uuids of a page of campaigns.
+
+        :param status: status of campaign, 'all' for every status
+        :type status: str
+
+        :param tag: OSM tag key that campaign types should have
+        :type tag: str
+
+        :param sort_by: 'name' or 'recent'
+        :type sort_by: str
+
+        :param per_page: campaigns per page, None returns all of them
+        :type per_page: int
+
+        :param page: page number, starts from 1
+        :type page: int
+
+        :param after: (sort key, uuid) row that page starts after,
+            it is used instead of page when provided
+        :type after: tuple
+
+        :return: (sort key, uuid) rows of the page and whether there
+            are more campaigns after it
+        :rtype: ([tuple], bool)
+        """
+        conditions, parameters = self._filters(status, tag)
+        if sort_by == 'recent':
+            # newest json file first, sort key is negative edited_at
+            sort_column = '-edited_at'
+            order_by = 'edited_at DESC, uuid'
+            after_condition = (
+                '(edited_at < :after_edited_at OR '
+                '(edited_at = :after_edited_at AND uuid > :after_uuid))')
+        else:
+            sort_column = 'name'
+            order_by = 'name, uuid'
+            after_condition = '(name, uuid) > (:after_name, :after_uuid)'
+
+        offset = 0
+        if after:
+            try:
+                if sort_by == 'recent':
+                    parameters['after_edited_at'] = -int(after[0])
+                else:
+                    if not isinstance(after[0], str):
+                        raise TypeError
+                    parameters['after_name'] = after[0]
+                parameters['after_uuid'] = after[1]
+            except (IndexError, TypeError, ValueError):
+                raise ValueError('Invalid cursor of %s order' % sort_by)
+            conditions.append(after_condition)
+        elif per_page:
+            offset = (page - 1) * per_page
+
+        query = 'SELECT %s AS sort_key, uuid FROM campaign' % sort_column
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY ' + order_by
+        if per_page:
+            # one more row tells whether there is a next page
+            query += ' LIMIT :limit OFFSET :offset'
+            parameters['limit'] = per_page + 1
+            parameters['offset'] = offset
+
+        rows = [
+            (row['sort_key'], row['uuid']) for row in
+            self.connection().execute(query, parameters)
+        ]
+        has_more = bool(per_page) and len(rows) > per_page
+        if per_page:
+            rows = rows[:per_page]
+        return rows, has_more
+
+    def nearest(self, lon, lat, status, tag=None, limit=None, offset=0):
+        """Return uuids ordered by haversine distance of centroid.
+
+        Candidates are prefiltered with the bbox rtree in a radius that
+        grows until it holds enough campaigns, distance is computed for
+        the candidates only.
+
+        :param lon: longitude of point
+        :type lon: float
+
+        :param lat: latitude of point
+        :type lat: float
+
+        :param status: status of campaign, 'all' for every status
+        :type status: str
+
+        :param tag: OSM tag key that campaign types should have
+        :type tag: str
+
+        :param limit: number of campaigns, None returns all of them
+        :type limit: int
+
+        :param offset: number of campaigns that are skipped
+        :type offset: int
+
+        :return: (uuid, distance in km) sorted by distance
+        :rtype: [tuple]
+        """
+        conditions, parameters = self._filters(status, tag)
+        conditions.append('centroid_x IS NOT NULL')
+        parameters.update({'lon': lon, 'lat': lat})
+        query = (
+            'SELECT uuid, haversine(:lon, :lat, centroid_x, centroid_y) '
+            'AS distance FROM campaign WHERE ' + ' AND '.join(conditions))
+        wanted = offset + limit if limit else None
+
+        # centroid lies in bbox of campaign, so candidates are campaigns
+        # which bbox intersects bbox of the radius, radius grows until
+        # enough of them are within it
+        radius = NEAREST_START_RADIUS
+        while True:
+            bbox = radius_bbox(lon, lat, radius) if wanted else None
+            if bbox is None:
+                rows = self.connection().execute(query, parameters)
+            else:
+                rows = self.connection().execute(
+                    query + ' AND id IN (SELECT id FROM campaign_bbox '
+                    'WHERE max_x >= :min_x AND min_x <= :max_x AND '
+                    'max_y >= :min_y AND min_y <= :max_y)',
+                    dict(parameters, min_x=bbox[0], min_y=bbox[1],
+                         max_x=bbox[2], max_y=bbox[3]))
+            rows = [
+                (row['uuid'], row['distance']) for row in rows
+                if bbox is None or row['distance'] <= radius
+            ]
+            if bbox is None or len(rows) >= wanted:
+                break
+            radius *= NEAREST_RADIUS_GROWTH
+
+        rows.sort(key=lambda row: (row[1], row[0]))
+        if limit:
+            return rows[offset:wanted]
+        return rows
+
+    def intersects_radius(self, lon, lat, radius, status, tag=None):
+        """Return uuids of campaigns which bbox is within radius of point.
+
+        :param lon: longitude of point
+        :type lon: float
+
+        :param lat: latitude of point
+        :type lat: float
+
+        :param radius: radius in kilometers
+        :type radius: float
+
+        :param status: status of campaign, 'all' for every status
+        :type status: str
+
+        :param tag: OSM tag key that campaign types should have
+        :type tag: str
+
+        :rtype: [str]
+        """
+        conditions, parameters = self._filters(status, tag)
+        lat_delta = radius / KILOMETERS_PER_DEGREE
+        lon_delta = radius / (
+            KILOMETERS_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+        conditions.append(
+            'id IN (SELECT id FROM campaign_bbox WHERE '
+            'max_x >= :min_x AND min_x <= :max_x AND '
+            'max_y >= :min_y AND min_y <= :max_y)')
+        parameters.update({
+            'min_x': lon - lon_delta,
+            'max_x': lon + lon_delta,
+            'min_y': lat - lat_delta,
+            'max_y': lat + lat_delta
+        })
+        query = 'SELECT uuid FROM campaign WHERE ' + ' AND '.join(
+            conditions) + ' ORDER BY uuid'
+        return [
+            row['uuid'] for row in
+            self.connection().execute(query, parameters)
+        ]
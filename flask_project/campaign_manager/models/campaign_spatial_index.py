@@ -0,0 +1,290 @@
+import json
+import math
+import os
+import threading
+
+import numpy
+from shapely import wkb
+from shapely.geometry import Point, box
+from shapely.ops import nearest_points
+from shapely.strtree import STRtree
+
+from campaign_manager.utilities import (
+    haversine_distance,
+    write_file_durably
+)
+
+KILOMETERS_PER_DEGREE = 111.32
+
+
+def polygon_distance(polygon, lon, lat):
+    """Return haversine distance from point to nearest point of polygon.
+
+    :param polygon: polygon in lon, lat
+    :type polygon: shapely.geometry.base.BaseGeometry
+
+    :return: distance in km, 0 if point is inside polygon
+    :rtype: float
+    """
+    nearest_point = nearest_points(polygon, Point(lon, lat))[0]
+    return float(haversine_distance(
+        lon, lat, nearest_point.x, nearest_point.y))
+
+
+class SpatialIndexEntry(object):
+    """Union geometry and centroid of a campaign version."""
+
+    def __init__(self, version, geometry_wkb, centroid):
+        self.version = version
+        self.geometry_wkb = geometry_wkb
+        self.centroid = centroid
+        self._geometry = None
+
+    @property
+    def geometry(self):
+        if self._geometry is None:
+            self._geometry = wkb.loads(self.geometry_wkb)
+        return self._geometry
+
+    def to_json(self):
+        """Return entry as json list of version, hex of WKB and centroid.
+
+        :rtype: list
+        """
+        return [self.version, self.geometry_wkb.hex(), list(self.centroid)]
+
+    @classmethod
+    def from_json(cls, value):
+        """Return entry from json list of `to_json`.
+
+        :raises: ValueError, TypeError when value is not an entry
+
+        :rtype: SpatialIndexEntry
+        """
+        version, geometry_hex, centroid = value
+        return cls(
+            version=version,
+            geometry_wkb=bytes.fromhex(geometry_hex),
+            centroid=(float(centroid[0]), float(centroid[1])))
+
+
+class CampaignSpatialIndex(object):
+    """
+    Spatial index of campaign union polygons and centroids.
+
+    Entries are persisted to disk, so polygon unions are only computed
+    when a campaign is created or saved with a new version.
+    Nearest queries use haversine distance between centroids, radius
+    queries use STRtree to find candidates before measuring distance
+    to the nearest point of the polygons.
+    """
+
+    def __init__(self, index_path):
+        """
+        :param index_path: path of file where index is persisted
+        :type index_path: str
+        """
+        self.index_path = index_path
+        self._entries = None
+        self._tree = None
+        self._lock = threading.RLock()
+
+    def _read(self):
+        """Read persisted entries from disk.
+
+        Index is json of [version, hex of WKB, centroid] per uuid,
+        entries that are not in that format are left out.
+
+        :return: entry per uuid
+        :rtype: dict
+        """
+        try:
+            with open(self.index_path) as index_file:
+                data = json.load(index_file)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(data, dict):
+            return {}
+        entries = {}
+        for uuid, value in data.items():
+            try:
+                entries[uuid] = SpatialIndexEntry.from_json(value)
+            except (TypeError, ValueError, IndexError):
+                continue
+        return entries
+
+    def _write(self):
+        """Persist entries to disk by replacing index file atomically."""
+        folder = os.path.dirname(self.index_path)
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        write_file_durably(self.index_path, json.dumps({
+            uuid: entry.to_json() for uuid, entry in self._entries.items()
+        }))
+
+    def entries(self):
+        """Return entries of index, read from disk on first access.
+
+        :rtype: dict
+        """
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._read()
+            return self._entries
+
+    def update(self, campaign, persist=True):
+        """Add or update campaign in index.
+
+        :param campaign: campaign to be indexed
+        :type campaign: Campaign
+
+        :param persist: write index to disk after update
+        :type persist: bool
+        """
+        polygon = campaign.get_union_polygons()
+        entry = SpatialIndexEntry(
+            version=campaign.version,
+            geometry_wkb=wkb.dumps(polygon),
+            centroid=(polygon.centroid.x, polygon.centroid.y)
+        )
+        with self._lock:
+            self.entries()[campaign.uuid] = entry
+            self._tree = None
+            if persist:
+                self._write()
+
+    def sync(self, campaigns):
+        """Make index match the campaigns, only campaigns that are
+        missing or have another version are indexed again.
+
+        :param campaigns: all campaigns
+        :type campaigns: [Campaign]
+        """
+        with self._lock:
+            entries = self.entries()
+            changed = False
+            uuids = set()
+            for campaign in campaigns:
+                uuids.add(campaign.uuid)
+                entry = entries.get(campaign.uuid)
+                if entry and entry.version == campaign.version:
+                    continue
+                try:
+                    self.update(campaign, persist=False)
+                except (KeyError, IndexError, TypeError, ValueError):
+                    # campaign without valid geometry
+                    continue
+                changed = True
+            for uuid in list(entries.keys()):
+                if uuid not in uuids:
+                    del entries[uuid]
+                    changed = True
+            if changed:
+                self._tree = None
+                self._write()
+
+    def _build_tree(self):
+        """Build STRtree and centroid arrays of current entries."""
+        entries = self.entries()
+        uuids = sorted(entries.keys())
+        geometries = [entries[uuid].geometry for uuid in uuids]
+        centroids = numpy.array(
+            [entries[uuid].centroid for uuid in uuids], dtype=float
+        ).reshape(-1, 2)
+        self._tree = (
+            uuids,
+            geometries,
+            STRtree(geometries) if geometries else None,
+            {id(geometry): index for index, geometry in
+             enumerate(geometries)},
+            centroids
+        )
+        return self._tree
+
+    def _get_tree(self):
+        with self._lock:
+            if self._tree is None:
+                return self._build_tree()
+            return self._tree
+
+    def nearest(self, lon, lat, k=None, accept=None):
+        """Return k nearest campaigns by haversine distance of centroids.
+
+        :param lon: longitude of point
+        :type lon: float
+
+        :param lat: latitude of point
+        :type lat: float
+
+        :param k: number of campaigns, None returns every campaign
+        :type k: int
+
+        :param accept: function that receives uuid and returns whether
+            campaign could be in result
+        :type accept: function
+
+        :return: (uuid, distance in km) sorted by distance
+        :rtype: [tuple]
+        """
+        uuids, geometries, tree, geometry_index, centroids = \
+            self._get_tree()
+        if not uuids:
+            return []
+        distances = haversine_distance(
+            lon, lat, centroids[:, 0], centroids[:, 1])
+
+        if k and not accept and k < len(uuids):
+            candidates = numpy.argpartition(distances, k)[:k]
+            order = candidates[numpy.argsort(distances[candidates])]
+        else:
+            order = numpy.argsort(distances, kind='stable')
+
+        result = []
+        for index in order:
+            uuid = uuids[index]
+            if accept and not accept(uuid):
+                continue
+            result.append((uuid, float(distances[index])))
+            if k and len(result) >= k:
+                break
+        return result
+
+    def within(self, lon, lat, radius):
+        """Return campaigns that have area within radius of point.
+
+        :param lon: longitude of point
+        :type lon: float
+
+        :param lat: latitude of point
+        :type lat: float
+
+        :param radius: radius in kilometers
+        :type radius: float
+
+        :return: (uuid, distance in km) sorted by distance
+        :rtype: [tuple]
+        """
+        uuids, geometries, tree, geometry_index, centroids = \
+            self._get_tree()
+        if not tree:
+            return []
+
+        lat_delta = radius / KILOMETERS_PER_DEGREE
+        lon_delta = radius / (
+            KILOMETERS_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+        search_box = box(
+            lon - lon_delta, lat - lat_delta,
+            lon + lon_delta, lat + lat_delta)
+
+        result = []
+        for item in tree.query(search_box):
+            # shapely < 2.0 returns geometries instead of indices
+            if isinstance(item, (int, numpy.integer)):
+                index = int(item)
+            else:
+                index = geometry_index[id(item)]
+            distance = polygon_distance(geometries[index], lon, lat)
+            if distance <= radius:
+                result.append((uuids[index], distance))
+        result.sort(key=lambda row: (row[1], row[0]))
+        return result
@@ -1,14 +1,21 @@
 __author__ = 'Irwan Fathurrahman <irwan@kartoza.com>'
 __date__ = '10/05/17'
 
+from campaign_manager.models.schema import Field, NOT_LOADED
 from campaign_manager.models.version import Version
 
 
 class JsonModel(Version):
     """
     Model that use json.
+
+    Attributes are declared in `schema`, keys of json that are not
+    in schema are kept in `_extra` and saved back to json.
     """
-    json_path = ''
+    schema = (
+        Field('json_path', '', in_json=False, public=False),
+        Field('_extra', dict, in_json=False, public=False),
+    )
 
     def parse_json_file(self):
         return NotImplemented
@@ -19,20 +26,37 @@ class JsonModel(Version):
         :rtype: list
         """
         return [
-            attr for attr in dir(self)
-            if not callable(getattr(self, attr)) and not attr.startswith("_")
-            ]
+            field.name for field in self.fields if field.public
+        ]
+
+    def is_loaded(self, name):
+        """ Whether lazy field is loaded, other fields are always loaded.
+
+        :param name: name of field
+        :type name: str
+
+        :rtype: bool
+        """
+        return getattr(self, '_%s_value' % name, None) is not NOT_LOADED
+
+    def update(self, data):
+        """ Set attributes from dictionary, keys that are not in
+        schema are kept as extra json data.
 
-    def to_dict(self):
-        """ Return json model as dictionary.
-        :return: dict
+        :param data: data that will be set
+        :type data: dict
         """
-        dict = {}
-        for attribute in self.get_attributes():
-            dict[attribute] = getattr(self, attribute)
-        dict.pop('json_path')
-        dict.pop('geojson_path')
-        return dict
+        extra = None
+        for key, value in data.items():
+            if key in self.field_names:
+                setattr(self, key, value)
+            else:
+                if extra is None:
+                    # extra could be shared with copies of model
+                    extra = dict(self._extra)
+                extra[key] = value
+        if extra is not None:
+            self._extra = extra
 
     @staticmethod
     class CorruptedFile(Exception):
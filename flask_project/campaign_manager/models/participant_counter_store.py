@@ -0,0 +1,170 @@
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+class ParticipantCounterStore(object):
+    """
+    Write-behind store of participant count per campaign type.
+
+    Counts are updated in memory and flushed to an atomic json file
+    at most once per flush interval, so counting participants does not
+    rewrite and commit the campaign document. Every count keeps the
+    time it was updated, flushing merges with counts that other
+    processes wrote to the file by keeping the newest one.
+    """
+
+    def __init__(self, file_path, flush_interval=30):
+        """
+        :param file_path: path of json file of counts
+        :type file_path: str
+
+        :param flush_interval: seconds between flushes of updated counts
+        :type flush_interval: float
+        """
+        self.file_path = file_path
+        self.flush_interval = flush_interval
+        self._counts = None
+        self._file_signature = None
+        self._checked_at = 0
+        self._dirty = False
+        self._timer = None
+        self._lock = threading.RLock()
+        atexit.register(self.flush)
+
+    def _read(self):
+        """Read counts from file.
+
+        :return: {uuid: {type: [count, updated at]}}
+        :rtype: dict
+        """
+        try:
+            with open(self.file_path) as counts_file:
+                counts = json.load(counts_file)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(counts, dict):
+            return {}
+        return counts
+
+    def _signature(self):
+        try:
+            file_stat = os.stat(self.file_path)
+        except OSError:
+            return None
+        return file_stat.st_mtime_ns, file_stat.st_size
+
+    @staticmethod
+    def _merge(counts, other_counts):
+        """Merge other counts into counts, newest count wins.
+
+        :return: whether counts are changed
+        :rtype: bool
+        """
+        changed = False
+        for uuid, type_counts in other_counts.items():
+            campaign_counts = counts.setdefault(uuid, {})
+            for campaign_type, count in type_counts.items():
+                current = campaign_counts.get(campaign_type)
+                if current is None or count[1] > current[1]:
+                    campaign_counts[campaign_type] = count
+                    changed = True
+        return changed
+
+    def _counts_of_file(self):
+        """Return counts in memory, merged with file when it is changed
+        by another process. The file is checked once per flush interval.
+        """
+        with self._lock:
+            now = time.time()
+            if self._counts is not None and \
+                    now - self._checked_at < self.flush_interval:
+                return self._counts
+            self._checked_at = now
+            signature = self._signature()
+            if self._counts is None:
+                self._counts = self._read()
+            elif signature != self._file_signature:
+                self._merge(self._counts, self._read())
+            self._file_signature = signature
+            return self._counts
+
+    def get(self, uuid):
+        """Return participant count per type of campaign.
+
+        :param uuid: UUID of campaign
+        :type uuid: str
+
+        :return: count per campaign type, None if it is not counted
+        :rtype: dict
+        """
+        with self._lock:
+            type_counts = self._counts_of_file().get(uuid)
+            if not type_counts:
+                return None
+            return {
+                campaign_type: count[0]
+                for campaign_type, count in type_counts.items()
+            }
+
+    def last_updated(self):
+        """Return time of the newest count in the store.
+
+        :return: timestamp of newest count, 0 if nothing is counted
+        :rtype: float
+        """
+        with self._lock:
+            return max(
+                (count[1] for type_counts in self._counts_of_file().values()
+                 for count in type_counts.values()),
+                default=0)
+
+    def set(self, uuid, campaign_type, participants_count):
+        """Update participant count of campaign type.
+
+        :param uuid: UUID of campaign
+        :type uuid: str
+
+        :param campaign_type: Campaign type
+        :type campaign_type: str
+
+        :param participants_count: Participant count number
+        :type participants_count: int
+        """
+        with self._lock:
+            campaign_counts = self._counts_of_file().setdefault(uuid, {})
+            current = campaign_counts.get(campaign_type)
+            if current and current[0] == participants_count:
+                return
+            campaign_counts[campaign_type] = [
+                participants_count, time.time()]
+            self._dirty = True
+            if self._timer is None:
+                self._timer = threading.Timer(
+                    self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Write updated counts to file atomically."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return
+            counts = self._read()
+            self._merge(counts, self._counts)
+            folder = os.path.dirname(self.file_path)
+            if not os.path.exists(folder):
+                os.makedirs(folder)
+            file_descriptor, temp_path = tempfile.mkstemp(dir=folder)
+            with os.fdopen(file_descriptor, 'w') as counts_file:
+                json.dump(counts, counts_file)
+            os.replace(temp_path, self.file_path)
+            self._counts = counts
+            self._file_signature = self._signature()
+            self._dirty = False
@@ -0,0 +1,224 @@
+from datetime import date
+
+MISSING = object()
+
+# Value of lazy field that is not loaded yet
+NOT_LOADED = object()
+
+
+def serialize_date(value):
+    """Serialize date to string that is saved in json.
+
+    :param value: date or string that already serialized
+    :type value: date, str
+
+    :rtype: str
+    """
+    if isinstance(value, date):
+        return value.strftime('%Y-%m-%d')
+    return value
+
+
+class Field(object):
+    """
+    Field of model schema.
+    """
+    __slots__ = (
+        'name', 'default', 'parse', 'serialize', 'in_json', 'public', 'lazy')
+
+    def __init__(
+            self,
+            name,
+            default=None,
+            parse=None,
+            serialize=None,
+            in_json=True,
+            public=True,
+            lazy=False):
+        """
+        :param name: name of attribute
+        :type name: str
+
+        :param default: default value, or function that returns a new
+            default value, it should be used for mutable values.
+        :type default: object
+
+        :param parse: function that converts value from json
+        :type parse: function
+
+        :param serialize: function that converts value to json
+        :type serialize: function
+
+        :param in_json: field is saved in json document
+        :type in_json: bool
+
+        :param public: field is returned by to_dict
+        :type public: bool
+
+        :param lazy: field is not loaded in summary mode, it is loaded
+            by `load_lazy_field(name)` of model when first accessed
+        :type lazy: bool
+        """
+        self.name = name
+        self.default = default
+        self.parse = parse
+        self.serialize = serialize
+        self.in_json = in_json
+        self.public = public
+        self.lazy = lazy
+
+    @property
+    def slot(self):
+        """Name of slot that holds value of field."""
+        if self.lazy:
+            return '_%s_value' % self.name
+        return self.name
+
+
+def lazy_property(name, slot):
+    """Return property that loads lazy field on first access.
+
+    :param name: name of field
+    :type name: str
+
+    :param slot: name of slot that holds the value
+    :type slot: str
+    """
+
+    def get_value(self):
+        value = getattr(self, slot)
+        if value is NOT_LOADED:
+            value = self.load_lazy_field(name)
+            setattr(self, slot, value)
+        return value
+
+    def set_value(self, value):
+        setattr(self, slot, value)
+
+    return property(get_value, set_value)
+
+
+class SchemaMeta(type):
+    """
+    Metaclass that turns `schema` of a model into `__slots__` and
+    compiles functions that set defaults, read and write json.
+
+    Fields of base classes are inherited. Subclasses without schema
+    do not declare `__slots__`, so they could have other attributes.
+    Lazy fields are stored in `_<name>_value` slot behind a property.
+    Every class gets:
+    - `init_fields(self, summary=False)`: set default value of every
+      field, lazy fields are marked as not loaded in summary mode
+    - `from_json(self, data, summary=False)`: set fields that are in
+      json data, unknown keys are kept in `_extra` if model has that
+      field, lazy fields are skipped in summary mode
+    - `to_json(self, summary=False)`: return json data of fields that
+      are in json, without lazy fields in summary mode
+    - `to_dict(self)`: return public fields as dictionary
+    """
+
+    def __new__(mcs, name, bases, namespace):
+        own_fields = tuple(namespace.get('schema', ()))
+        if 'schema' in namespace:
+            namespace['__slots__'] = tuple(
+                field.slot for field in own_fields)
+            for field in own_fields:
+                if field.lazy:
+                    namespace[field.name] = lazy_property(
+                        field.name, field.slot)
+        cls = super(SchemaMeta, mcs).__new__(mcs, name, bases, namespace)
+
+        fields = []
+        for base in reversed(cls.__mro__[1:]):
+            for field in base.__dict__.get('schema', ()):
+                fields.append(field)
+        fields.extend(own_fields)
+        cls.fields = tuple(fields)
+        cls.field_names = frozenset(field.name for field in fields)
+        mcs.compile(cls)
+        return cls
+
+    @staticmethod
+    def compile(cls):
+        """Generate functions of schema of class."""
+        namespace = {'MISSING': MISSING, 'NOT_LOADED': NOT_LOADED}
+        has_extra = '_extra' in cls.field_names
+        json_names = set(
+            field.name for field in cls.fields if field.in_json)
+
+        init_lines = ['def init_fields(self, summary=False):']
+        from_json_lines = [
+            'def from_json(self, data, summary=False):',
+            '    found = 0'
+        ]
+        to_json_lines = ['def to_json(self, summary=False):']
+        if has_extra:
+            to_json_lines.append('    data = dict(self._extra)')
+        else:
+            to_json_lines.append('    data = {}')
+        to_dict_lines = ['def to_dict(self):', '    data = {}']
+
+        for index, field in enumerate(cls.fields):
+            attribute = 'self.%s' % field.name
+            slot = 'self.%s' % field.slot
+            namespace['default_%s' % index] = field.default
+            default = 'default_%s' % index
+            if callable(field.default):
+                default += '()'
+            if field.lazy:
+                default = 'NOT_LOADED if summary else %s' % default
+            init_lines.append('    %s = %s' % (slot, default))
+
+            if field.public:
+                to_dict_lines.append(
+                    '    data[%r] = %s' % (field.name, attribute))
+
+            if not field.in_json:
+                continue
+
+            value = 'value'
+            if field.parse:
+                namespace['parse_%s' % index] = field.parse
+                value = 'parse_%s(value)' % index
+            from_json_lines.extend([
+                '    value = data.get(%r, MISSING)' % field.name,
+                '    if value is not MISSING:',
+                '        found += 1'
+            ])
+            indent = '        '
+            if field.lazy:
+                from_json_lines.append('        if not summary:')
+                indent += '    '
+            from_json_lines.append('%s%s = %s' % (indent, slot, value))
+
+            value = attribute
+            if field.serialize:
+                namespace['serialize_%s' % index] = field.serialize
+                value = 'serialize_%s(%s)' % (index, attribute)
+            indent = '    '
+            if field.lazy:
+                to_json_lines.append('    if not summary:')
+                indent += '    '
+            to_json_lines.append(
+                '%sdata[%r] = %s' % (indent, field.name, value))
+
+        if len(init_lines) == 1:
+            init_lines.append('    pass')
+        if has_extra:
+            namespace['JSON_NAMES'] = frozenset(json_names)
+            from_json_lines.extend([
+                '    if found < len(data):',
+                '        self._extra = {',
+                '            key: value for key, value in data.items()',
+                '            if key not in JSON_NAMES}',
+            ])
+        to_json_lines.append('    return data')
+        to_dict_lines.append('    return data')
+
+        source = '\n'.join(
+            init_lines + from_json_lines + to_json_lines + to_dict_lines)
+        exec(compile(source, '<schema %s>' % cls.__name__, 'exec'), namespace)
+        for function_name in ('init_fields', 'from_json', 'to_json',
+                              'to_dict'):
+            if function_name not in cls.__dict__:
+                setattr(cls, function_name, namespace[function_name])
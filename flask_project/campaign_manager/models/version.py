@@ -1,11 +1,15 @@
 __author__ = 'Irwan Fathurrahman <irwan@kartoza.com>'
 __date__ = '10/05/17'
 
+from campaign_manager.models.schema import Field, SchemaMeta
 
-class Version(object):
+
+class Version(object, metaclass=SchemaMeta):
     """
     Version model for tracking versions.
     """
-    version = 0.0
-    edited_by = ''
-    edited_at = ''
+    schema = (
+        Field('version', 0.0),
+        Field('edited_by', ''),
+        Field('edited_at', ''),
+    )
@@ -0,0 +1,13 @@
+from campaign_manager.models.campaign import (
+    catalog,
+    metadata_store
+)
+
+
+def rebuild_campaign_catalog():
+    """Rebuild sqlite catalog of campaign metadata from campaign files."""
+    if not metadata_store:
+        print('Campaign metadata database is not configured.')
+        return
+    total = metadata_store.rebuild(catalog)
+    print('%s campaigns are in %s' % (total, metadata_store.database_path))
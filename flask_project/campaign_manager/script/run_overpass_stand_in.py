@@ -0,0 +1,33 @@
+from reporter.overpass_stand_in import OverpassStandIn
+
+
+def run_overpass_stand_in(
+        osm_file,
+        port=8090,
+        latency=0,
+        jitter=0,
+        timeout_rate=0,
+        busy_rate=0,
+        slots=None):
+    """Serve Overpass queries from an OSM extract until interrupted.
+
+    Point DEFAULT_OVERPASS_URL and ATTIC_DATA_SERVER_URL, or
+    OVERPASS_ENDPOINTS, to the printed url to use it.
+    """
+    stand_in = OverpassStandIn(
+        osm_file,
+        port=port,
+        latency=latency,
+        jitter=jitter,
+        timeout_rate=timeout_rate,
+        busy_rate=busy_rate,
+        slots=slots)
+    print('Serving %s at %s' % (osm_file, stand_in.url))
+    try:
+        stand_in.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stand_in.server.server_close()
+    print('%s queries, %s busy answers, %s timeouts' % (
+        len(stand_in.queries), stand_in.busy_answers, stand_in.timeouts))
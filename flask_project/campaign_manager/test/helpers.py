@@ -8,6 +8,7 @@ from campaign_manager.models.campaign import Campaign
 class CampaignObjectTest(Campaign):
 
     def __init__(self):
+        self.init_fields()
         self.uuid = 'testcampaign'
         self.name = 'test'
         self.campaign_creator = 'anita'
@@ -1,11 +1,27 @@
+import os
+import shutil
+import tempfile
 from unittest import TestCase, mock
+
+from flask import Flask
+
+from app_config import Config
+from campaign_manager import campaign_manager
 from campaign_manager.api import (
     CampaignList,
     CampaignNearestList,
     CampaignTagList,
     CampaignTotal
 )
+from campaign_manager.models import campaign as campaign_model
 from campaign_manager.models.campaign import Campaign
+from campaign_manager.models.campaign_spatial_index import (
+    CampaignSpatialIndex
+)
+from campaign_manager.test.test_campaign_catalog import write_campaign
+
+app = Flask(__name__)
+app.register_blueprint(campaign_manager)
 
 
 def mock_get_campaign():
@@ -19,10 +35,6 @@ def mock_get_campaign():
         'test_manager2',
         'test_creator'
     ]
-    campaign._content_json = {
-        'name': campaign.name,
-        'uuid': campaign.uuid
-    }
     return [campaign]
 
 
@@ -30,10 +42,6 @@ def mock_get_nearest_campaign(coordinate):
     campaign = Campaign()
     campaign.uuid = '111'
     campaign.name = 'test'
-    campaign._content_json = {
-        'name': campaign.name,
-        'uuid': campaign.uuid
-    }
     return [campaign]
 
 
@@ -41,10 +49,6 @@ def mock_get_campaigns_with_tag(tag):
     campaign = Campaign()
     campaign.uuid = '111'
     campaign.name = 'test'
-    campaign._content_json = {
-        'name': campaign.name,
-        'uuid': campaign.uuid
-    }
     return [campaign]
 
 
@@ -83,7 +87,8 @@ class TestApi(TestCase):
     def test_get_campaign_with_tag(self, mock_get_campaigns_with_tag):
         """Test get all nearest campaign."""
         tag = 'tag'
-        campaigns = CampaignTagList().get(tag)
+        with app.test_request_context('/campaigns/tag'):
+            campaigns, status, headers = CampaignTagList().get(tag)
         self.assertEqual(len(campaigns), 1)
         self.assertEqual(campaigns[0]['name'], 'test')
 
@@ -95,3 +100,114 @@ class TestApi(TestCase):
 
         self.assertEqual(response['campaign_total'], 1)
         self.assertEqual(response['participant_total'], 3)
+
+
+class TestCampaignListRepresentation(TestCase):
+    """Test fields projection and ETag of campaign list."""
+
+    def setUp(self):
+        """Constructor."""
+        self.data_folder = tempfile.mkdtemp()
+        self.json_folder = os.path.join(self.data_folder, 'campaign')
+        os.mkdir(self.json_folder)
+        self.config_patch = mock.patch.object(
+            Config, 'campaigner_data_folder', self.data_folder)
+        self.config_patch.start()
+        self.store_patch = mock.patch.object(
+            campaign_model, 'metadata_store', None)
+        self.store_patch.start()
+        campaign_model.catalog.invalidate()
+        write_campaign(self.json_folder, 'first', 'First campaign')
+        self.client = app.test_client()
+
+    def tearDown(self):
+        """Destructor."""
+        self.store_patch.stop()
+        self.config_patch.stop()
+        campaign_model.catalog.invalidate()
+        shutil.rmtree(self.data_folder)
+
+    def test_fields(self):
+        response = self.client.get('/campaigns/all?fields=uuid,geometry')
+        campaign = response.get_json()[0]
+        self.assertEqual(sorted(campaign.keys()), ['geometry', 'uuid'])
+
+        response = self.client.get('/campaigns/all?fields=card')
+        campaign = response.get_json()[0]
+        self.assertEqual(campaign['name'], 'First campaign')
+        self.assertNotIn('geometry', campaign)
+        self.assertNotIn('total_participants_count', campaign)
+
+    def test_etag(self):
+        response = self.client.get('/campaigns/all')
+        etag = response.headers['ETag']
+        response = self.client.get(
+            '/campaigns/all', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers['ETag'], etag)
+
+        response = self.client.get(
+            '/campaigns/all?fields=card', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+
+        write_campaign(self.json_folder, 'second', 'Second campaign')
+        campaign_model.catalog.invalidate()
+        response = self.client.get(
+            '/campaigns/all', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.get_json()), 2)
+
+    def test_cursor_paging(self):
+        write_campaign(self.json_folder, 'second', 'Second campaign')
+        write_campaign(self.json_folder, 'third', 'Third campaign')
+        campaign_model.catalog.invalidate()
+
+        response = self.client.get('/campaigns/all?limit=2&cursor=')
+        self.assertEqual(response.status_code, 200)
+        names = [campaign['name'] for campaign in response.get_json()]
+        self.assertEqual(names, ['First campaign', 'Second campaign'])
+        next_cursor = response.headers['X-Next-Cursor']
+
+        response = self.client.get(
+            '/campaigns/all', query_string={
+                'limit': 2, 'cursor': next_cursor})
+        self.assertEqual(response.status_code, 200)
+        names = [campaign['name'] for campaign in response.get_json()]
+        self.assertEqual(names, ['Third campaign'])
+        self.assertNotIn('X-Next-Cursor', response.headers)
+
+        response = self.client.get(
+            '/campaigns/all?sort_by=recent&per_page=1&page=2')
+        self.assertEqual(len(response.get_json()), 1)
+        response = self.client.get('/campaigns/all?cursor=invalid')
+        self.assertEqual(response.status_code, 400)
+
+    def test_nearest_campaign_arguments(self):
+        cache_patch = mock.patch.object(
+            Config, 'campaigner_cache_folder', self.data_folder)
+        index_patch = mock.patch.object(
+            campaign_model, 'spatial_index', CampaignSpatialIndex(
+                os.path.join(self.data_folder, 'index.json')))
+        with cache_patch, index_patch:
+            self.check_nearest_campaign_arguments()
+
+    def check_nearest_campaign_arguments(self):
+        write_campaign(
+            self.json_folder, 'second', 'Second campaign', offset=2)
+        write_campaign(
+            self.json_folder, 'third', 'Third campaign', offset=4)
+        campaign_model.catalog.invalidate()
+        url = '/nearest_campaigns/all?lat=-34.02&lon=20.44'
+
+        response = self.client.get(url + '&radius=250')
+        names = [campaign['name'] for campaign in response.get_json()]
+        self.assertEqual(names, ['First campaign', 'Second campaign'])
+        response = self.client.get(url + '&radius=0.5')
+        names = [campaign['name'] for campaign in response.get_json()]
+        self.assertEqual(names, ['First campaign'])
+
+        response = self.client.get(url + '&per_page=10')
+        self.assertEqual(len(response.get_json()), 3)
+        response = self.client.get(url + '&per_page=2&page=2')
+        names = [campaign['name'] for campaign in response.get_json()]
+        self.assertEqual(names, ['Third campaign'])
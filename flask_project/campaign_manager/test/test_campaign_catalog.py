@@ -0,0 +1,177 @@
+# coding=utf-8
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from app_config import Config
+from campaign_manager.models.campaign import Campaign
+from campaign_manager.models.campaign_catalog import CampaignCatalog
+
+
+def write_campaign(folder, uuid, name, end_date='2017-02-01', mtime=None,
+                   types=None, offset=0):
+    """Write campaign json and geojson file to folder."""
+    data = {
+        'uuid': uuid,
+        'version': 1,
+        'campaign_creator': 'anita',
+        'edited_by': 'anita',
+        'name': name,
+        'types': types or {},
+        'start_date': '2017-01-01',
+        'end_date': end_date
+    }
+    json_path = os.path.join(folder, '%s.json' % uuid)
+    with open(json_path, 'w') as _file:
+        _file.write(json.dumps(data))
+    if mtime:
+        os.utime(json_path, (mtime, mtime))
+    geometry = {
+        'type': 'FeatureCollection',
+        'features': [{
+            'type': 'Feature', 'properties': {},
+            'geometry': {
+                'type': 'Polygon',
+                'coordinates': [[
+                    [20.43 + offset, -34.02], [20.44 + offset, -34.03],
+                    [20.45 + offset, -34.02], [20.43 + offset, -34.02]]]
+            }
+        }]
+    }
+    with open(os.path.join(folder, '%s.geojson' % uuid), 'w') as _file:
+        _file.write(json.dumps(geometry))
+
+
+class CampaignCatalogTestCase(unittest.TestCase):
+    """Test catalog of parsed campaigns."""
+
+    def setUp(self):
+        """Constructor."""
+        self.data_folder = tempfile.mkdtemp()
+        self.json_folder = os.path.join(self.data_folder, 'campaign')
+        os.mkdir(self.json_folder)
+        self.config_patch = mock.patch.object(
+            Config, 'campaigner_data_folder', self.data_folder)
+        self.config_patch.start()
+        self.catalog = CampaignCatalog(Campaign)
+        write_campaign(self.json_folder, 'first', 'First campaign')
+        write_campaign(self.json_folder, 'second', 'Second campaign')
+
+    def tearDown(self):
+        """Destructor."""
+        self.config_patch.stop()
+        shutil.rmtree(self.data_folder)
+
+    def test_all(self):
+        campaigns = self.catalog.all()
+        self.assertEqual(
+            [campaign.uuid for campaign in campaigns], ['first', 'second'])
+        self.assertEqual(campaigns[0].name, 'First campaign')
+
+    def test_unchanged_campaign_is_not_parsed_again(self):
+        with mock.patch.object(
+                Campaign, 'parse_json_file',
+                autospec=True,
+                side_effect=Campaign.parse_json_file) as parse_json_file:
+            self.catalog.all()
+            self.catalog.all()
+            self.catalog.get('first')
+            self.assertEqual(parse_json_file.call_count, 2)
+
+    def test_changed_campaign_is_parsed_again(self):
+        self.assertEqual(self.catalog.get('first').name, 'First campaign')
+        write_campaign(self.json_folder, 'first', 'Renamed first campaign')
+        self.assertEqual(
+            self.catalog.get('first').name, 'Renamed first campaign')
+
+    def test_deleted_campaign(self):
+        self.catalog.all()
+        os.remove(os.path.join(self.json_folder, 'second.json'))
+        self.assertEqual(len(self.catalog.all()), 1)
+        self.assertRaises(
+            Campaign.DoesNotExist, self.catalog.get, 'second')
+
+    def test_get_returns_copy(self):
+        campaign = self.catalog.get('first')
+        campaign.name = 'Changed'
+        self.assertEqual(self.catalog.get('first').name, 'First campaign')
+
+
+class CampaignSortIndexTestCase(unittest.TestCase):
+    """Test sorted and paginated campaign listing."""
+
+    def setUp(self):
+        """Constructor."""
+        self.data_folder = tempfile.mkdtemp()
+        self.json_folder = os.path.join(self.data_folder, 'campaign')
+        os.mkdir(self.json_folder)
+        self.config_patch = mock.patch.object(
+            Config, 'campaigner_data_folder', self.data_folder)
+        self.config_patch.start()
+        self.catalog = CampaignCatalog(Campaign)
+        write_campaign(self.json_folder, 'a', 'Delta', mtime=1000)
+        write_campaign(self.json_folder, 'b', 'Alpha', mtime=4000)
+        write_campaign(self.json_folder, 'c', 'Charlie', mtime=2000)
+        write_campaign(
+            self.json_folder, 'd', 'Bravo', end_date='2999-01-01',
+            mtime=3000)
+
+    def tearDown(self):
+        """Destructor."""
+        self.config_patch.stop()
+        shutil.rmtree(self.data_folder)
+
+    def names(self, campaigns):
+        return [campaign.name for campaign in campaigns]
+
+    def test_sort_by_name(self):
+        campaigns, next_cursor = self.catalog.page('all')
+        self.assertEqual(
+            self.names(campaigns), ['Alpha', 'Bravo', 'Charlie', 'Delta'])
+        self.assertIsNone(next_cursor)
+
+    def test_sort_by_recent(self):
+        campaigns, next_cursor = self.catalog.page('all', sort_by='recent')
+        self.assertEqual(
+            self.names(campaigns), ['Alpha', 'Bravo', 'Charlie', 'Delta'])
+        os.utime(
+            os.path.join(self.json_folder, 'a.json'), (5000, 5000))
+        campaigns, next_cursor = self.catalog.page('all', sort_by='recent')
+        self.assertEqual(
+            self.names(campaigns), ['Delta', 'Alpha', 'Bravo', 'Charlie'])
+
+    def test_status(self):
+        campaigns, next_cursor = self.catalog.page('active')
+        self.assertEqual(self.names(campaigns), ['Bravo'])
+        campaigns, next_cursor = self.catalog.page('inactive')
+        self.assertEqual(
+            self.names(campaigns), ['Alpha', 'Charlie', 'Delta'])
+        campaigns, next_cursor = self.catalog.page(None)
+        self.assertEqual(campaigns, [])
+
+    def test_page(self):
+        campaigns, next_cursor = self.catalog.page(
+            'all', per_page=3, page=2)
+        self.assertEqual(self.names(campaigns), ['Delta'])
+
+    def test_cursor(self):
+        campaigns, next_cursor = self.catalog.page(
+            'all', per_page=3, cursor='')
+        self.assertEqual(
+            self.names(campaigns), ['Alpha', 'Bravo', 'Charlie'])
+        campaigns, next_cursor = self.catalog.page(
+            'all', per_page=3, cursor=next_cursor)
+        self.assertEqual(self.names(campaigns), ['Delta'])
+        self.assertIsNone(next_cursor)
+        self.assertRaises(
+            ValueError, self.catalog.page, 'all', cursor='invalid')
+
+    def test_only_page_is_copied(self):
+        with mock.patch(
+                'campaign_manager.models.campaign_catalog.copy.copy',
+                side_effect=lambda campaign: campaign) as copy_campaign:
+            self.catalog.page('all', per_page=2)
+            self.assertEqual(copy_campaign.call_count, 2)
@@ -0,0 +1,83 @@
+# coding=utf-8
+import copy
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from app_config import Config
+from campaign_manager.models.campaign import Campaign
+from campaign_manager.test.test_campaign_catalog import write_campaign
+
+
+class CampaignGeometryTestCase(unittest.TestCase):
+    """Test geometry derived from campaign geojson."""
+
+    def setUp(self):
+        """Constructor."""
+        self.data_folder = tempfile.mkdtemp()
+        self.cache_folder = tempfile.mkdtemp()
+        self.json_folder = os.path.join(self.data_folder, 'campaign')
+        os.mkdir(self.json_folder)
+        self.patches = [
+            mock.patch.object(
+                Config, 'campaigner_data_folder', self.data_folder),
+            mock.patch.object(
+                Config, 'campaigner_cache_folder', self.cache_folder)
+        ]
+        for patch in self.patches:
+            patch.start()
+        write_campaign(self.json_folder, 'first', 'First campaign')
+
+    def tearDown(self):
+        """Destructor."""
+        for patch in self.patches:
+            patch.stop()
+        shutil.rmtree(self.data_folder)
+        shutil.rmtree(self.cache_folder)
+
+    def test_derived_geometry(self):
+        campaign = Campaign('first')
+        self.assertEqual(
+            campaign.corrected_coordinates()[0], [-34.02, 20.43])
+        self.assertEqual(
+            campaign.get_overpass_polygon().split(' ')[:2],
+            ['-34.02', '20.43'])
+        self.assertEqual(campaign.get_bbox(), [-34.03, 20.43, -34.02, 20.45])
+        self.assertTrue(
+            os.path.exists(
+                os.path.join(self.cache_folder, 'geometry', 'first.json')))
+
+    def test_memoized(self):
+        campaign = Campaign('first')
+        campaign_copy = copy.copy(campaign)
+        campaign.get_union_polygons()
+        self.assertIs(
+            campaign_copy.get_derived_geometry(),
+            campaign.get_derived_geometry())
+        with mock.patch.object(
+                Campaign, 'compute_union_polygons') as compute:
+            campaign_copy.get_union_polygons()
+            Campaign('first').get_union_polygons()
+            self.assertEqual(compute.call_count, 0)
+
+    def test_new_version_is_computed(self):
+        campaign = Campaign('first')
+        campaign.get_union_polygons()
+        campaign.version += 1
+        with mock.patch.object(
+                Campaign, 'compute_union_polygons',
+                autospec=True,
+                side_effect=Campaign.compute_union_polygons) as compute:
+            campaign.get_union_polygons()
+            self.assertEqual(compute.call_count, 1)
+
+    def test_edited_geojson_is_computed(self):
+        Campaign('first').get_union_polygons()
+        write_campaign(self.json_folder, 'first', 'First campaign', offset=1)
+        # same size, so only mtime tells that geojson changed
+        os.utime(
+            os.path.join(self.json_folder, 'first.geojson'), (1000, 1000))
+        self.assertEqual(
+            Campaign('first').get_bbox(), [-34.03, 21.43, -34.02, 21.45])
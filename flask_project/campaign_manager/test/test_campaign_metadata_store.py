@@ -0,0 +1,128 @@
+# coding=utf-8
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from app_config import Config
+from campaign_manager.models.campaign import Campaign
+from campaign_manager.models.campaign_catalog import (
+    CampaignCatalog,
+    CampaignSortIndex
+)
+from campaign_manager.models.campaign_metadata_store import (
+    CampaignMetadataStore,
+    radius_bbox
+)
+from campaign_manager.test.test_campaign_catalog import write_campaign
+
+BUILDING_TYPES = {
+    'Buildings': {'feature': 'building', 'tags': {'building': []}}
+}
+
+
+class CampaignMetadataStoreTestCase(unittest.TestCase):
+    """Test sqlite catalog of campaign metadata."""
+
+    def setUp(self):
+        """Constructor."""
+        self.data_folder = tempfile.mkdtemp()
+        self.cache_folder = tempfile.mkdtemp()
+        self.json_folder = os.path.join(self.data_folder, 'campaign')
+        os.mkdir(self.json_folder)
+        self.patches = [
+            mock.patch.object(
+                Config, 'campaigner_data_folder', self.data_folder),
+            mock.patch.object(
+                Config, 'campaigner_cache_folder', self.cache_folder)
+        ]
+        for patch in self.patches:
+            patch.start()
+        self.catalog = CampaignCatalog(Campaign)
+        self.store = CampaignMetadataStore(
+            os.path.join(self.cache_folder, 'campaign.sqlite3'))
+        write_campaign(
+            self.json_folder, 'a', 'Delta', mtime=1000, offset=0)
+        write_campaign(
+            self.json_folder, 'b', 'Alpha', mtime=4000, offset=2,
+            types=BUILDING_TYPES)
+        write_campaign(
+            self.json_folder, 'c', 'Charlie', mtime=2000, offset=4)
+        write_campaign(
+            self.json_folder, 'd', 'Bravo', end_date='2999-01-01',
+            mtime=3000, offset=6, types=BUILDING_TYPES)
+        self.store.sync(self.catalog)
+
+    def tearDown(self):
+        """Destructor."""
+        for patch in self.patches:
+            patch.stop()
+        shutil.rmtree(self.data_folder)
+        shutil.rmtree(self.cache_folder)
+
+    def uuids(self, rows):
+        return [row[1] for row in rows]
+
+    def test_page(self):
+        rows, has_more = self.store.page('all')
+        self.assertEqual(self.uuids(rows), ['b', 'd', 'c', 'a'])
+        self.assertFalse(has_more)
+        rows, has_more = self.store.page('all', sort_by='recent')
+        self.assertEqual(self.uuids(rows), ['b', 'd', 'c', 'a'])
+        rows, has_more = self.store.page('all', per_page=3)
+        self.assertTrue(has_more)
+        rows, has_more = self.store.page('all', per_page=3, page=2)
+        self.assertEqual(self.uuids(rows), ['a'])
+
+    def test_cursor_matches_sort_index(self):
+        sort_index_rows = self.catalog.sort_index.rows('all', 'recent')
+        rows, has_more = self.store.page(
+            'all', sort_by='recent', per_page=2,
+            after=CampaignSortIndex.decode_cursor(
+                CampaignSortIndex.encode_cursor(sort_index_rows[0])))
+        self.assertEqual(rows, sort_index_rows[1:3])
+        self.assertRaises(
+            ValueError, self.store.page, 'all', sort_by='recent',
+            after=('Alpha', 'b'))
+
+    def test_status_and_tag(self):
+        rows, has_more = self.store.page('active')
+        self.assertEqual(self.uuids(rows), ['d'])
+        rows, has_more = self.store.page('inactive', tag='building')
+        self.assertEqual(self.uuids(rows), ['b'])
+        rows, has_more = self.store.page(None)
+        self.assertEqual(rows, [])
+
+    def test_nearest(self):
+        rows = self.store.nearest(24.0, -34.02, 'all', limit=2)
+        self.assertEqual([row[0] for row in rows], ['c', 'b'])
+        every_row = self.store.nearest(24.0, -34.02, 'all')
+        self.assertEqual(every_row[:2], rows)
+        self.assertEqual(
+            self.store.nearest(24.0, -34.02, 'all', limit=2, offset=2),
+            every_row[2:])
+        # radius grows until far campaigns are found
+        far_rows = self.store.nearest(-160.0, 60.0, 'all', limit=3)
+        self.assertEqual(
+            far_rows, self.store.nearest(-160.0, 60.0, 'all')[:3])
+        self.assertEqual(len(far_rows), 3)
+        self.assertEqual(
+            self.store.intersects_radius(20.44, -34.0, 50, 'all'), ['a'])
+
+    def test_radius_bbox(self):
+        min_x, min_y, max_x, max_y = radius_bbox(20.0, -34.0, 100)
+        self.assertAlmostEqual(max_y - min_y, 1.8, 1)
+        self.assertTrue(max_x - min_x > max_y - min_y)
+        self.assertEqual(radius_bbox(179.9, 0, 100)[::2], (-180, 180))
+        self.assertEqual(radius_bbox(0, 89.9, 100)[3], 90)
+        self.assertIsNone(radius_bbox(0, 0, 30000))
+
+    def test_sync_changed_campaign(self):
+        write_campaign(
+            self.json_folder, 'a', 'Echo', mtime=5000, offset=0)
+        os.remove(os.path.join(self.json_folder, 'c.json'))
+        self.store.sync(self.catalog)
+        rows, has_more = self.store.page('all')
+        self.assertEqual(self.uuids(rows), ['b', 'd', 'a'])
+        self.assertEqual(rows[-1][0], 'Echo')
@@ -0,0 +1,119 @@
+# coding=utf-8
+import copy
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date
+from unittest import mock
+
+from app_config import Config
+from campaign_manager.models.campaign import Campaign
+from campaign_manager.test.test_campaign_catalog import write_campaign
+
+
+class CampaignSchemaTestCase(unittest.TestCase):
+    """Test declarative schema of campaign."""
+
+    def setUp(self):
+        """Constructor."""
+        self.data = {
+            'uuid': 'first',
+            'version': 2,
+            'campaign_creator': 'anita',
+            'edited_by': 'anita',
+            'name': 'First campaign',
+            'start_date': '2017-01-01',
+            'end_date': None,
+            'types': {
+                'Health': {
+                    'feature': 'amenity',
+                    'tags': ['amenity[hospital,clinic]', 'name']
+                }
+            },
+            'uploader': 'anita'
+        }
+
+    def test_slots(self):
+        campaign = Campaign()
+        self.assertFalse(hasattr(campaign, '__dict__'))
+        self.assertRaises(AttributeError, setattr, campaign, 'unknown', 1)
+
+    def test_mutable_defaults_are_not_shared(self):
+        campaign = Campaign()
+        campaign.campaign_managers.append('anita')
+        campaign.participants_count_per_type['Health'] = 2
+        self.assertEqual(Campaign().campaign_managers, [])
+        self.assertEqual(Campaign().participants_count_per_type, {})
+
+    def test_from_json(self):
+        campaign = Campaign()
+        campaign.from_json(self.data)
+        self.assertEqual(campaign.name, 'First campaign')
+        self.assertEqual(campaign.version, 2)
+        self.assertEqual(
+            campaign.types['Health']['tags'],
+            {'amenity': ['hospital', 'clinic'], 'name': []})
+        self.assertEqual(campaign.description, '')
+
+    def test_to_json(self):
+        campaign = Campaign()
+        campaign.from_json(self.data)
+        campaign.update({'start_date': date(2017, 2, 1), 'submit': True})
+        data = campaign.to_json()
+        self.assertEqual(data['start_date'], '2017-02-01')
+        self.assertEqual(data['uploader'], 'anita')
+        self.assertTrue(data['submit'])
+        self.assertNotIn('geometry', data)
+        self.assertNotIn('json_path', data)
+        self.assertIn('geometry', campaign.to_dict())
+
+    def test_update_does_not_change_copies(self):
+        campaign = Campaign()
+        campaign.from_json(self.data)
+        campaign_copy = copy.copy(campaign)
+        campaign_copy.update({'campaign_status': 'start'})
+        self.assertNotIn('campaign_status', campaign.to_json())
+        self.assertEqual(campaign_copy.to_json()['campaign_status'], 'start')
+
+
+class CampaignLazyFieldTestCase(unittest.TestCase):
+    """Test summary mode and lazy fields of campaign."""
+
+    def setUp(self):
+        """Constructor."""
+        self.data_folder = tempfile.mkdtemp()
+        self.json_folder = os.path.join(self.data_folder, 'campaign')
+        os.mkdir(self.json_folder)
+        self.config_patch = mock.patch.object(
+            Config, 'campaigner_data_folder', self.data_folder)
+        self.config_patch.start()
+        write_campaign(self.json_folder, 'first', 'First campaign')
+
+    def tearDown(self):
+        """Destructor."""
+        self.config_patch.stop()
+        shutil.rmtree(self.data_folder)
+
+    def test_summary(self):
+        campaign = Campaign('first', summary=True)
+        self.assertFalse(campaign.is_loaded('geometry'))
+        self.assertFalse(campaign.is_loaded('coverage'))
+        self.assertNotIn('coverage', campaign.to_json(summary=True))
+        self.assertEqual(campaign.get_current_status(), 'inactive')
+        self.assertFalse(campaign.is_loaded('geometry'))
+
+        self.assertEqual(campaign.geometry['type'], 'FeatureCollection')
+        self.assertTrue(campaign.is_loaded('geometry'))
+        self.assertEqual(campaign.selected_functions, [])
+
+    def test_coverage_file(self):
+        self.assertEqual(Campaign('first', summary=True).coverage, {})
+        with open(Campaign.get_coverage_file('first'), 'w') as _file:
+            _file.write(json.dumps({'last_uploader': 'anita'}))
+        self.assertEqual(
+            Campaign('first', summary=True).coverage,
+            {'last_uploader': 'anita'})
+        self.assertEqual(
+            Campaign('first').coverage, {'last_uploader': 'anita'})
@@ -0,0 +1,90 @@
+# coding=utf-8
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from shapely.geometry import box
+
+from campaign_manager.models.campaign_spatial_index import (
+    CampaignSpatialIndex
+)
+
+
+class SquareCampaign(object):
+    """Campaign with square area around a coordinate."""
+
+    def __init__(self, uuid, lon, lat, version=1):
+        self.uuid = uuid
+        self.version = version
+        self.lon = lon
+        self.lat = lat
+
+    def get_union_polygons(self):
+        return box(
+            self.lon - 0.01, self.lat - 0.01,
+            self.lon + 0.01, self.lat + 0.01)
+
+
+class CampaignSpatialIndexTestCase(unittest.TestCase):
+    """Test spatial index of campaigns."""
+
+    def setUp(self):
+        """Constructor."""
+        self.cache_folder = tempfile.mkdtemp()
+        self.index_path = os.path.join(self.cache_folder, 'index.json')
+        self.index = CampaignSpatialIndex(self.index_path)
+        self.campaigns = [
+            # Cape Town, Swellendam, Jakarta
+            SquareCampaign('cape-town', 18.42, -33.92),
+            SquareCampaign('swellendam', 20.44, -34.02),
+            SquareCampaign('jakarta', 106.84, -6.2)
+        ]
+        self.index.sync(self.campaigns)
+
+    def tearDown(self):
+        """Destructor."""
+        shutil.rmtree(self.cache_folder)
+
+    def test_nearest(self):
+        rows = self.index.nearest(20.4, -34.0)
+        self.assertEqual(
+            [uuid for uuid, distance in rows],
+            ['swellendam', 'cape-town', 'jakarta'])
+        self.assertAlmostEqual(rows[1][1], 183, delta=1)
+
+        rows = self.index.nearest(106.0, -6.0, k=1)
+        self.assertEqual(rows[0][0], 'jakarta')
+
+        rows = self.index.nearest(
+            20.4, -34.0, k=1, accept=lambda uuid: uuid != 'swellendam')
+        self.assertEqual(rows[0][0], 'cape-town')
+
+    def test_within(self):
+        rows = self.index.within(20.4, -34.0, 100)
+        self.assertEqual([uuid for uuid, distance in rows], ['swellendam'])
+        rows = self.index.within(20.4, -34.0, 300)
+        self.assertEqual(
+            [uuid for uuid, distance in rows], ['swellendam', 'cape-town'])
+
+    def test_persisted(self):
+        index = CampaignSpatialIndex(self.index_path)
+        self.assertEqual(len(index.entries()), 3)
+        self.assertEqual(index.nearest(106.0, -6.0, k=1)[0][0], 'jakarta')
+        with open(self.index_path) as index_file:
+            self.assertEqual(
+                sorted(json.load(index_file).keys()),
+                ['cape-town', 'jakarta', 'swellendam'])
+
+        # index in another format is not loaded
+        with open(self.index_path, 'wb') as index_file:
+            index_file.write(b'\x80\x04\x95')
+        self.assertEqual(CampaignSpatialIndex(self.index_path).entries(), {})
+
+    def test_sync(self):
+        moved = SquareCampaign('jakarta', 20.5, -34.0, version=2)
+        self.index.sync([self.campaigns[0], moved])
+        rows = self.index.nearest(20.4, -34.0)
+        self.assertEqual(
+            [uuid for uuid, distance in rows], ['jakarta', 'cape-town'])
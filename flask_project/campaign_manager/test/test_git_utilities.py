@@ -0,0 +1,97 @@
+# coding=utf-8
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+
+from app_config import Config
+from campaign_manager import git_utilities
+from campaign_manager.git_utilities import GitPersistenceQueue, run_git
+
+
+class GitPersistenceQueueTestCase(unittest.TestCase):
+    """Test background git persistence of saves."""
+
+    def setUp(self):
+        """Constructor."""
+        self.folder = tempfile.mkdtemp()
+        self.remote_folder = os.path.join(self.folder, 'remote.git')
+        self.data_folder = os.path.join(self.folder, 'data')
+        subprocess.check_output(
+            ['git', 'init', '--bare', '-q', self.remote_folder])
+        subprocess.check_output(
+            ['git', 'clone', '-q', self.remote_folder, self.data_folder],
+            stderr=subprocess.STDOUT)
+        self.config_patch = mock.patch.object(
+            Config, 'campaigner_data_folder', self.data_folder)
+        self.config_patch.start()
+        run_git('config', 'user.name', 'anita')
+        run_git('config', 'user.email', 'anita@example.com')
+        self.write('README', 'campaigns')
+        run_git('add', '-A')
+        run_git('commit', '-m', 'Initial commit')
+        run_git('push', '-q', 'origin', 'HEAD')
+        self.queue = GitPersistenceQueue(
+            coalesce_window=0.2, max_retries=2, retry_backoff=0.01)
+
+    def tearDown(self):
+        """Destructor."""
+        self.config_patch.stop()
+        git_utilities._branches.clear()
+        shutil.rmtree(self.folder)
+
+    def write(self, name, content):
+        with open(os.path.join(self.data_folder, name), 'w') as _file:
+            _file.write(content)
+
+    def remote_log(self):
+        return subprocess.check_output(
+            ['git', '--git-dir', self.remote_folder, 'log',
+             '--format=%s']).decode('utf-8').splitlines()
+
+    def test_saves_are_coalesced(self):
+        self.write('first.json', '{}')
+        self.queue.put('Create campaign - first')
+        self.write('second.json', '{}')
+        self.queue.put('Create campaign - second')
+        self.assertEqual(self.queue.queue_depth, 2)
+        self.assertTrue(self.queue.flush(timeout=30))
+        self.assertEqual(
+            self.remote_log(), ['Update 2 campaigns', 'Initial commit'])
+        status = self.queue.status()
+        self.assertEqual(status['queue_depth'], 0)
+        self.assertIsNotNone(status['last_push_latency'])
+
+    def test_temporary_files_are_not_committed(self):
+        self.write('first.json', '{}')
+        self.write('tmpa1b2c3.partial', '{')
+        self.queue.put('Create campaign - first')
+        self.assertTrue(self.queue.flush(timeout=30))
+        files = subprocess.check_output(
+            ['git', '--git-dir', self.remote_folder, 'ls-tree',
+             '--name-only', 'HEAD']).decode('utf-8').splitlines()
+        self.assertEqual(files, ['README', 'first.json'])
+
+        self.queue.put('Update campaign - first')
+        self.assertTrue(self.queue.flush(timeout=30))
+        self.assertEqual(len(self.remote_log()), 2)
+
+    def test_failed_push_is_kept(self):
+        self.write('first.json', '{}')
+        with mock.patch.object(
+                git_utilities, 'git_push',
+                side_effect=git_utilities.GitCommandError('offline')):
+            self.queue.put('Create campaign - first')
+            self.assertFalse(self.queue.flush(timeout=30))
+        self.assertEqual(self.queue.queue_depth, 1)
+        self.assertEqual(self.queue.status()['last_error'], 'offline')
+
+        self.write('second.json', '{}')
+        self.queue.put('Create campaign - second')
+        self.assertTrue(self.queue.flush(timeout=30))
+        self.assertEqual(
+            self.remote_log(),
+            ['Update 2 campaigns', 'Create campaign - first',
+             'Initial commit'])
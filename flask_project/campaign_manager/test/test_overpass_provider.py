@@ -0,0 +1,103 @@
+# coding=utf-8
+import unittest
+from unittest import mock
+
+from campaign_manager.data_providers import overpass_provider
+from campaign_manager.data_providers.overpass_provider import (
+    OverpassProvider,
+    parse_feature
+)
+from campaign_manager.test.helpers import CampaignObjectTest
+
+
+class OverpassProviderTestCase(unittest.TestCase):
+    """Test overpass provider."""
+
+    def setUp(self):
+        """Constructor."""
+        self.provider = OverpassProvider()
+
+    def test_batched_query(self):
+        self.assertEqual(parse_feature('building'), ('building', None))
+        self.assertEqual(
+            parse_feature('amenity=school,hospital'),
+            ('amenity', ['school', 'hospital']))
+        query = self.provider.parse_url_parameters(
+            polygon='1 2 1 3 2 3',
+            features=['amenity=school,hospital', 'building'])
+        self.assertEqual(
+            query,
+            '(node["amenity"~"hospital|school"](poly:"1 2 1 3 2 3");'
+            'node["building"](poly:"1 2 1 3 2 3");'
+            'relation["amenity"~"hospital|school"](poly:"1 2 1 3 2 3");'
+            'relation["building"](poly:"1 2 1 3 2 3");'
+            'way["amenity"~"hospital|school"](poly:"1 2 1 3 2 3");'
+            'way["building"](poly:"1 2 1 3 2 3"););'
+            '(._;>;);out meta;')
+        self.assertEqual(
+            self.provider.build_query(
+                polygon=[[1, 2.00000001], [1, 3], [2, 3]],
+                features=['building', 'amenity=hospital,school']),
+            self.provider.build_query(
+                polygon='1 2 1 3 2 3',
+                features=['amenity=school,hospital', 'building']))
+
+    @mock.patch.object(
+        overpass_provider.config, 'OVERPASS_ATTIC_CHUNK_SIZE', 2)
+    @mock.patch.object(overpass_provider, 'load_osm_document_cached')
+    def test_chunked_attic_query_recurses(self, load_osm_document_cached):
+        load_osm_document_cached.return_value = (None, 0, True)
+        self.provider.get_element_attic_data(
+            'http://overpass',
+            {'node': ['1'], 'way': ['2', '3'], 'relation': []},
+            date_from='1262304000000', date_to='1577836800000')
+        queries = sorted(
+            call[0][2] for call in load_osm_document_cached.call_args_list)
+        self.assertEqual(len(queries), 2)
+        for query in queries:
+            self.assertIn('(._;>;);', query)
+
+    def test_filter_elements(self):
+        corner = {'type': 'node', 'id': 1}
+        school = {'type': 'node', 'id': 2, 'tags': {'amenity': 'school'}}
+        building = {
+            'type': 'way', 'id': 1, 'nodes': [1], 'tags': {'building': 'yes'}}
+        clinic = {'type': 'way', 'id': 2, 'nodes': [1], 'tags': {
+            'building': 'yes', 'amenity': 'clinic'}}
+        relation = {
+            'type': 'relation', 'id': 1, 'tags': {'building': 'yes'},
+            'members': [{'type': 'node', 'ref': 2}]}
+        elements = (corner, school, building, clinic, relation)
+
+        self.assertEqual(
+            self.provider.filter_elements(
+                elements, 'amenity', ['school', 'hospital']),
+            [school])
+        self.assertEqual(
+            self.provider.filter_elements(elements, 'amenity'),
+            [corner, school, clinic])
+        self.assertEqual(
+            self.provider.filter_elements(elements, 'building'),
+            [corner, school, building, clinic, relation])
+
+    def test_campaign_features(self):
+        campaign = CampaignObjectTest()
+        campaign.selected_functions = {
+            'function-1': {
+                'function': 'CountFeature', 'feature': 'buildings'},
+            'function-2': {
+                'function': 'FeatureAttributeCompleteness',
+                'feature': 'amenity=school'},
+            'function-3': {
+                'function': 'MapperEngagement', 'feature': 'highway'},
+            'function-4': {
+                'function': 'CountFeature', 'feature': 'building'},
+            'function-5': {'function': 'Removed', 'feature': 'shop'}
+        }
+        self.assertEqual(
+            campaign.get_overpass_features(),
+            ['amenity=school', 'building'])
+
+
+if __name__ == '__main__':
+    unittest.main()
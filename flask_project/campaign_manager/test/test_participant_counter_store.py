@@ -0,0 +1,52 @@
+# coding=utf-8
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from campaign_manager.models.participant_counter_store import (
+    ParticipantCounterStore
+)
+
+
+class ParticipantCounterStoreTestCase(unittest.TestCase):
+    """Test write-behind store of participant counts."""
+
+    def setUp(self):
+        """Constructor."""
+        self.folder = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.folder, 'counts.json')
+        self.store = ParticipantCounterStore(
+            self.file_path, flush_interval=60)
+
+    def tearDown(self):
+        """Destructor."""
+        self.store.flush()
+        shutil.rmtree(self.folder)
+
+    def test_counts_are_flushed(self):
+        self.store.set('first', 'Buildings', 3)
+        self.store.set('first', 'Roads', 2)
+        self.assertEqual(
+            self.store.get('first'), {'Buildings': 3, 'Roads': 2})
+        self.assertIsNone(self.store.get('second'))
+        self.assertFalse(os.path.exists(self.file_path))
+
+        self.store.flush()
+        other_store = ParticipantCounterStore(self.file_path)
+        self.assertEqual(
+            other_store.get('first'), {'Buildings': 3, 'Roads': 2})
+
+    def test_flush_keeps_newest_counts(self):
+        other_store = ParticipantCounterStore(self.file_path)
+        self.store.set('first', 'Buildings', 3)
+        other_store.set('first', 'Buildings', 5)
+        other_store.set('second', 'Buildings', 1)
+        other_store.flush()
+        self.store.flush()
+
+        with open(self.file_path) as counts_file:
+            counts = json.load(counts_file)
+        self.assertEqual(counts['first']['Buildings'][0], 5)
+        self.assertEqual(counts['second']['Buildings'][0], 1)
@@ -1,23 +1,43 @@
 __author__ = 'Irwan Fathurrahman <irwan@kartoza.com>'
 __date__ = '16/05/17'
 
+import contextlib
 import json
 import os
-import threading
-import requests
+from concurrent import futures
+import numpy
 from utilities import absolute_path
 import tempfile
 import time
+from urllib.error import URLError
 import yaml
 from shapely import geometry as shapely_geometry
 from shapely.ops import cascaded_union
 from shapely.geometry.geo import mapping
 
 from reporter.osm import fetch_osm, fetch_osm_with_post
+from reporter.overpass_cache import (
+    overpass_cache,
+    default_compression,
+    open_cached_file
+)
+from reporter.parsed_document_cache import parsed_document_cache
+from reporter.single_flight import SingleFlight
+from reporter.fetch_lease import FetchLease
+from reporter.http_client import http_client
+from reporter.refresh_pool import (
+    endpoint_limiter,
+    endpoint_of,
+    refresh_pool
+)
+from reporter.overpass_endpoints import endpoint_pool
+from reporter import config
 from app_config import Config
 from reporter.exceptions import (
     OverpassBadRequestException,
-    OverpassDoesNotReturnData
+    OverpassConcurrentRequestException,
+    OverpassDoesNotReturnData,
+    OverpassTimeoutException
 )
 
 
@@ -93,40 +113,135 @@ def get_types():
     return surveys
 
 
-running_thread = []
+# Fetches of osm documents that are running, keyed by file path
+fetch_flight = SingleFlight()
+
+# Errors of an endpoint that other endpoints are asked after
+FAILOVER_ERRORS = (
+    URLError,
+    OverpassConcurrentRequestException,
+    OverpassDoesNotReturnData,
+    OverpassTimeoutException
+)
 
 
-class FetchOsmThread(threading.Thread):
-    threadID = 0
+@contextlib.contextmanager
+def no_slot():
+    """Context of a fetch that holds no slot of the endpoint limiter."""
+    yield
 
-    def __init__(self, file_path, url_path, post_data=None):
-        self.threadID = file_path
-        self.file_path = file_path
-        self.url_path = url_path
-        self.post_data = post_data
-        threading.Thread.__init__(self)
 
-    # third step, implement the run(), which will be invoked
-    # at the notation: thread.start()
-    def run(self):
-        if self.threadID not in running_thread:
-            running_thread.append(self.threadID)
-            if self.post_data:
-                fetch_osm_with_post(
-                        self.file_path,
-                        self.url_path,
-                        self.post_data)
+def fetch_osm_document(
+        file_path,
+        url_path,
+        post_data=None,
+        returns_json=True,
+        ttl=None,
+        lease_timeout=0,
+        slot_timeout=None):
+    """Fetch osm document to file and record it in overpass cache.
+
+    Document is fetched under a lease on the file, so one process of
+    the node fetches it. Fetching is skipped when the lease is not
+    acquired in time, or when another process fetched the document
+    while this one waited. When the endpoint fails, the query is sent
+    to other endpoints of the endpoint pool that serve it, answers are
+    recorded in the pool.
+
+    :param file_path: The path on the filesystem
+    :type file_path: str
+
+    :param url_path: Path of the file
+    :type url_path: str
+
+    :param post_data: Data for post request
+    :type post_data: str
+
+    :param returns_json: Fetch document as json
+    :type returns_json: bool
+
+    :param ttl: Seconds the document is fresh, default TTL if None
+    :type ttl: float
+
+    :param lease_timeout: Seconds to wait for the lease of the file
+    :type lease_timeout: float
+
+    :param slot_timeout: Seconds to wait for a request slot of the
+        endpoint, None when caller already holds one
+    :type slot_timeout: float
+
+    :raises: OverpassConcurrentRequestException when endpoint is busy,
+        or error of the last endpoint when all of them fail
+
+    :return: Whether document is fetched by this call
+    :rtype: bool
+    """
+    with FetchLease(file_path, timeout=lease_timeout) as lease:
+        if not lease.acquired:
+            return False
+        entry = overpass_cache.get(file_path)
+        if entry is not None and entry.is_fresh():
+            return False
+
+        compression = default_compression()
+        urls = endpoint_pool.failover(url_path, post_data)
+        for index, url in enumerate(urls):
+            if index:
+                # other endpoints are asked when they have a free slot
+                slot = endpoint_limiter.slot(endpoint_of(url), 0)
+            elif slot_timeout is None:
+                slot = no_slot()
             else:
-                fetch_osm(self.file_path, self.url_path)
-            running_thread.remove(self.threadID)
+                slot = endpoint_limiter.slot(endpoint_of(url), slot_timeout)
+            try:
+                with slot:
+                    start_time = time.time()
+                    try:
+                        if post_data:
+                            fetch_osm_with_post(
+                                    file_path,
+                                    url,
+                                    post_data,
+                                    returns_format='json' if returns_json
+                                    else 'xml',
+                                    compression=compression)
+                        else:
+                            fetch_osm(
+                                file_path, url, compression=compression)
+                    except FAILOVER_ERRORS as e:
+                        endpoint_pool.record(url, error=e)
+                        raise
+                    fetch_duration = time.time() - start_time
+            except FAILOVER_ERRORS:
+                if index == len(urls) - 1:
+                    raise
+                continue
+            endpoint_pool.record(url, fetch_duration)
+            break
+        overpass_cache.put(
+            file_path,
+            query=post_data,
+            endpoint=url,
+            fetch_duration=fetch_duration,
+            ttl=ttl,
+            compression=compression)
+        return True
 
 
 def load_osm_document_cached(
         file_path,
         url_path,
         post_data=None,
-        returns_json=True):
-    """Load an cached osm document, update the results if 15 minutes old.
+        returns_json=True,
+        ttl=None,
+        priority=0):
+    """Load an cached osm document, update the results if it is stale.
+
+    Freshness is decided from the time the document was fetched,
+    recorded in overpass cache index, stale documents are returned
+    while they are updated by the refresh pool. Concurrent requests of
+    the same document share one fetch, and one process of the node
+    fetches it while others serve the stale copy or wait for it.
 
     :type file_path: basestring
     :param file_path: The path on the filesystem
@@ -137,52 +252,67 @@ def load_osm_document_cached(
     :param post_data: Data for post request
     :type post_data: str
 
-    :param returns_json: Returns as a dictionary from json file
+    :param returns_json: Returns as a dictionary from json file,
+        otherwise a stream that decompresses the cached file
     :type returns_json: bool
 
-    :returns: Dictionary that contains json on the file,
-    last_update, and updating status.
+    :param ttl: Seconds the document is fresh, default TTL of overpass
+        cache if None
+    :type ttl: float
+
+    :param priority: Priority of refreshing the document, e.g. activity
+        of its campaign, views of the document are added to it
+    :type priority: float
+
+    :returns: Dictionary that contains json on the file, read-only and
+    shared with other callers, last_update, and updating status.
     :rtype: dict
     """
-    elapsed_seconds = 0
-    limit_seconds = 900  # 15 minutes
     file_time = time.time()
     updating_status = False
-    if os.path.exists(file_path):
-        current_time = time.time()  # in unix epoch
-        file_time = os.path.getmtime(file_path)  # in unix epoch
-        elapsed_seconds = current_time - file_time
+    entry = overpass_cache.get(file_path)
+    refresh_pool.record_view(file_path)
 
     osm_data = {'elements': []}
-    if elapsed_seconds > limit_seconds or not os.path.exists(file_path):
+    if entry is None:
+        try:
+            fetch_flight.do(
+                file_path,
+                fetch_osm_document,
+                file_path, url_path, post_data, returns_json, ttl,
+                lease_timeout=config.OVERPASS_FETCH_WAIT_TIMEOUT,
+                slot_timeout=config.OVERPASS_FETCH_WAIT_TIMEOUT,
+                timeout=config.OVERPASS_FETCH_WAIT_TIMEOUT)
+        except (OverpassBadRequestException, OverpassDoesNotReturnData):
+            return osm_data, file_time, updating_status
+        except futures.TimeoutError:
+            # document is still fetched by another request
+            return osm_data, file_time, True
         if not os.path.exists(file_path):
-            try:
-                if post_data:
-                    fetch_osm_with_post(
-                            file_path,
-                            url_path,
-                            post_data,
-                            returns_format='json' if returns_json else 'xml')
-                else:
-                    fetch_osm(file_path, url_path)
-            except (OverpassBadRequestException, OverpassDoesNotReturnData):
-                return osm_data, file_time, updating_status
-
-        else:
-            FetchOsmThread(file_path, url_path, post_data).start()
+            # document is still fetched by another process
+            return osm_data, file_time, True
+    else:
+        if entry.fetched_at:
+            file_time = entry.fetched_at
+        if not entry.is_fresh():
+            refresh_pool.submit(
+                file_path,
+                endpoint_of(url_path),
+                fetch_osm_document,
+                file_path, url_path, post_data, returns_json, ttl,
+                priority=priority)
             updating_status = True
 
-    file_handle = None
-    if os.path.exists(file_path):
-        file_handle = open(file_path, 'rb')
-
-    if returns_json and file_handle:
+    if returns_json:
         try:
-            osm_data = json.loads(file_handle.read().decode('utf-8'))
-        except ValueError:
+            osm_data = parsed_document_cache.load(file_path)
+        except (OSError, EOFError, ValueError):
             pass
     else:
-        osm_data = file_handle
+        try:
+            osm_data = open_cached_file(file_path)
+        except OSError:
+            osm_data = None
 
     return osm_data, file_time, updating_status
 
@@ -283,6 +413,38 @@ def parse_json_string(json_string):
     return json_object
 
 
+# Suffix of temporary files of durable writes, they are never added to git
+TEMPORARY_FILE_SUFFIX = '.partial'
+
+
+def write_file_durably(file_path, content):
+    """Write file through a fsynced temporary file that replaces it,
+    so the file is complete on disk when this returns.
+
+    Temporary file has TEMPORARY_FILE_SUFFIX, so git persistence that
+    runs meanwhile does not commit it.
+
+    :param file_path: path of file
+    :type file_path: str
+
+    :param content: content of file
+    :type content: str
+    """
+    file_descriptor, temp_path = tempfile.mkstemp(
+        suffix=TEMPORARY_FILE_SUFFIX, dir=os.path.dirname(file_path))
+    try:
+        with os.fdopen(file_descriptor, 'w') as _file:
+            _file.write(content)
+            _file.flush()
+            os.fsync(_file.fileno())
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
 def map_provider():
     """Return map provider, if mapbox api token provided then use mapbox map.
     """
@@ -298,10 +460,31 @@ def map_provider():
     return provider
 
 
+def haversine_distance(lon1, lat1, lon2, lat2):
+    """Great circle distance between coordinates in kilometers.
+
+    Coordinates could be numbers or numpy arrays.
+
+    :param lon1: longitude of first coordinate
+    :param lat1: latitude of first coordinate
+    :param lon2: longitude of second coordinate
+    :param lat2: latitude of second coordinate
+
+    :return: distance in kilometers
+    :rtype: float, numpy.ndarray
+    """
+    earth_radius = 6371.0088
+    lon1, lat1, lon2, lat2 = map(numpy.radians, [lon1, lat1, lon2, lat2])
+    a = numpy.sin((lat2 - lat1) / 2.0) ** 2 + \
+        numpy.cos(lat1) * numpy.cos(lat2) * \
+        numpy.sin((lon2 - lon1) / 2.0) ** 2
+    return 2 * earth_radius * numpy.arcsin(numpy.sqrt(a))
+
+
 def get_coordinate_from_ip():
     """Get coordinate information from ip address.
     """
     url = 'http://ipinfo.io/json'
-    response = requests.get(url)
+    response = http_client.get(url)
     data = response.json()
     return data['loc']
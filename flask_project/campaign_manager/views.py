@@ -46,6 +46,8 @@ from campaign_manager.utilities import (
     load_osm_document_cached
 )
 from reporter import LOGGER
+from reporter.overpass_cache import open_cached_file
+from reporter.overpass_endpoints import CURRENT, endpoint_pool
 from reporter.static_files import static_file
 
 try:
@@ -480,18 +482,17 @@ def generate_josm():
     if not error_features:
         abort(404)
 
-    server_url = 'http://exports-prod.hotosm.org:6080/api/' \
-                 'interpreter'
+    server_url = endpoint_pool.route(CURRENT)
     error_features = json.loads(error_features)
-    element_query = OverpassProvider().parse_url_parameters(
+    element_query = OverpassProvider().build_query(
         element_ids=error_features
     )
-    safe_name = hashlib.md5(
-            element_query.encode('utf-8')).hexdigest() + '_josm.osm'
-    file_path = os.path.join(config.CACHE_DIR, safe_name)
+    safe_name = element_query.cache_name('_josm.osm')
+    file_path = element_query.cache_path('_josm.osm')
     osm_data, osm_doc_time, updating = load_osm_document_cached(
-            file_path, server_url, element_query, False)
+            file_path, server_url, str(element_query), False)
     if osm_data:
+        osm_data.close()
         return Response(json.dumps({'file_name': safe_name}))
 
 
@@ -501,10 +502,13 @@ def download_josm(uuid, file_name):
     campaign = Campaign.get(uuid)
     campaign_name = campaign.name + '.osm'
     file_path = os.path.join(config.CACHE_DIR, file_name)
-    if not os.path.exists(file_path):
+    try:
+        file_handle = open_cached_file(file_path)
+    except OSError:
         abort(404)
     return send_file(
-            file_path,
+            file_handle,
+            mimetype='application/xml',
             as_attachment=True,
             attachment_filename=campaign_name)
 
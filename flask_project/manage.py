@@ -5,6 +5,12 @@ from app import osm_app
 from campaign_manager.script.generate_geometry import (
     generate_geometry as generate_geometry_script
 )
+from campaign_manager.script.rebuild_campaign_catalog import (
+    rebuild_campaign_catalog as rebuild_campaign_catalog_script
+)
+from campaign_manager.script.run_overpass_stand_in import (
+    run_overpass_stand_in as run_overpass_stand_in_script
+)
 
 osm_app.config.from_object(os.environ['APP_SETTINGS'])
 
@@ -16,5 +22,30 @@ def generate_geometry():
     generate_geometry_script()
 
 
+@manager.command
+def rebuild_campaign_catalog():
+    rebuild_campaign_catalog_script()
+
+
+@manager.option('osm_file', help='OSM extract that queries are answered from')
+@manager.option('-p', '--port', dest='port', type=int, default=8090)
+@manager.option('-l', '--latency', dest='latency', type=float, default=0)
+@manager.option('-j', '--jitter', dest='jitter', type=float, default=0)
+@manager.option(
+    '-t', '--timeout-rate', dest='timeout_rate', type=float, default=0)
+@manager.option('-b', '--busy-rate', dest='busy_rate', type=float, default=0)
+@manager.option('-s', '--slots', dest='slots', type=int, default=None)
+def overpass_stand_in(
+        osm_file, port, latency, jitter, timeout_rate, busy_rate, slots):
+    run_overpass_stand_in_script(
+        osm_file,
+        port=port,
+        latency=latency,
+        jitter=jitter,
+        timeout_rate=timeout_rate,
+        busy_rate=busy_rate,
+        slots=slots)
+
+
 if __name__ == '__main__':
     manager.run()
@@ -14,3 +14,69 @@ DISPLAY_UPDATE_CONTROL = True
 CACHE_DIR = '/tmp'
 # Options for the osm2pgsql command line
 OSM2PGSQL_OPTIONS = ''
+# Budget of total size of cached Overpass responses in bytes,
+# least recently used responses are deleted above it
+OVERPASS_CACHE_MAX_SIZE = 2 * 1024 * 1024 * 1024
+# Seconds a cached Overpass response is fresh
+OVERPASS_CACHE_TTL = 900
+# Seconds that last access of a cached Overpass response is kept before
+# a read records it again, reads within it do not write the index
+OVERPASS_CACHE_ACCESS_RESOLUTION = 60
+# Seconds a cached response of reporter downloads is fresh
+OVERPASS_REPORTER_CACHE_TTL = 3600
+# Seconds a request waits for a fetch of the same Overpass query that
+# another request started
+OVERPASS_FETCH_WAIT_TIMEOUT = 120
+# Compression of cached Overpass responses: gzip, zstd (needs zstandard
+# package), auto for zstd when it is installed else gzip, or None
+OVERPASS_CACHE_COMPRESSION = 'auto'
+# Number of workers that refresh stale Overpass responses in background
+OVERPASS_REFRESH_WORKERS = 4
+# Requests per Overpass endpoint at the same time
+OVERPASS_ENDPOINT_CONCURRENCY = 2
+# Seconds of first backoff after an endpoint answers it is busy
+# (HTTP 429 or 419), it doubles up to OVERPASS_MAX_BACKOFF
+OVERPASS_BACKOFF = 30
+OVERPASS_MAX_BACKOFF = 900
+# Refresh priority of documents of active campaigns, views of a
+# document add to its priority and halve every OVERPASS_VIEW_HALF_LIFE
+OVERPASS_ACTIVE_CAMPAIGN_PRIORITY = 10
+OVERPASS_VIEW_HALF_LIFE = 3600
+# Shared HTTP client of data providers: connections kept alive per host,
+# connect and read timeouts in seconds, retries of failed connections
+HTTP_CONNECTIONS_PER_HOST = 4
+HTTP_CONNECT_TIMEOUT = 10
+HTTP_READ_TIMEOUT = 60
+HTTP_RETRIES = 3
+# Read timeout of Overpass queries in seconds
+OVERPASS_READ_TIMEOUT = 300
+# Budget of parsed Overpass documents kept in memory, in bytes of memory,
+# a parsed document takes about 4 times the bytes of its json
+OVERPASS_PARSED_CACHE_SIZE = 64 * 1024 * 1024
+# Whether campaigns are fetched from Overpass as grid tiles
+OVERPASS_TILED = False
+# Size of grid tiles in degrees
+OVERPASS_TILE_SIZE = 0.25
+# Tiles or chunks of a query that are fetched at the same time
+OVERPASS_QUERY_WORKERS = 4
+# Whether overpass insight functions of a campaign share one query
+OVERPASS_BATCHED = False
+# Element ids per chunk of attic data queries
+OVERPASS_ATTIC_CHUNK_SIZE = 2000
+# Whether contributions of users are updated with augmented diffs of
+# new edits instead of querying the whole campaign range again
+OVERPASS_INCREMENTAL_ATTIC = False
+# Decimals that coordinates of Overpass queries are rounded to
+OVERPASS_COORDINATE_PRECISION = 7
+# Overpass servers that queries are routed to, as dicts of url and
+# capabilities: current and/or attic data. DEFAULT_OVERPASS_URL
+# (current) and ATTIC_DATA_SERVER_URL (attic) of environment are added
+OVERPASS_ENDPOINTS = []
+# Failures in a row that open the circuit of an endpoint, and seconds
+# until an open endpoint is tried again
+OVERPASS_CIRCUIT_FAILURES = 5
+OVERPASS_CIRCUIT_RESET = 60
+# Seconds of requests that error rate of an endpoint is measured over,
+# and seconds of latency that an error rate of 1 is ranked as
+OVERPASS_ERROR_WINDOW = 300
+OVERPASS_ERROR_PENALTY = 60
@@ -0,0 +1,165 @@
+# coding=utf-8
+"""
+Persisted contributions of users that attic data is merged into.
+
+:license: GPLv3, see LICENSE for more details.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+from reporter import config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contribution_state (
+    key TEXT PRIMARY KEY,
+    high_water REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS contribution (
+    key TEXT NOT NULL,
+    element_type TEXT NOT NULL,
+    element_id INTEGER NOT NULL,
+    user TEXT,
+    date TEXT NOT NULL,
+    found INTEGER NOT NULL,
+    PRIMARY KEY (key, element_type, element_id)
+);
+"""
+
+
+class ContributionStore(object):
+    """
+    Newest counted version of every element per key, e.g. campaign,
+    feature and date range, with the high-water time that attic data of
+    the key is merged up to.
+
+    Merging an augmented diff replaces versions of the elements it
+    holds, so contributions are counted as a diff of the whole range
+    counts them, but only edits after the high-water are fetched.
+    """
+
+    def __init__(self, database_path):
+        """
+        :param database_path: path of sqlite database
+        :type database_path: str
+        """
+        self.database_path = database_path
+        self._local = threading.local()
+
+    def connection(self):
+        """Return sqlite connection of current thread.
+
+        :rtype: sqlite3.Connection
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            folder = os.path.dirname(self.database_path)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder)
+            connection = sqlite3.connect(self.database_path, timeout=30)
+            connection.row_factory = sqlite3.Row
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def state(self, key):
+        """Return high-water and update time of key.
+
+        :param key: key of contributions
+        :type key: str
+
+        :return: (high-water in milliseconds, updated at in unix epoch),
+            None when nothing is merged for key
+        :rtype: tuple
+        """
+        row = self.connection().execute(
+            'SELECT high_water, updated_at FROM contribution_state '
+            'WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        return row['high_water'], row['updated_at']
+
+    def merge(self, key, elements, high_water, element_ids=None):
+        """Merge versions of elements into contributions of key.
+
+        :param key: key of contributions
+        :type key: str
+
+        :param elements: {(type, id): (user, date, found)}, None removes
+            element, e.g. when its version is out of date range
+        :type elements: dict
+
+        :param high_water: time that contributions are merged up to,
+            in milliseconds
+        :type high_water: float
+
+        :param element_ids: ids of elements that are still queried,
+            contributions of other elements are removed
+        :type element_ids: Dict[str, list]
+        """
+        connection = self.connection()
+        with connection:
+            removed = [
+                (key, element[0], element[1])
+                for element, version in elements.items() if version is None]
+            if element_ids is not None:
+                current = set(
+                    (element_type, int(element_id))
+                    for element_type, ids in element_ids.items()
+                    for element_id in ids)
+                removed += [
+                    (key, row['element_type'], row['element_id'])
+                    for row in connection.execute(
+                        'SELECT element_type, element_id FROM contribution '
+                        'WHERE key = ?', (key,))
+                    if (row['element_type'], row['element_id'])
+                    not in current]
+            connection.executemany(
+                'DELETE FROM contribution WHERE key = ? AND '
+                'element_type = ? AND element_id = ?', removed)
+            connection.executemany(
+                'INSERT OR REPLACE INTO contribution VALUES '
+                '(?, ?, ?, ?, ?, ?)',
+                [(key, element[0], element[1], version[0], version[1],
+                  int(version[2]))
+                 for element, version in elements.items()
+                 if version is not None])
+            connection.execute(
+                'INSERT OR REPLACE INTO contribution_state VALUES (?, ?, ?)',
+                (key, high_water, time.time()))
+
+    def counts(self, key):
+        """Return counts of contributions of key per user.
+
+        :param key: key of contributions
+        :type key: str
+
+        :return: ways per user, nodes per user and edits per date per
+            user, as `contribution_records` takes them
+        :rtype: tuple
+        """
+        way_count_dict = {}
+        node_count_dict = {}
+        timelines = {}
+        rows = self.connection().execute(
+            'SELECT element_type, user, date, found, COUNT(*) AS count '
+            'FROM contribution WHERE key = ? '
+            'GROUP BY element_type, user, date, found', (key,))
+        for row in rows:
+            timeline = timelines.setdefault(row['user'], {})
+            timeline[row['date']] = timeline.get(row['date'], 0) + \
+                row['count']
+            if row['found']:
+                counts = way_count_dict if row['element_type'] == 'way' \
+                    else node_count_dict
+                counts[row['user']] = counts.get(row['user'], 0) + \
+                    row['count']
+        return way_count_dict, node_count_dict, timelines
+
+
+contribution_store = ContributionStore(
+    os.path.join(config.CACHE_DIR, 'contributions.sqlite3'))
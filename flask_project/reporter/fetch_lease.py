@@ -0,0 +1,91 @@
+# coding=utf-8
+"""
+Cross-process leases on fetching cached files.
+
+:license: GPLv3, see LICENSE for more details.
+"""
+
+import fcntl
+import os
+import time
+
+
+class FetchLease(object):
+    """
+    Lease on fetching a cached file, held by one process of the node.
+
+    The lease is an exclusive flock on `<file>.lock`. The kernel drops
+    the lock when the owner process dies, so the lease of a dead
+    process expires by itself. The lock file is deleted by the owner
+    before it releases the lock, a process that locked a deleted lock
+    file notices that the inode changed and tries again.
+    """
+    poll_interval = 0.1
+
+    def __init__(self, file_path, timeout=0):
+        """
+        :param file_path: path of cached file
+        :type file_path: str
+
+        :param timeout: seconds to wait for the lease, 0 does not wait
+        :type timeout: float
+        """
+        self.lock_path = file_path + '.lock'
+        self.timeout = timeout
+        self._descriptor = None
+
+    @property
+    def acquired(self):
+        """Whether this process owns the lease."""
+        return self._descriptor is not None
+
+    def acquire(self):
+        """Acquire lease, waiting up to timeout.
+
+        :return: whether lease is acquired
+        :rtype: bool
+        """
+        deadline = time.time() + self.timeout
+        while True:
+            descriptor = os.open(self.lock_path, os.O_CREAT | os.O_RDWR)
+            try:
+                fcntl.flock(descriptor, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(descriptor)
+                if time.time() >= deadline:
+                    return False
+                time.sleep(self.poll_interval)
+                continue
+
+            try:
+                current_inode = os.stat(self.lock_path).st_ino
+            except FileNotFoundError:
+                current_inode = None
+            if current_inode != os.fstat(descriptor).st_ino:
+                # lock file was deleted by previous owner
+                os.close(descriptor)
+                continue
+
+            os.ftruncate(descriptor, 0)
+            os.write(descriptor, str(os.getpid()).encode('utf-8'))
+            self._descriptor = descriptor
+            return True
+
+    def release(self):
+        """Release lease if it is acquired."""
+        if self._descriptor is None:
+            return
+        try:
+            os.remove(self.lock_path)
+        except OSError:
+            pass
+        fcntl.flock(self._descriptor, fcntl.LOCK_UN)
+        os.close(self._descriptor)
+        self._descriptor = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
@@ -0,0 +1,149 @@
+# coding=utf-8
+"""
+Shared HTTP client with pooled keep-alive connections.
+
+:license: GPLv3, see LICENSE for more details.
+"""
+
+import inspect
+from urllib.error import HTTPError, URLError
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from reporter import config
+
+
+class HttpClient(object):
+    """
+    Client of outbound requests of data providers.
+
+    One requests session is shared, so connections to a host are kept
+    alive and reused instead of paying TCP and TLS setup per request.
+    The pool size is the number of connections kept per host, when all
+    of them are in use a request opens another connection that is closed
+    afterwards, so a response that is never closed can not make later
+    requests wait forever. Concurrency per Overpass endpoint is limited
+    by the endpoint limiter instead. Failed connections are
+    retried with jittered exponential backoff. Read errors and gateway
+    errors are retried for idempotent methods only, so a POST that the
+    server may be running is not sent again. Busy answers (429, 419)
+    are not retried, their backoff is done by the caller.
+
+    Errors are raised as urllib errors, as providers handled them
+    before, URLError for connection errors and HTTPError from
+    `raise_for_status`.
+    """
+
+    def __init__(
+            self,
+            pool_connections=10,
+            pool_maxsize=4,
+            timeout=(10, 60),
+            retries=3,
+            backoff=0.5,
+            backoff_jitter=0.5,
+            user_agent='HotOSM'):
+        """
+        :param pool_connections: number of hosts whose pools are kept
+        :type pool_connections: int
+
+        :param pool_maxsize: connections kept alive per host
+        :type pool_maxsize: int
+
+        :param timeout: default connect and read timeout in seconds
+        :type timeout: tuple
+
+        :param retries: retries of failed connections and gateway errors
+        :type retries: int
+
+        :param backoff: backoff factor of retries in seconds
+        :type backoff: float
+
+        :param backoff_jitter: maximum random seconds added to backoff,
+            only applied by urllib3 that supports it (2.0 and later)
+        :type backoff_jitter: float
+
+        :param user_agent: user agent of requests
+        :type user_agent: str
+        """
+        self.timeout = timeout
+        retry_arguments = {
+            'total': retries,
+            'backoff_factor': backoff,
+            'status_forcelist': (502, 503, 504),
+            'raise_on_status': False
+        }
+        if 'backoff_jitter' in inspect.signature(Retry).parameters:
+            retry_arguments['backoff_jitter'] = backoff_jitter
+        retry = Retry(**retry_arguments)
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=False,
+            max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'User-Agent': user_agent,
+            'Accept-Encoding': 'gzip, deflate'
+        })
+
+    def request(self, method, url, **kwargs):
+        """Send request through the shared session.
+
+        :param method: HTTP method
+        :type method: str
+
+        :param url: url of request
+        :type url: str
+
+        :param kwargs: arguments of `requests.Session.request`, default
+            timeout is used when it is not given
+
+        :raises: URLError when request fails without a response
+
+        :rtype: requests.Response
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        try:
+            return self.session.request(method, url, **kwargs)
+        except requests.RequestException as e:
+            raise URLError(e)
+
+    def get(self, url, **kwargs):
+        """Send GET request, see `request`."""
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        """Send POST request, see `request`."""
+        return self.request('POST', url, **kwargs)
+
+    @staticmethod
+    def raise_for_status(response):
+        """Raise HTTPError when response has an error status.
+
+        :param response: response of request
+        :type response: requests.Response
+
+        The response is closed before raising, so its connection is
+        released even when it was streamed.
+
+        :raises: HTTPError
+        """
+        if response.status_code >= 400:
+            response.close()
+            raise HTTPError(
+                response.url,
+                response.status_code,
+                response.reason,
+                response.headers,
+                None)
+
+
+http_client = HttpClient(
+    pool_maxsize=config.HTTP_CONNECTIONS_PER_HOST,
+    timeout=(config.HTTP_CONNECT_TIMEOUT, config.HTTP_READ_TIMEOUT),
+    retries=config.HTTP_RETRIES)
@@ -7,12 +7,11 @@ Module for low level OSM file retrieval.
 :license: GPLv3, see LICENSE for more details.
 """
 
-import hashlib
 import time
 import os
 import re
 import sys
-import datetime
+import tempfile
 from subprocess import call
 from shutil import copyfile
 from reporter.utilities import temp_dir, unique_filename, zip_shp, which
@@ -20,8 +19,7 @@ from reporter import config
 from reporter import LOGGER
 from reporter.queries import (
     SQL_QUERY_MAP,
-    OVERPASS_QUERY_MAP,
-    OVERPASS_QUERY_MAP_POLYGON
+    OVERPASS_FEATURE_SELECTORS
 )
 from reporter.utilities import (
     shapefile_resource_base_path,
@@ -33,24 +31,20 @@ from reporter.exceptions import (
     OverpassConcurrentRequestException,
     OverpassDoesNotReturnData)
 from reporter.metadata import metadata_files
-from urllib.request import urlopen
-# noinspection PyPep8Naming
-from urllib.request import Request
+from reporter.http_client import http_client
+from reporter.overpass_cache import overpass_cache, compressing_writer
+from reporter.overpass_query import OverpassQuery
 from urllib.parse import quote, urlencode
-import requests
 # noinspection PyPep8Naming
 from urllib.error import HTTPError
 
-query_with_value = (
-    '('
-    'way["{key}"~"{value}"]'
-    '(poly:"{polygon}");'
-    'relation["{key}"~"{value}"]'
-    '(poly:"{polygon}");'
-    ');'
-    '(._;>;);'
-    'out {print_mode};'
-)
+# Size of chunks that downloads are streamed in
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# Bytes of head and tail of a download that error markers are searched in
+MARKER_WINDOW_SIZE = 64 * 1024
+RUNTIME_ERROR_MARKER = re.compile(
+    b'(<remark> |"remark": ?")runtime error:')
+DATA_MARKER = re.compile(b'(elements|meta)')
 
 
 def get_osm_file(
@@ -112,51 +106,45 @@ def get_osm_file(
     Equivalent url (http encoded)::
     """
     server_url = 'http://overpass-api.de/api/interpreter?data='
-    parameters = dict()
-    parameters['print_mode'] = overpass_verbosity
-
+    area = dict()
     if use_polygon:
-        parameters['polygon'] = coordinates
+        area['polygon'] = coordinates
     else:
-        parameters.update(coordinates)
+        area['bbox'] = (
+            coordinates['SW_lat'],
+            coordinates['SW_lng'],
+            coordinates['NE_lat'],
+            coordinates['NE_lng'])
 
     if '=' in feature:
         feature_keys = feature.split('=')
-        parameters['key'] = feature_keys[0]
-        parameters['value'] = feature_keys[1].replace(',', '|')
-        query = query_with_value.format(**parameters)
+        query = OverpassQuery.feature(
+            feature_keys[0],
+            feature_keys[1].split(','),
+            element_types=('way', 'relation'),
+            date_from=date_from,
+            date_to=date_to,
+            verbosity=overpass_verbosity,
+            **area)
     else:
-        if use_polygon:
-            query = OVERPASS_QUERY_MAP_POLYGON[feature].format(**parameters)
-        else:
-            query = OVERPASS_QUERY_MAP[feature].format(**parameters)
-
-    if date_from and date_to:
-        try:
-            datetime_from = datetime.datetime.utcfromtimestamp(
-                float(date_from) / 1000.)
-            datetime_to = datetime.datetime.utcfromtimestamp(
-                float(date_to) / 1000.)
-            date_format = "%Y-%m-%dT%H:%M:%S.%fZ"
-            diff_query = '[diff:"{date_from}", "{date_to}"];'.format(
-                date_from=datetime_from.strftime(date_format),
-                date_to=datetime_to.strftime(date_format)
-            )
-            query = diff_query + query
-        except ValueError as e:
-            LOGGER.debug(e)
-
-    encoded_query = quote(query)
+        query = OverpassQuery(
+            OVERPASS_FEATURE_SELECTORS[feature],
+            date_from=date_from,
+            date_to=date_to,
+            verbosity=overpass_verbosity,
+            **area)
+
+    encoded_query = quote(str(query))
     url_path = '%s%s' % (server_url, encoded_query)
-    safe_name = hashlib.md5(query.encode('utf-8')).hexdigest() + '.osm'
-    file_path = os.path.join(config.CACHE_DIR, safe_name)
+    file_path = query.cache_path()
     return load_osm_document(file_path, url_path)
 
 
 def load_osm_document(file_path, url_path):
     """Load an osm document, refreshing it if the cached copy is stale.
 
-    To save bandwidth the file is not downloaded if it is less than 1 hour old.
+    To save bandwidth the file is not downloaded if it was fetched less
+    than 1 hour ago, according to the overpass cache index.
 
     :type file_path: basestring
     :param file_path: The path on the filesystem to which the file should
@@ -172,22 +160,94 @@ def load_osm_document(file_path, url_path):
      Raises:
          None
     """
-    elapsed_seconds = 0
-    if os.path.exists(file_path):
-        current_time = time.time()  # in unix epoch
-        file_time = os.path.getmtime(file_path)  # in unix epoch
-        elapsed_seconds = current_time - file_time
-        if elapsed_seconds > 3600:
-            os.remove(file_path)
-    if elapsed_seconds > 3600 or not os.path.exists(file_path):
+    entry = overpass_cache.get(file_path)
+    if entry is None or not entry.is_fresh():
+        start_time = time.time()
         fetch_osm(file_path, url_path)
+        overpass_cache.put(
+            file_path,
+            endpoint=url_path,
+            fetch_duration=time.time() - start_time,
+            ttl=config.OVERPASS_REPORTER_CACHE_TTL)
         message = ('fetched %s' % file_path)
         LOGGER.info(message)
     file_handle = open(file_path, 'rb')
     return file_handle
 
 
-def fetch_osm_with_post(file_path, url_path, post_data, returns_format='json'):
+def download_osm_document(
+        response,
+        file_path,
+        check_data=True,
+        compression=None):
+    """Stream response of Overpass to a file.
+
+    The response is written in chunks to a temporary file that replaces
+    the file when it is complete, so readers never see a partial or
+    missing file, and memory does not grow with the response size.
+    Error markers of Overpass are searched in the head and the tail of
+    the stream.
+
+    :param response: streamed response of Overpass
+    :type response: requests.Response
+
+    :param file_path: The path on the filesystem to which the file should
+        be saved.
+    :type file_path: str
+
+    :param check_data: Check that response has data and no runtime error
+    :type check_data: bool
+
+    :param compression: gzip or zstd to write the file compressed
+    :type compression: str
+
+    :raises: OverpassTimeoutException, OverpassDoesNotReturnData
+    """
+    head = b''
+    tail = b''
+    file_descriptor, temp_path = tempfile.mkstemp(
+        dir=os.path.dirname(file_path), suffix='.download')
+    try:
+        with os.fdopen(file_descriptor, 'wb') as file_handle:
+            stream = file_handle
+            if compression:
+                stream = compressing_writer(file_handle, compression)
+            try:
+                for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                    if len(head) < MARKER_WINDOW_SIZE:
+                        head += chunk[:MARKER_WINDOW_SIZE - len(head)]
+                        if check_data and \
+                                len(head) == MARKER_WINDOW_SIZE and \
+                                not DATA_MARKER.search(head):
+                            raise OverpassDoesNotReturnData
+                    tail = (tail + chunk)[-MARKER_WINDOW_SIZE:]
+                    stream.write(chunk)
+            finally:
+                if stream is not file_handle:
+                    stream.close()
+
+        if check_data:
+            if RUNTIME_ERROR_MARKER.search(head) or \
+                    RUNTIME_ERROR_MARKER.search(tail):
+                raise OverpassTimeoutException
+            if not DATA_MARKER.search(head):
+                raise OverpassDoesNotReturnData
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    finally:
+        response.close()
+
+
+def fetch_osm_with_post(
+        file_path,
+        url_path,
+        post_data,
+        returns_format='json',
+        compression=None):
     """Fetch an osm map and store locally.
 
     :param url_path: The path (relative to the ftp root) from which the
@@ -204,43 +264,40 @@ def fetch_osm_with_post(file_path, url_path, post_data, returns_format='json'):
     :param returns_format: Format of the response, could be json or xml
     :type returns_format: str
 
+    :param compression: gzip or zstd to store the file compressed
+    :type compression: str
+
     :returns: The path to the downloaded file.
 
     """
-    headers = {'User-Agent': 'HotOSM'}
     try:
-        data = requests.post(
-                url=url_path,
+        response = http_client.post(
+                url_path,
                 data={'data': post_data},
-                headers=headers)
-
-        if returns_format != 'xml':
-            regex = '<remark> runtime error:'
-            if re.search(regex, data.text):
-                raise OverpassTimeoutException
-
-            regex = '(elements|meta)'
-            if not re.search(regex, data.text):
-                raise OverpassDoesNotReturnData
-
-        if os.path.exists(file_path):
-            os.remove(file_path)
-
-        file_handle = open(file_path, 'wb')
-        file_handle.write(data.text.encode('utf-8'))
-        file_handle.close()
+                stream=True,
+                timeout=(
+                    config.HTTP_CONNECT_TIMEOUT,
+                    config.OVERPASS_READ_TIMEOUT))
+        # response goes back to connection pool when it is closed
+        with response:
+            http_client.raise_for_status(response)
+            download_osm_document(
+                response,
+                file_path,
+                check_data=returns_format != 'xml',
+                compression=compression)
     except HTTPError as e:
         if e.code == 400:
             LOGGER.exception('Bad request to Overpass')
             raise OverpassBadRequestException
-        elif e.code == 419:
+        elif e.code in (419, 429):
             raise OverpassConcurrentRequestException
 
         LOGGER.exception('Error with Overpass')
         raise e
 
 
-def fetch_osm(file_path, url_path):
+def fetch_osm(file_path, url_path, compression=None):
     """Fetch an osm map and store locally.
 
 
@@ -252,34 +309,25 @@ def fetch_osm(file_path, url_path):
         be saved.
     :type file_path: str
 
+    :param compression: gzip or zstd to store the file compressed
+    :type compression: str
+
     :returns: The path to the downloaded file.
 
     """
     LOGGER.debug('Getting URL: %s', url_path)
-    headers = {'User-Agent': 'InaSAFE'}
-    web_request = Request(url_path, None, headers)
     try:
-        url_handle = urlopen(web_request, timeout=60)
-        data = url_handle.read().decode('utf-8')
-        regex = '<remark> runtime error:'
-        if re.search(regex, data):
-            raise OverpassTimeoutException
-
-        regex = '(elements|meta)'
-        if not re.search(regex, data):
-            raise OverpassDoesNotReturnData
-
-        if os.path.exists(file_path):
-            os.remove(file_path)
-
-        file_handle = open(file_path, 'wb')
-        file_handle.write(data.encode('utf-8'))
-        file_handle.close()
+        response = http_client.get(
+            url_path, headers={'User-Agent': 'InaSAFE'}, stream=True)
+        with response:
+            http_client.raise_for_status(response)
+            download_osm_document(
+                response, file_path, compression=compression)
     except HTTPError as e:
         if e.code == 400:
             LOGGER.exception('Bad request to Overpass')
             raise OverpassBadRequestException
-        elif e.code == 419:
+        elif e.code in (419, 429):
             raise OverpassConcurrentRequestException
 
         LOGGER.exception('Error with Overpass')
@@ -0,0 +1,94 @@
+# coding=utf-8
+"""
+Stream of several OSM xml documents read as one document.
+
+:license: GPLv3, see LICENSE for more details.
+"""
+
+import io
+import re
+
+ROOT_TAG = re.compile(rb'<(?![?!])([^\s/>]+)[^>]*>')
+READ_SIZE = 64 * 1024
+
+
+class OsmDocumentChain(io.RawIOBase):
+    """
+    Readable stream that joins OSM xml documents, e.g. answers of chunks
+    of a query, in order.
+
+    Prolog and root element of the first document are kept, root
+    elements of the other documents are left out, so a sax parser reads
+    the children of all documents as children of one root.
+    """
+
+    def __init__(self, streams):
+        """
+        :param streams: binary streams of xml documents
+        :type streams: list
+        """
+        super(OsmDocumentChain, self).__init__()
+        self.streams = list(streams)
+        self._pieces = self._generate_pieces()
+        self._buffer = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._buffer:
+            try:
+                self._buffer = next(self._pieces)
+            except StopIteration:
+                return 0
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+    def close(self):
+        for stream in self.streams:
+            stream.close()
+        super(OsmDocumentChain, self).close()
+
+    def _generate_pieces(self):
+        root_name = None
+        for index, stream in enumerate(self.streams):
+            head = b''
+            match = None
+            while match is None:
+                data = stream.read(READ_SIZE)
+                if not data:
+                    break
+                head += data
+                match = ROOT_TAG.search(head)
+            if match is None:
+                # document without root element
+                continue
+
+            root_tag = match.group(0)
+            body = head[match.end():]
+            if root_tag.endswith(b'/>'):
+                root_tag = root_tag[:-2] + b'>'
+                body = b''
+            if root_name is None:
+                root_name = match.group(1)
+                yield head[:match.start()] + root_tag
+
+            closing_tag = b'</' + match.group(1) + b'>'
+            while True:
+                data = stream.read(READ_SIZE)
+                if not data:
+                    break
+                body += data
+                if len(body) > READ_SIZE:
+                    # keep end of body that could hold closing tag
+                    yield body[:-READ_SIZE]
+                    body = body[-READ_SIZE:]
+            body = body.rstrip()
+            if body.endswith(closing_tag):
+                body = body[:-len(closing_tag)]
+            yield body
+
+        if root_name is not None:
+            yield b'</' + root_name + b'>\n'
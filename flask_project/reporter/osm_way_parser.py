@@ -174,3 +174,69 @@ class OsmParser(xml.sax.ContentHandler):
 
         """
         pass
+
+
+class OsmElementParser(xml.sax.ContentHandler):
+    """Sax parser that collects newest version of every way and node of
+    an OSM diff document, so contributions could be merged per element.
+    """
+
+    def __init__(self, tag_name=None, start_date=None, end_date=None):
+        """Constructor for parser.
+
+        :param tag_name: Name of the osm tag that counted objects have.
+        :type tag_name: str
+
+        :param start_date: Start date of range time to parse
+        :type start_date: float
+
+        :param end_date: End date of range time to parse
+        :type end_date: float
+        """
+        xml.sax.ContentHandler.__init__(self)
+        self.tagName = tag_name
+        self.dateStart = start_date
+        self.dateEnd = end_date
+        self.osmBase = None
+        # {(type, id): (user, date, found)}, None when out of date range
+        self.elements = {}
+        self.ignoreOld = False
+        self.element = None
+        self.found = False
+
+    def startElement(self, name, attributes):
+        """Callback for when an element start is encountered."""
+        if name == 'meta' and attributes.get('osm_base'):
+            self.osmBase = attributes.get('osm_base')
+        if self.dateStart and self.dateEnd and name == 'old':
+            self.ignoreOld = True
+        if self.ignoreOld:
+            return
+
+        if name in ('way', 'node') and self.element is None:
+            timestamp = attributes.get('timestamp')
+            date_part = timestamp.split('T')[0]
+            key = (name, int(attributes.get('id')))
+            if self.dateStart and self.dateEnd:
+                date_timestamp = calendar.timegm(datetime.datetime.strptime(
+                        date_part, '%Y-%m-%d').timetuple()) * 1000
+                if not self.dateStart <= date_timestamp <= self.dateEnd:
+                    self.elements[key] = None
+                    return
+            self.element = (name, key, attributes.get('user'), date_part)
+            self.found = not self.tagName
+
+        elif name == 'tag' and self.element and self.tagName:
+            if attributes.get('k') == self.tagName:
+                self.found = True
+
+    def endElement(self, name):
+        """Callback for when an element end is encountered."""
+        if name == 'old' and self.ignoreOld:
+            self.ignoreOld = False
+
+        if self.element and name == self.element[0]:
+            _, key, user, date_part = self.element
+            self.elements[key] = (user, date_part, self.found)
+            self.element = None
+            self.found = False
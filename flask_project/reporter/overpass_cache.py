@@ -0,0 +1,459 @@
+# coding=utf-8
+"""
+Index of cached Overpass responses with size budget and TTLs.
+
+:license: GPLv3, see LICENSE for more details.
+"""
+
+import gzip
+import io
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from reporter import config
+from reporter import LOGGER
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entry (
+    path TEXT PRIMARY KEY,
+    query TEXT,
+    endpoint TEXT,
+    size INTEGER NOT NULL DEFAULT 0,
+    fetched_at REAL NOT NULL DEFAULT 0,
+    fetch_duration REAL,
+    last_access REAL NOT NULL DEFAULT 0,
+    ttl REAL,
+    compression TEXT
+);
+CREATE INDEX IF NOT EXISTS cache_entry_last_access
+    ON cache_entry (last_access);
+"""
+
+# name of cached Overpass response, md5 of query with a suffix
+CACHE_FILE_NAME = re.compile(r'^[0-9a-f]{32}(_\w+)?\.osm$')
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+
+def default_compression():
+    """Return compression of new cache files from configuration.
+
+    `auto` uses zstd when zstandard package is installed, else gzip.
+
+    :return: gzip, zstd or None for uncompressed files
+    :rtype: str
+    """
+    compression = config.OVERPASS_CACHE_COMPRESSION
+    if compression == 'auto' or (compression == 'zstd' and not zstandard):
+        return 'zstd' if zstandard else 'gzip'
+    return compression or None
+
+
+def compressing_writer(file_handle, compression):
+    """Return stream that writes compressed content to file handle.
+
+    Closing the stream finishes compressed content, it does not close
+    the file handle.
+
+    :param file_handle: binary file that is written
+    :type file_handle: file
+
+    :param compression: gzip or zstd
+    :type compression: str
+
+    :rtype: io.BufferedIOBase
+    """
+    if compression == 'zstd':
+        return zstandard.ZstdCompressor(level=3).stream_writer(
+            file_handle, closefd=False)
+    return gzip.GzipFile(fileobj=file_handle, mode='wb', compresslevel=6)
+
+
+def compress_file(file_path, compression):
+    """Compress file in place through a temporary file, files that
+    are already compressed are kept.
+
+    :param file_path: path of uncompressed file
+    :type file_path: str
+
+    :param compression: gzip or zstd
+    :type compression: str
+    """
+    with open(file_path, 'rb') as source:
+        magic = source.read(4)
+    if magic.startswith(GZIP_MAGIC) or magic == ZSTD_MAGIC:
+        return
+    file_descriptor, temp_path = tempfile.mkstemp(
+        dir=os.path.dirname(file_path))
+    try:
+        with open(file_path, 'rb') as source, \
+                os.fdopen(file_descriptor, 'wb') as target:
+            with compressing_writer(target, compression) as stream:
+                shutil.copyfileobj(source, stream)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def open_cached_file(file_path):
+    """Open cached file for reading, decompressing it while it is read.
+
+    Compression is detected from the header of the file rather than
+    the index, so a reader that races a refresh replacing the file
+    still reads it correctly, and uncompressed files keep working.
+
+    :param file_path: path of cached file
+    :type file_path: str
+
+    :raises: OSError when file does not exist
+
+    :return: binary stream of uncompressed content
+    :rtype: io.BufferedIOBase
+    """
+    file_handle = open(file_path, 'rb')
+    magic = file_handle.peek(4)[:4]
+    if magic.startswith(GZIP_MAGIC):
+        stream = gzip.GzipFile(fileobj=file_handle, mode='rb')
+        # closing the stream closes the file too
+        stream.myfileobj = file_handle
+        return stream
+    if magic == ZSTD_MAGIC:
+        if not zstandard:
+            file_handle.close()
+            raise OSError(
+                'zstandard is needed to read %s' % file_path)
+        return io.BufferedReader(
+            zstandard.ZstdDecompressor().stream_reader(
+                file_handle, closefd=True))
+    return file_handle
+
+
+class CacheEntry(object):
+    """Cached Overpass response described by a row of the index."""
+
+    def __init__(self, row, default_ttl):
+        self.path = row['path']
+        self.query = row['query']
+        self.endpoint = row['endpoint']
+        self.size = row['size']
+        self.fetched_at = row['fetched_at']
+        self.fetch_duration = row['fetch_duration']
+        self.last_access = row['last_access']
+        self.ttl = row['ttl'] if row['ttl'] is not None else default_ttl
+        self.compression = row['compression']
+
+    def is_fresh(self, now=None):
+        """Return whether entry is younger than its TTL.
+
+        :param now: current time, in unix epoch
+        :type now: float
+
+        :rtype: bool
+        """
+        if now is None:
+            now = time.time()
+        return now - self.fetched_at < self.ttl
+
+    def as_dict(self):
+        """Return entry as dictionary.
+
+        :rtype: dict
+        """
+        return dict(self.__dict__)
+
+
+class OverpassCache(object):
+    """
+    Index of Overpass responses that are cached as files.
+
+    The index records query, endpoint, size, fetch time, fetch duration
+    and last access of every file, so freshness comes from the time the
+    response was fetched instead of the mtime of the file. When total
+    size of the files is over the budget, least recently used files
+    are deleted. Files that are found without a row, e.g. written before
+    the index existed, are adopted as stale entries. Files of the cache
+    folder are adopted when the index is opened, so they count toward
+    the budget before they are read.
+
+    Files are compressed when they are recorded, the compression of
+    every entry is recorded, None for legacy uncompressed files.
+    """
+
+    def __init__(self, database_path, max_size=None, default_ttl=900,
+                 access_resolution=60, cache_folder=None):
+        """
+        :param database_path: path of sqlite database of the index
+        :type database_path: str
+
+        :param max_size: budget of total size of files in bytes,
+            None for no limit
+        :type max_size: int
+
+        :param default_ttl: seconds an entry is fresh when it does not
+            have its own TTL
+        :type default_ttl: float
+
+        :param access_resolution: seconds that last access of an entry
+            is kept before a read records it again
+        :type access_resolution: float
+
+        :param cache_folder: folder of cached files that are adopted
+            when index is opened, None to adopt files when they are read
+        :type cache_folder: str
+        """
+        self.database_path = database_path
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self.access_resolution = access_resolution
+        self.cache_folder = cache_folder
+        self._local = threading.local()
+        self._scanned = cache_folder is None
+        self._scan_lock = threading.Lock()
+
+    def connection(self):
+        """Return sqlite connection of current thread.
+
+        :rtype: sqlite3.Connection
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            folder = os.path.dirname(self.database_path)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder)
+            connection = sqlite3.connect(self.database_path, timeout=30)
+            connection.row_factory = sqlite3.Row
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.executescript(SCHEMA)
+            columns = [
+                row['name'] for row in
+                connection.execute('PRAGMA table_info(cache_entry)')]
+            if 'compression' not in columns:
+                # index created before entries were compressed
+                connection.execute(
+                    'ALTER TABLE cache_entry ADD COLUMN compression TEXT')
+            self._local.connection = connection
+        if not self._scanned:
+            with self._scan_lock:
+                if not self._scanned:
+                    self._scanned = True
+                    self.scan()
+        return connection
+
+    def scan(self):
+        """Adopt cached files of cache folder that have no entry as stale
+        entries, last accessed at their mtime, then evict if cache is
+        over its size budget.
+
+        :return: number of adopted files
+        :rtype: int
+        """
+        try:
+            names = os.listdir(self.cache_folder)
+        except OSError:
+            return 0
+        connection = self.connection()
+        indexed = set(
+            row['path'] for row in
+            connection.execute('SELECT path FROM cache_entry'))
+        rows = []
+        for name in names:
+            if not CACHE_FILE_NAME.match(name):
+                continue
+            file_path = os.path.join(self.cache_folder, name)
+            if file_path in indexed:
+                continue
+            try:
+                file_stat = os.stat(file_path)
+            except OSError:
+                continue
+            rows.append((file_path, file_stat.st_size, file_stat.st_mtime))
+        if rows:
+            with connection:
+                connection.executemany(
+                    'INSERT OR IGNORE INTO cache_entry '
+                    '(path, size, fetched_at, last_access) '
+                    'VALUES (?, ?, 0, ?)', rows)
+            LOGGER.info('Adopted %s overpass cache files' % len(rows))
+            self.evict()
+        return len(rows)
+
+    def get(self, file_path):
+        """Return entry of cached file and mark it as accessed.
+
+        Last access is only written when the recorded one is older than
+        the access resolution, so most reads do not write the index.
+
+        :param file_path: path of cached file
+        :type file_path: str
+
+        :return: entry, None if file is not cached
+        :rtype: CacheEntry
+        """
+        now = time.time()
+        connection = self.connection()
+        row = connection.execute(
+            'SELECT * FROM cache_entry WHERE path = ?',
+            (file_path,)).fetchone()
+        try:
+            size = os.path.getsize(file_path)
+        except OSError:
+            if row:
+                with connection:
+                    connection.execute(
+                        'DELETE FROM cache_entry WHERE path = ?',
+                        (file_path,))
+            return None
+        if row is None:
+            with connection:
+                connection.execute(
+                    'INSERT OR IGNORE INTO cache_entry '
+                    '(path, size, fetched_at, last_access) '
+                    'VALUES (?, ?, 0, ?)',
+                    (file_path, size, now))
+                row = connection.execute(
+                    'SELECT * FROM cache_entry WHERE path = ?',
+                    (file_path,)).fetchone()
+            return CacheEntry(row, self.default_ttl)
+
+        entry = CacheEntry(row, self.default_ttl)
+        if now - entry.last_access >= self.access_resolution:
+            with connection:
+                connection.execute(
+                    'UPDATE cache_entry SET last_access = ? '
+                    'WHERE path = ?', (now, file_path))
+            entry.last_access = now
+        return entry
+
+    def put(self, file_path, query=None, endpoint=None,
+            fetch_duration=None, ttl=None, compression=None):
+        """Record file that has just been fetched, then evict least
+        recently used files if cache is over its size budget.
+
+        The file is compressed first when compression is given.
+
+        :param file_path: path of cached file
+        :type file_path: str
+
+        :param query: Overpass query of the response
+        :type query: str
+
+        :param endpoint: url of Overpass server
+        :type endpoint: str
+
+        :param fetch_duration: seconds that fetching took
+        :type fetch_duration: float
+
+        :param ttl: seconds entry is fresh, default TTL if None
+        :type ttl: float
+
+        :param compression: gzip or zstd, None keeps file uncompressed
+        :type compression: str
+
+        :return: entry, None if file does not exist
+        :rtype: CacheEntry
+        """
+        now = time.time()
+        connection = self.connection()
+        try:
+            if compression:
+                compress_file(file_path, compression)
+            size = os.path.getsize(file_path)
+        except OSError:
+            with connection:
+                connection.execute(
+                    'DELETE FROM cache_entry WHERE path = ?', (file_path,))
+            return None
+        with connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO cache_entry '
+                '(path, query, endpoint, size, fetched_at, fetch_duration, '
+                'last_access, ttl, compression) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (file_path, query, endpoint, size, now, fetch_duration,
+                 now, ttl, compression))
+        self.evict(keep=file_path)
+        return self.get(file_path)
+
+    def remove(self, file_path):
+        """Delete cached file and its entry.
+
+        :param file_path: path of cached file
+        :type file_path: str
+        """
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
+        connection = self.connection()
+        with connection:
+            connection.execute(
+                'DELETE FROM cache_entry WHERE path = ?', (file_path,))
+
+    def total_size(self):
+        """Return total size of cached files in bytes.
+
+        :rtype: int
+        """
+        return self.connection().execute(
+            'SELECT coalesce(sum(size), 0) FROM cache_entry').fetchone()[0]
+
+    def evict(self, keep=None):
+        """Delete least recently used files until total size is in budget.
+
+        :param keep: path of file that is not evicted
+        :type keep: str
+
+        :return: paths of deleted files
+        :rtype: list
+        """
+        if self.max_size is None:
+            return []
+        total_size = self.total_size()
+        if total_size <= self.max_size:
+            return []
+        evicted = []
+        rows = self.connection().execute(
+            'SELECT path, size FROM cache_entry ORDER BY last_access'
+        ).fetchall()
+        for row in rows:
+            if total_size <= self.max_size:
+                break
+            if row['path'] == keep:
+                continue
+            self.remove(row['path'])
+            total_size -= row['size']
+            evicted.append(row['path'])
+        if evicted:
+            LOGGER.info('Evicted %s overpass cache files' % len(evicted))
+        return evicted
+
+    def entries(self):
+        """Return all entries, most recently used first.
+
+        :rtype: list
+        """
+        rows = self.connection().execute(
+            'SELECT * FROM cache_entry ORDER BY last_access DESC').fetchall()
+        return [CacheEntry(row, self.default_ttl) for row in rows]
+
+
+overpass_cache = OverpassCache(
+    os.path.join(config.CACHE_DIR, 'overpass_cache.sqlite3'),
+    max_size=config.OVERPASS_CACHE_MAX_SIZE,
+    default_ttl=config.OVERPASS_CACHE_TTL,
+    access_resolution=config.OVERPASS_CACHE_ACCESS_RESOLUTION,
+    cache_folder=config.CACHE_DIR)
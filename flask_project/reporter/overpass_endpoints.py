@@ -0,0 +1,319 @@
+# coding=utf-8
+"""
+Pool of Overpass endpoints that queries are routed to.
+
+:license: GPLv3, see LICENSE for more details.
+"""
+
+import collections
+import os
+import re
+import threading
+import time
+
+from reporter import config
+from reporter import LOGGER
+from reporter.refresh_pool import endpoint_limiter, endpoint_of
+
+CURRENT = 'current'
+ATTIC = 'attic'
+
+ATTIC_SETTING = re.compile(r'\[(a?diff|date):')
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+def query_capability(query):
+    """Return capability that endpoint of query needs.
+
+    :param query: Overpass QL
+    :type query: str
+
+    :return: attic when query asks for data of past dates, else current
+    :rtype: str
+    """
+    if query and ATTIC_SETTING.search(query):
+        return ATTIC
+    return CURRENT
+
+
+class OverpassEndpoint(object):
+    """Overpass server with what it serves and how it answered."""
+
+    def __init__(self, url, capabilities=(CURRENT,)):
+        """
+        :param url: url of interpreter, e.g.
+            http://overpass-api.de/api/interpreter
+        :type url: str
+
+        :param capabilities: data the server serves, current and/or attic
+        :type capabilities: list
+        """
+        self.url = url
+        self.capabilities = set(capabilities)
+        self.latency = None
+        self.requests = 0
+        self.errors = 0
+        self.failures_in_row = 0
+        self.events = collections.deque()
+        self.state = CLOSED
+        self.opened_at = None
+        self.last_error = None
+
+
+class EndpointPool(object):
+    """
+    Endpoints that serve Overpass queries, picked per query by the data
+    it needs, health, measured latency and recent error rate.
+
+    Every answer of an endpoint is recorded. Latency is a moving average
+    of successful requests, error rate is the share of failed requests
+    in the error window. An endpoint is ranked by its latency plus its
+    error rate times the error penalty, so an unmeasured endpoint is
+    tried soon. After failures in a row its circuit opens and it gets no
+    request until the reset timeout passes, then one answer decides
+    whether it closes again. Endpoints that the limiter backs off from
+    and open ones are only used when no other endpoint is left.
+    """
+
+    def __init__(
+            self,
+            limiter=None,
+            failure_threshold=5,
+            reset_timeout=60,
+            error_window=300,
+            error_penalty=60,
+            latency_weight=0.3):
+        """
+        :param limiter: limiter whose backoff of endpoints is respected
+        :type limiter: EndpointLimiter
+
+        :param failure_threshold: failures in a row that open circuit
+        :type failure_threshold: int
+
+        :param reset_timeout: seconds until an open endpoint is tried
+        :type reset_timeout: float
+
+        :param error_window: seconds of requests in error rate
+        :type error_window: float
+
+        :param error_penalty: seconds of latency an error rate of 1 is
+            ranked as
+        :type error_penalty: float
+
+        :param latency_weight: weight of last request in latency average
+        :type latency_weight: float
+        """
+        self.limiter = limiter
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.error_window = error_window
+        self.error_penalty = error_penalty
+        self.latency_weight = latency_weight
+        self._endpoints = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, url, capabilities=(CURRENT,)):
+        """Add endpoint, capabilities are merged when url is in pool.
+
+        :param url: url of interpreter
+        :type url: str
+
+        :param capabilities: data the server serves, current and/or attic
+        :type capabilities: list
+        """
+        if not url:
+            return
+        with self._lock:
+            endpoint = self._endpoints.get(url)
+            if endpoint is None:
+                self._endpoints[url] = OverpassEndpoint(url, capabilities)
+            else:
+                endpoint.capabilities.update(capabilities)
+
+    def _prune(self, endpoint, now):
+        while endpoint.events and \
+                endpoint.events[0][0] < now - self.error_window:
+            endpoint.events.popleft()
+
+    def _error_rate(self, endpoint, now):
+        self._prune(endpoint, now)
+        if not endpoint.events:
+            return 0.
+        errors = sum(1 for _, failed in endpoint.events if failed)
+        return float(errors) / len(endpoint.events)
+
+    def _available(self, endpoint, now):
+        if endpoint.state == OPEN:
+            if now - endpoint.opened_at < self.reset_timeout:
+                return False
+            endpoint.state = HALF_OPEN
+        if self.limiter is not None:
+            if self.limiter.backoff_until(endpoint_of(endpoint.url)) > now:
+                return False
+        return True
+
+    def _score(self, endpoint, now):
+        return (endpoint.latency or 0) + \
+            self._error_rate(endpoint, now) * self.error_penalty
+
+    def _ranked(self, capability, now):
+        endpoints = [
+            endpoint for endpoint in self._endpoints.values()
+            if capability in endpoint.capabilities]
+        available = [
+            endpoint for endpoint in endpoints
+            if self._available(endpoint, now)]
+        available.sort(key=lambda endpoint: self._score(endpoint, now))
+        # soonest to be tried again first
+        others = sorted(
+            (endpoint for endpoint in endpoints
+             if endpoint not in available),
+            key=lambda endpoint: endpoint.opened_at or 0)
+        return available, others
+
+    def candidates(self, capability=CURRENT):
+        """Return urls of endpoints with capability, best first.
+
+        Unavailable endpoints are last, as the last resort.
+
+        :param capability: current or attic
+        :type capability: str
+
+        :rtype: list
+        """
+        with self._lock:
+            available, others = self._ranked(capability, time.time())
+            return [endpoint.url for endpoint in available + others]
+
+    def route(self, capability=CURRENT):
+        """Return url of best endpoint with capability.
+
+        :param capability: current or attic
+        :type capability: str
+
+        :raises: ValueError when no endpoint has capability
+
+        :rtype: str
+        """
+        urls = self.candidates(capability)
+        if not urls:
+            raise ValueError(
+                'No Overpass endpoint serves %s data' % capability)
+        return urls[0]
+
+    def failover(self, url, query=None):
+        """Return urls to request query from, url first.
+
+        :param url: url that query is routed to
+        :type url: str
+
+        :param query: Overpass QL, decides capability of other endpoints
+        :type query: str
+
+        :return: url and other available endpoints that serve query,
+            best first, only url when it is not in pool
+        :rtype: list
+        """
+        with self._lock:
+            if url not in self._endpoints:
+                return [url]
+            available, _ = self._ranked(
+                query_capability(query), time.time())
+            return [url] + [
+                endpoint.url for endpoint in available
+                if endpoint.url != url]
+
+    def record(self, url, duration=None, error=None):
+        """Record answer of endpoint.
+
+        :param url: url of endpoint
+        :type url: str
+
+        :param duration: seconds the request took
+        :type duration: float
+
+        :param error: error of failed request, None for success
+        :type error: Exception
+        """
+        now = time.time()
+        with self._lock:
+            endpoint = self._endpoints.get(url)
+            if endpoint is None:
+                return
+            endpoint.requests += 1
+            endpoint.events.append((now, error is not None))
+            self._prune(endpoint, now)
+            if error is None:
+                if duration is not None:
+                    if endpoint.latency is None:
+                        endpoint.latency = duration
+                    else:
+                        endpoint.latency += self.latency_weight * (
+                            duration - endpoint.latency)
+                endpoint.failures_in_row = 0
+                endpoint.state = CLOSED
+                endpoint.opened_at = None
+                return
+
+            endpoint.errors += 1
+            endpoint.failures_in_row += 1
+            endpoint.last_error = '%s' % error or error.__class__.__name__
+            if endpoint.state == HALF_OPEN or \
+                    endpoint.failures_in_row >= self.failure_threshold:
+                if endpoint.state != OPEN:
+                    LOGGER.info(
+                        '%s failed %s times in a row, not routing to it '
+                        'for %s seconds' % (
+                            url, endpoint.failures_in_row,
+                            self.reset_timeout))
+                endpoint.state = OPEN
+                endpoint.opened_at = now
+
+    def stats(self):
+        """Return health, latency and error rate of endpoints.
+
+        :rtype: list
+        """
+        now = time.time()
+        with self._lock:
+            return [{
+                'url': endpoint.url,
+                'capabilities': sorted(endpoint.capabilities),
+                'state': endpoint.state,
+                'available': self._available(endpoint, now),
+                'latency': endpoint.latency,
+                'error_rate': self._error_rate(endpoint, now),
+                'requests': endpoint.requests,
+                'errors': endpoint.errors,
+                'failures_in_row': endpoint.failures_in_row,
+                'last_error': endpoint.last_error
+            } for endpoint in self._endpoints.values()]
+
+
+def configured_endpoint_pool(limiter=None):
+    """Return pool of endpoints of OVERPASS_ENDPOINTS and of
+    DEFAULT_OVERPASS_URL and ATTIC_DATA_SERVER_URL of environment.
+
+    :param limiter: limiter whose backoff of endpoints is respected
+    :type limiter: EndpointLimiter
+
+    :rtype: EndpointPool
+    """
+    pool = EndpointPool(
+        limiter=limiter,
+        failure_threshold=config.OVERPASS_CIRCUIT_FAILURES,
+        reset_timeout=config.OVERPASS_CIRCUIT_RESET,
+        error_window=config.OVERPASS_ERROR_WINDOW,
+        error_penalty=config.OVERPASS_ERROR_PENALTY)
+    for endpoint in config.OVERPASS_ENDPOINTS:
+        pool.add(
+            endpoint['url'], endpoint.get('capabilities', (CURRENT,)))
+    pool.add(os.environ.get('DEFAULT_OVERPASS_URL'), (CURRENT,))
+    pool.add(os.environ.get('ATTIC_DATA_SERVER_URL'), (ATTIC,))
+    return pool
+
+
+endpoint_pool = configured_endpoint_pool(endpoint_limiter)
@@ -0,0 +1,282 @@
+# coding=utf-8
+"""
+Structured Overpass query with canonical serialization.
+
+:license: GPLv3, see LICENSE for more details.
+"""
+
+import datetime
+import hashlib
+import os
+
+from reporter import config
+from reporter import LOGGER
+
+ELEMENT_TYPES = ('node', 'way', 'relation')
+
+# spellings of output verbosity that overpass treats the same
+VERBOSITY_ALIASES = {
+    None: 'body',
+    '': 'body',
+    'skeleton': 'skel',
+    'ids_only': 'ids',
+}
+
+
+def format_coordinate(value, precision=None):
+    """Return coordinate rounded to precision without trailing zeros.
+
+    :param value: coordinate in degrees
+    :type value: float, str
+
+    :param precision: decimals, default is OVERPASS_COORDINATE_PRECISION
+    :type precision: int
+
+    :rtype: str
+    """
+    if precision is None:
+        precision = config.OVERPASS_COORDINATE_PRECISION
+    text = '%.*f' % (precision, float(value))
+    if '.' in text:
+        text = text.rstrip('0').rstrip('.')
+    if text == '-0':
+        text = '0'
+    return text
+
+
+def format_date(milliseconds):
+    """Return overpass date of time in milliseconds since epoch.
+
+    :raises: ValueError when time is not a number
+
+    :rtype: str
+    """
+    return datetime.datetime.utcfromtimestamp(
+        float(milliseconds) / 1000.).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def tag_filter(key, operator=None, value=None):
+    """Return canonical tag filter.
+
+    :param key: key of tag
+    :type key: str
+
+    :param operator: None for any value, '=', '!=' or '~' that matches
+        one of values as regular expression
+    :type operator: str
+
+    :param value: value of tag, list of values for '~'
+    :type value: str, list
+
+    :rtype: tuple
+    """
+    if operator == '~':
+        value = tuple(sorted(set(value)))
+    return key, operator, value
+
+
+def feature_filters(feature_key, feature_values=None):
+    """Return tag filters of feature key and values.
+
+    :rtype: tuple
+    """
+    if feature_values:
+        return tag_filter(feature_key, '~', feature_values),
+    return tag_filter(feature_key),
+
+
+class OverpassQuery(object):
+    """
+    Overpass query of elements that are selected by tag filters in an
+    area, or by ids, with time window, verbosity and output format.
+
+    The query is serialized canonically: selectors and values are
+    sorted, coordinates rounded to OVERPASS_COORDINATE_PRECISION and
+    dates to seconds, so equivalent queries have the same text and so
+    the same cache file.
+    """
+
+    def __init__(
+            self,
+            selectors=(),
+            polygon=None,
+            bbox=None,
+            element_ids=None,
+            recurse=True,
+            date_from=None,
+            date_to=None,
+            augmented=False,
+            verbosity='body',
+            response_format='xml'):
+        """
+        :param selectors: element type and tag filters of selected
+            elements, e.g. [('way', (('building', None, None),))]
+        :type selectors: list
+
+        :param polygon: area as list of [lat, lon] or poly string
+            e.g. '50.7 7.1 50.7 7.12 50.71 7.11'
+        :type polygon: list, str
+
+        :param bbox: area as (south, west, north, east)
+        :type bbox: tuple
+
+        :param element_ids: ids of node, way and relation
+        :type element_ids: Dict[str, list]
+
+        :param recurse: query members of selected elements too
+        :type recurse: bool
+
+        :param date_from: start of time window in milliseconds
+        :type date_from: str, float
+
+        :param date_to: end of time window in milliseconds
+        :type date_to: str, float
+
+        :param augmented: query augmented diff of time window
+        :type augmented: bool
+
+        :param verbosity: output verbosity, e.g. body, skel, ids or meta
+        :type verbosity: str
+
+        :param response_format: xml or json
+        :type response_format: str
+        """
+        self.selectors = tuple(sorted(set(
+            (element_type, tuple(sorted(set(filters))))
+            for element_type, filters in selectors)))
+
+        self.polygon = None
+        if isinstance(polygon, str):
+            values = polygon.split()
+            polygon = list(zip(values[0::2], values[1::2]))
+        if polygon:
+            self.polygon = tuple(
+                (format_coordinate(lat), format_coordinate(lon))
+                for lat, lon in polygon)
+        self.bbox = None
+        if bbox:
+            self.bbox = tuple(format_coordinate(value) for value in bbox)
+
+        self.element_ids = None
+        if element_ids is not None:
+            self.element_ids = tuple(
+                (element_type, tuple(sorted(set(
+                    int(element_id)
+                    for element_id in element_ids.get(element_type, ())))))
+                for element_type in ELEMENT_TYPES)
+
+        self.time_window = None
+        if date_from and date_to:
+            try:
+                self.time_window = (
+                    format_date(date_from), format_date(date_to))
+            except ValueError as e:
+                LOGGER.debug(e)
+        self.augmented = augmented
+        self.recurse = recurse
+        self.verbosity = VERBOSITY_ALIASES.get(verbosity, verbosity)
+        self.response_format = response_format
+
+    @classmethod
+    def feature(
+            cls,
+            feature_key,
+            feature_values=None,
+            element_types=ELEMENT_TYPES,
+            **kwargs):
+        """Return query of elements that have feature key, with one of
+        feature values when they are given.
+
+        :param feature_key: key of tag e.g. building
+        :type feature_key: str
+
+        :param feature_values: values of tag
+        :type feature_values: list
+
+        :param element_types: types of selected elements
+        :type element_types: tuple
+
+        :param kwargs: other arguments of query
+
+        :rtype: OverpassQuery
+        """
+        filters = feature_filters(feature_key, feature_values)
+        return cls(
+            selectors=[
+                (element_type, filters) for element_type in element_types],
+            **kwargs)
+
+    def _area(self):
+        if self.bbox:
+            return '(%s)' % ','.join(self.bbox)
+        if self.polygon:
+            return '(poly:"%s")' % ' '.join(
+                '%s %s' % point for point in self.polygon)
+        return ''
+
+    @staticmethod
+    def _filter(key, operator, value):
+        if operator is None:
+            return '["%s"]' % key
+        if operator == '~':
+            value = '|'.join(value)
+        return '["%s"%s"%s"]' % (key, operator, value)
+
+    def serialize(self):
+        """Return canonical Overpass QL of query.
+
+        :rtype: str
+        """
+        settings = ''
+        if self.response_format == 'json':
+            settings += '[out:json]'
+        if self.time_window:
+            settings += '[%s:"%s","%s"]' % (
+                ('adiff' if self.augmented else 'diff',) + self.time_window)
+        if settings:
+            settings += ';'
+
+        statements = ''
+        if self.element_ids is not None:
+            for element_type, ids in self.element_ids:
+                if ids:
+                    statements += '%s(id:%s);' % (
+                        element_type, ','.join(str(id) for id in ids))
+        else:
+            area = self._area()
+            for element_type, filters in self.selectors:
+                statements += element_type + ''.join(
+                    self._filter(*tag) for tag in filters) + area + ';'
+
+        query = settings + '(' + statements + ');'
+        if self.recurse:
+            query += '(._;>;);'
+        return query + 'out %s;' % self.verbosity
+
+    def __str__(self):
+        return self.serialize()
+
+    def __eq__(self, other):
+        return isinstance(other, OverpassQuery) and \
+            self.serialize() == other.serialize()
+
+    def __hash__(self):
+        return hash(self.serialize())
+
+    def cache_name(self, suffix='.osm'):
+        """Return name of cache file of query.
+
+        :param suffix: suffix of file name
+        :type suffix: str
+
+        :rtype: str
+        """
+        return hashlib.md5(
+            self.serialize().encode('utf-8')).hexdigest() + suffix
+
+    def cache_path(self, suffix='.osm'):
+        """Return path of cache file of query in cache folder.
+
+        :rtype: str
+        """
+        return os.path.join(config.CACHE_DIR, self.cache_name(suffix))
@@ -0,0 +1,683 @@
+# coding=utf-8
+"""
+Local stand-in of an Overpass server that answers from an OSM extract.
+
+:license: GPLv3, see LICENSE for more details.
+"""
+
+import datetime
+import json
+import random
+import re
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape, quoteattr
+
+from shapely import geometry as shapely_geometry
+from shapely.prepared import prep
+
+from reporter import LOGGER
+from reporter.overpass_tiles import polygon_from_overpass
+
+ELEMENT_TYPES = ('node', 'way', 'relation')
+VERBOSITIES = ('ids', 'skel', 'body', 'tags', 'meta')
+META_ATTRIBUTES = ('version', 'timestamp', 'changeset', 'uid', 'user')
+INTEGER_ATTRIBUTES = ('version', 'changeset', 'uid')
+DATE_FORMATS = ('%Y-%m-%dT%H:%M:%SZ', '%Y-%m-%dT%H:%M:%S.%fZ')
+
+SETTINGS = re.compile(r'\s*((?:\[[^\]]*\]\s*)+);')
+SETTING = re.compile(r'\[(\w+):([^\]]*)\]')
+STATEMENT = re.compile(
+    r'\s*(node|way|relation|nwr)((?:\[[^\]]*\])*)\s*(?:\(([^)]*)\))?\s*;')
+FILTER = re.compile(r'\["([^"]+)"(?:(=|!=|~)"([^"]*)")?\]')
+RECURSE_DOWN = re.compile(r'\s*\(\s*\._\s*;\s*>\s*;\s*\)\s*;')
+OUT = re.compile(r'\s*out(?:\s+(\w+))?\s*;\s*$')
+
+COPYRIGHT = (
+    'The data included in this document is from www.openstreetmap.org. '
+    'The data is made available under ODbL.')
+
+
+def parse_date(value):
+    """Return unix epoch of overpass date.
+
+    :raises: ValueError when date has no known format
+
+    :rtype: float
+    """
+    for date_format in DATE_FORMATS:
+        try:
+            date = datetime.datetime.strptime(value, date_format)
+        except ValueError:
+            continue
+        return (date - datetime.datetime(1970, 1, 1)).total_seconds()
+    raise ValueError('unknown date %s' % value)
+
+
+def parse_query(text):
+    """Parse Overpass QL of the shapes that the provider sends.
+
+    Those are settings of output format and time window, a union of
+    statements that select elements by type, tag filters and a bbox or
+    polygon, or by ids, an optional recursion down and an out statement.
+
+    :param text: Overpass QL
+    :type text: str
+
+    :raises: ValueError when query has another shape
+
+    :return: dict of response_format, time_window, augmented,
+        statements, recurse and verbosity
+    :rtype: dict
+    """
+    query = {
+        'response_format': 'xml',
+        'time_window': None,
+        'augmented': False,
+        'statements': [],
+        'recurse': False,
+        'verbosity': 'body'
+    }
+    position = 0
+    match = SETTINGS.match(text)
+    if match:
+        for name, value in SETTING.findall(match.group(1)):
+            if name == 'out':
+                if value not in ('json', 'xml'):
+                    raise ValueError('unknown output format %s' % value)
+                query['response_format'] = value
+            elif name in ('diff', 'adiff'):
+                dates = [
+                    parse_date(date.strip().strip('"'))
+                    for date in value.split(',')]
+                if len(dates) == 1:
+                    dates.append(time.time())
+                query['time_window'] = tuple(dates[:2])
+                query['augmented'] = name == 'adiff'
+            elif name not in ('timeout', 'maxsize'):
+                raise ValueError('unknown setting %s' % name)
+        position = match.end()
+
+    text = text[position:].lstrip()
+    if not text.startswith('('):
+        raise ValueError('union of statements is expected')
+    position = 1
+    while True:
+        match = STATEMENT.match(text, position)
+        if not match:
+            break
+        query['statements'].append(parse_statement(*match.groups()))
+        position = match.end()
+    closing = re.compile(r'\s*\)\s*;').match(text, position)
+    if not closing:
+        raise ValueError('unknown statement at %s' % text[position:])
+    position = closing.end()
+
+    match = RECURSE_DOWN.match(text, position)
+    if match:
+        query['recurse'] = True
+        position = match.end()
+    match = OUT.match(text, position)
+    if not match:
+        raise ValueError('out statement is expected')
+    verbosity = match.group(1) or 'body'
+    if verbosity not in VERBOSITIES:
+        raise ValueError('unknown verbosity %s' % verbosity)
+    query['verbosity'] = verbosity
+    return query
+
+
+def parse_statement(element_type, filters, area):
+    """Return statement of element types, tag filters, ids and area.
+
+    :rtype: dict
+    """
+    statement = {
+        'types': ELEMENT_TYPES if element_type == 'nwr' else (element_type,),
+        'filters': FILTER.findall(filters),
+        'ids': None,
+        'area': None
+    }
+    if FILTER.sub('', filters):
+        raise ValueError('unknown filter %s' % filters)
+    for _, operator, value in statement['filters']:
+        if operator == '~':
+            re.compile(value)
+    area = (area or '').strip()
+    if area.startswith('id:'):
+        statement['ids'] = set(
+            int(element_id) for element_id in area[3:].split(','))
+    elif area.startswith('poly:'):
+        statement['area'] = prep(
+            polygon_from_overpass(area[5:].strip().strip('"')))
+    elif area:
+        south, west, north, east = [
+            float(value) for value in area.split(',')]
+        statement['area'] = prep(
+            shapely_geometry.box(west, south, east, north))
+    return statement
+
+
+def _parse_element(node):
+    attributes = dict(node.attrib)
+    element = {
+        'type': node.tag,
+        'id': int(attributes.pop('id')),
+        'attributes': attributes,
+        'tags': {},
+        'nodes': [],
+        'members': []
+    }
+    for child in node:
+        if child.tag == 'tag':
+            element['tags'][child.get('k')] = child.get('v')
+        elif child.tag == 'nd':
+            element['nodes'].append(int(child.get('ref')))
+        elif child.tag == 'member':
+            element['members'].append({
+                'type': child.get('type'),
+                'ref': int(child.get('ref')),
+                'role': child.get('role', '')
+            })
+    return element
+
+
+def _sort_key(element):
+    return ELEMENT_TYPES.index(element['type']), element['id']
+
+
+class OsmExtract(object):
+    """
+    Elements of an OSM extract and their changes.
+
+    An extract is an OSM xml file, e.g. a download of an area, or an
+    augmented diff, whose newest versions are the current elements.
+    Every version in the file is a change, at its timestamp. A deletion
+    without new version has no known time, it is a change of any time
+    window.
+    """
+
+    def __init__(self, osm_path):
+        """
+        :param osm_path: path of OSM xml file
+        :type osm_path: str
+        """
+        self.elements = {}
+        self.changes = []
+        self.locations = {}
+        self.osm_base = None
+        self._load(osm_path)
+
+    def _load(self, osm_path):
+        depth = 0
+        for event, node in ElementTree.iterparse(
+                osm_path, events=('start', 'end')):
+            if event == 'start':
+                depth += 1
+                continue
+            depth -= 1
+            if depth != 1:
+                continue
+            if node.tag in ELEMENT_TYPES:
+                element = _parse_element(node)
+                version = element['attributes'].get('version')
+                self._add_change(
+                    'create' if version == '1' else 'modify', None, element)
+            elif node.tag == 'action':
+                old = new = None
+                for child in node:
+                    if child.tag == 'old' and len(child):
+                        old = _parse_element(child[0])
+                    elif child.tag == 'new' and len(child):
+                        new = _parse_element(child[0])
+                    elif child.tag in ELEMENT_TYPES:
+                        new = _parse_element(child)
+                self._add_change(node.get('type'), old, new)
+            elif node.tag == 'meta':
+                self.osm_base = node.get('osm_base')
+            node.clear()
+
+    def _add_change(self, action, old, new):
+        for version in (old, new):
+            if version is not None and version['type'] == 'node' and \
+                    'lat' in version['attributes']:
+                self.locations[version['id']] = (
+                    float(version['attributes']['lon']),
+                    float(version['attributes']['lat']))
+        deleted = action == 'delete' or (
+            new is not None and
+            new['attributes'].get('visible') == 'false')
+        element = new or old
+        key = (element['type'], element['id'])
+        if deleted:
+            self.elements.pop(key, None)
+        else:
+            self.elements[key] = new
+        changed_at = None
+        if new is not None and 'timestamp' in new['attributes']:
+            changed_at = parse_date(new['attributes']['timestamp'])
+        self.changes.append({
+            'action': action,
+            'old': old,
+            'new': new,
+            'changed_at': changed_at
+        })
+
+    def _in_area(self, element, area, depth=0):
+        if element['type'] == 'node':
+            location = self.locations.get(element['id'])
+            return location is not None and \
+                area.intersects(shapely_geometry.Point(location))
+        if element['type'] == 'way':
+            return any(
+                node_id in self.locations and
+                area.intersects(
+                    shapely_geometry.Point(self.locations[node_id]))
+                for node_id in element['nodes'])
+        if depth > 2:
+            return False
+        for member in element['members']:
+            member_element = self.elements.get(
+                (member['type'], member['ref']))
+            if member_element is not None and \
+                    self._in_area(member_element, area, depth + 1):
+                return True
+        return False
+
+    def matches(self, element, statement):
+        """Return whether element is selected by statement.
+
+        :rtype: bool
+        """
+        if element['type'] not in statement['types']:
+            return False
+        if statement['ids'] is not None and \
+                element['id'] not in statement['ids']:
+            return False
+        for key, operator, value in statement['filters']:
+            tag = element['tags'].get(key)
+            if operator == '!=':
+                if tag == value:
+                    return False
+            elif tag is None:
+                return False
+            elif operator == '=' and tag != value:
+                return False
+            elif operator == '~' and not re.search(value, tag):
+                return False
+        if statement['area'] is not None:
+            return self._in_area(element, statement['area'])
+        return True
+
+    def select(self, query):
+        """Return current elements that query selects, in overpass order.
+
+        :param query: query of `parse_query`
+        :type query: dict
+
+        :rtype: list
+        """
+        selected = {}
+        for statement in query['statements']:
+            if statement['ids'] is not None:
+                candidates = (
+                    self.elements.get((element_type, element_id))
+                    for element_type in statement['types']
+                    for element_id in statement['ids'])
+            else:
+                candidates = self.elements.values()
+            for element in candidates:
+                if element is not None and self.matches(element, statement):
+                    selected[(element['type'], element['id'])] = element
+
+        if query['recurse']:
+            for element in list(selected.values()):
+                self._recurse_down(element, selected)
+        return sorted(selected.values(), key=_sort_key)
+
+    def _recurse_down(self, element, selected):
+        references = [('node', node_id) for node_id in element['nodes']]
+        references += [
+            (member['type'], member['ref'])
+            for member in element['members']]
+        for key in references:
+            member = self.elements.get(key)
+            if member is None or key in selected:
+                continue
+            selected[key] = member
+            if member['type'] == 'way':
+                self._recurse_down(member, selected)
+
+    def select_changes(self, query):
+        """Return changes in time window of query to elements it selects.
+
+        :param query: query of `parse_query` with time window
+        :type query: dict
+
+        :rtype: list
+        """
+        date_from, date_to = query['time_window']
+        changes = []
+        for change in self.changes:
+            changed_at = change['changed_at']
+            if changed_at is not None and \
+                    not date_from < changed_at <= date_to:
+                continue
+            if any(self.matches(version, statement)
+                   for version in (change['old'], change['new'])
+                   if version is not None
+                   for statement in query['statements']):
+                changes.append(change)
+        return changes
+
+
+def element_json(element, verbosity):
+    """Return element as overpass json.
+
+    :rtype: dict
+    """
+    data = {'type': element['type'], 'id': element['id']}
+    attributes = element['attributes']
+    if element['type'] == 'node' and verbosity not in ('ids', 'tags') and \
+            'lat' in attributes:
+        data['lat'] = float(attributes['lat'])
+        data['lon'] = float(attributes['lon'])
+    if verbosity == 'meta':
+        for name in META_ATTRIBUTES:
+            if name in attributes:
+                data[name] = int(attributes[name]) \
+                    if name in INTEGER_ATTRIBUTES else attributes[name]
+    if verbosity not in ('ids', 'tags'):
+        if element['type'] == 'way':
+            data['nodes'] = element['nodes']
+        elif element['type'] == 'relation':
+            data['members'] = element['members']
+    if verbosity in ('body', 'tags', 'meta') and element['tags']:
+        data['tags'] = element['tags']
+    return data
+
+
+def element_xml(element, verbosity, indent='  '):
+    """Return element as overpass xml.
+
+    :rtype: str
+    """
+    attributes = element['attributes']
+    names = []
+    if element['type'] == 'node' and verbosity not in ('ids', 'tags'):
+        names += ['lat', 'lon']
+    if verbosity == 'meta':
+        names += ['visible']
+        names += META_ATTRIBUTES
+    text = '%s<%s id="%s"' % (indent, element['type'], element['id'])
+    text += ''.join(
+        ' %s=%s' % (name, quoteattr(attributes[name]))
+        for name in names if name in attributes)
+
+    children = []
+    if verbosity not in ('ids', 'tags'):
+        children += ['<nd ref="%s"/>' % node for node in element['nodes']]
+        children += [
+            '<member type="%s" ref="%s" role=%s/>' % (
+                member['type'], member['ref'], quoteattr(member['role']))
+            for member in element['members']]
+    if verbosity in ('body', 'tags', 'meta'):
+        children += [
+            '<tag k=%s v=%s/>' % (quoteattr(key), quoteattr(value))
+            for key, value in sorted(element['tags'].items())]
+    if not children:
+        return text + '/>\n'
+    return text + '>\n' + ''.join(
+        '%s  %s\n' % (indent, child) for child in children) + \
+        '%s</%s>\n' % (indent, element['type'])
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    """HTTP server that answers each request in a thread."""
+    daemon_threads = True
+
+
+class OverpassStandIn(object):
+    """
+    HTTP server that answers Overpass queries from an OSM extract.
+
+    It serves POST and GET requests of the `data` parameter at
+    /api/interpreter, as json or xml, for queries of `parse_query`, and
+    diff and augmented diff queries as xml actions; augmented diffs do
+    not add elements that only changed through their members. Other
+    queries are answered with 400.
+
+    Artificial latency, timeouts, where a runtime error remark is
+    answered as Overpass does when a query runs out of time, and busy
+    answers (429) are configurable, and received queries are recorded,
+    so caching, coalescing and refreshing of documents can be tested
+    and load tested without a live Overpass server.
+    """
+
+    def __init__(
+            self,
+            osm_path,
+            host='127.0.0.1',
+            port=0,
+            latency=0,
+            jitter=0,
+            timeout_rate=0,
+            busy_rate=0,
+            slots=None,
+            seed=None):
+        """
+        :param osm_path: path of OSM extract that is served
+        :type osm_path: str
+
+        :param host: host that server listens on
+        :type host: str
+
+        :param port: port that server listens on, 0 for a free port
+        :type port: int
+
+        :param latency: seconds every answer is delayed
+        :type latency: float
+
+        :param jitter: maximum random seconds added to latency
+        :type jitter: float
+
+        :param timeout_rate: share of queries answered with a timeout
+        :type timeout_rate: float
+
+        :param busy_rate: share of queries answered with 429
+        :type busy_rate: float
+
+        :param slots: queries that are answered at the same time, more
+            are answered with 429, None for no limit
+        :type slots: int
+        """
+        self.extract = OsmExtract(osm_path)
+        self.latency = latency
+        self.jitter = jitter
+        self.timeout_rate = timeout_rate
+        self.busy_rate = busy_rate
+        self.slots = slots
+        self.queries = []
+        self.busy_answers = 0
+        self.timeouts = 0
+        self._running = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.server = ThreadingHTTPServer((host, port), OverpassRequestHandler)
+        self.server.stand_in = self
+
+    @property
+    def url(self):
+        """Url of interpreter of server."""
+        host, port = self.server.server_address[:2]
+        return 'http://%s:%s/api/interpreter' % (host, port)
+
+    def start(self):
+        """Serve requests in a background thread.
+
+        :rtype: OverpassStandIn
+        """
+        self._thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving requests."""
+        self.server.shutdown()
+        self.server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def osm_base(self):
+        """Return time of data of extract as overpass date.
+
+        :rtype: str
+        """
+        return self.extract.osm_base or \
+            datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    def handle(self, text):
+        """Answer query with the configured misbehaviour.
+
+        :param text: Overpass QL
+        :type text: str
+
+        :return: HTTP status, content type and body
+        :rtype: tuple
+        """
+        with self._lock:
+            self.queries.append(text)
+            busy = self._random.random() < self.busy_rate or (
+                self.slots is not None and self._running >= self.slots)
+            timed_out = not busy and \
+                self._random.random() < self.timeout_rate
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            if busy:
+                self.busy_answers += 1
+            else:
+                self._running += 1
+        if busy:
+            return 429, 'text/plain', b'Too many requests.'
+        try:
+            if delay:
+                time.sleep(delay)
+            try:
+                query = parse_query(text)
+            except ValueError as e:
+                return 400, 'text/html', (
+                    '<p><strong style="color:#FF0000">Error</strong>: '
+                    'line 1: parse error: %s </p>' % escape('%s' % e)
+                ).encode('utf-8')
+            if timed_out:
+                with self._lock:
+                    self.timeouts += 1
+            return self.answer(query, timed_out)
+        finally:
+            if not busy:
+                with self._lock:
+                    self._running -= 1
+
+    def answer(self, query, timed_out=False):
+        """Answer parsed query from extract.
+
+        :param query: query of `parse_query`
+        :type query: dict
+
+        :param timed_out: answer a runtime error instead of elements
+        :type timed_out: bool
+
+        :return: HTTP status, content type and body
+        :rtype: tuple
+        """
+        remark = 'runtime error: Query timed out in "query" at line 1 ' \
+                 'after 180 seconds.'
+        if query['response_format'] == 'json':
+            if query['time_window']:
+                return 400, 'text/html', \
+                    b'<p>Error: diff output is only served as xml</p>'
+            document = {
+                'version': 0.6,
+                'generator': 'Overpass API stand-in',
+                'osm3s': {
+                    'timestamp_osm_base': self.osm_base(),
+                    'copyright': COPYRIGHT
+                },
+                'elements': []
+            }
+            if timed_out:
+                document['remark'] = remark
+            else:
+                document['elements'] = [
+                    element_json(element, query['verbosity'])
+                    for element in self.extract.select(query)]
+            return 200, 'application/json', \
+                json.dumps(document).encode('utf-8')
+
+        body = ''
+        if timed_out:
+            body = '<remark> %s </remark>\n' % escape(remark)
+        elif query['time_window']:
+            for change in self.extract.select_changes(query):
+                body += '<action type="%s">\n' % change['action']
+                if change['old'] is None:
+                    body += element_xml(change['new'], query['verbosity'])
+                else:
+                    for name in ('old', 'new'):
+                        if change[name] is not None:
+                            body += '<%s>\n%s</%s>\n' % (
+                                name,
+                                element_xml(change[name], query['verbosity']),
+                                name)
+                body += '</action>\n'
+        else:
+            body = ''.join(
+                element_xml(element, query['verbosity'])
+                for element in self.extract.select(query))
+        document = (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<osm version="0.6" generator="Overpass API stand-in">\n'
+            '<note>%s</note>\n'
+            '<meta osm_base="%s"/>\n\n%s</osm>\n') % (
+                COPYRIGHT, self.osm_base(), body)
+        return 200, 'application/osm3s+xml', document.encode('utf-8')
+
+
+class OverpassRequestHandler(BaseHTTPRequestHandler):
+    """Handler of requests to Overpass stand-in."""
+
+    def _answer(self, data):
+        if urlsplit(self.path).path.rstrip('/') != '/api/interpreter':
+            self.send_error(404)
+            return
+        if not data:
+            self.send_error(400, 'data parameter is missing')
+            return
+        status, content_type, body = self.server.stand_in.handle(data[0])
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._answer(parse_qs(urlsplit(self.path).query).get('data'))
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode('utf-8')
+        self._answer(parse_qs(body).get('data'))
+
+    def log_message(self, message_format, *args):
+        LOGGER.debug(message_format % args)
@@ -0,0 +1,121 @@
+# coding=utf-8
+"""
+Grid tiles of Overpass queries and merging of their elements.
+
+:license: GPLv3, see LICENSE for more details.
+"""
+
+import math
+
+from shapely import geometry as shapely_geometry
+from shapely.prepared import prep
+
+
+def polygon_from_overpass(polygon):
+    """Return shapely polygon of polygon in overpass order, lat lon.
+
+    :param polygon: poly string e.g. '50.7 7.1 50.7 7.12 50.71 7.11'
+        or list of [lat, lon]
+    :type polygon: str, list
+
+    :rtype: shapely.geometry.Polygon
+    """
+    if isinstance(polygon, str):
+        values = [float(value) for value in polygon.split()]
+        polygon = list(zip(values[0::2], values[1::2]))
+    if len(polygon) < 3:
+        raise ValueError(
+            'At least 3 lat/lon float value pairs must be provided')
+    shape = shapely_geometry.Polygon(
+        [(float(lon), float(lat)) for lat, lon in polygon])
+    if not shape.is_valid:
+        shape = shape.buffer(0)
+    return shape
+
+
+def grid_tiles(shape, tile_size):
+    """Return tiles of grid that intersect shape.
+
+    Grid is aligned to multiples of tile size, so campaigns that overlap
+    or have slightly different boundaries share tiles.
+
+    :param shape: area to cover
+    :type shape: shapely.geometry.base.BaseGeometry
+
+    :param tile_size: size of tile in degrees
+    :type tile_size: float
+
+    :return: tiles as overpass bbox (south, west, north, east)
+    :rtype: list
+    """
+    min_lon, min_lat, max_lon, max_lat = shape.bounds
+    prepared_shape = prep(shape)
+    tiles = []
+    row = math.floor(min_lat / tile_size)
+    while row * tile_size <= max_lat:
+        column = math.floor(min_lon / tile_size)
+        while column * tile_size <= max_lon:
+            tile = (
+                round(row * tile_size, 7),
+                round(column * tile_size, 7),
+                round((row + 1) * tile_size, 7),
+                round((column + 1) * tile_size, 7))
+            if prepared_shape.intersects(shapely_geometry.box(
+                    tile[1], tile[0], tile[3], tile[2])):
+                tiles.append(tile)
+            column += 1
+        row += 1
+    return tiles
+
+
+def merge_tile_elements(documents, shape):
+    """Merge elements of tiles, clipped to shape and without duplicates.
+
+    Nodes inside shape are kept, ways that have a kept node and
+    relations that have a kept member are kept with their members and
+    nodes, as overpass returns them for a poly query.
+
+    :param documents: elements of every tile
+    :type documents: list
+
+    :param shape: area of the query
+    :type shape: shapely.geometry.base.BaseGeometry
+
+    :return: elements in order of first appearance
+    :rtype: list
+    """
+    elements = {}
+    for document in documents:
+        for element in document:
+            key = (element.get('type'), element.get('id'))
+            if key not in elements:
+                elements[key] = element
+
+    prepared_shape = prep(shape)
+    kept = set()
+    for key, element in elements.items():
+        if key[0] == 'node' and 'lat' in element and \
+                prepared_shape.intersects(shapely_geometry.Point(
+                    element['lon'], element['lat'])):
+            kept.add(key)
+    for key, element in elements.items():
+        if key[0] == 'way' and any(
+                ('node', node) in kept for node in element.get('nodes', ())):
+            kept.add(key)
+    relations = [
+        element for key, element in elements.items()
+        if key[0] == 'relation' and any(
+            (member.get('type'), member.get('ref')) in kept
+            for member in element.get('members', ()))]
+    for element in relations:
+        kept.add(('relation', element['id']))
+        kept.update(
+            (member.get('type'), member.get('ref'))
+            for member in element.get('members', ()))
+    for key in list(kept):
+        if key[0] == 'way' and key in elements:
+            kept.update(
+                ('node', node) for node in elements[key].get('nodes', ()))
+
+    return [
+        element for key, element in elements.items() if key in kept]
@@ -0,0 +1,158 @@
+# coding=utf-8
+"""
+In-process cache of parsed Overpass JSON documents.
+
+:license: GPLv3, see LICENSE for more details.
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from reporter import config
+from reporter.overpass_cache import open_cached_file
+from reporter.single_flight import SingleFlight
+
+# Parsed documents take about this many times the bytes of their json
+# in memory, measured on Overpass documents of nodes and ways
+FROZEN_SIZE_FACTOR = 4
+
+
+class FrozenDict(dict):
+    """Dictionary that can not be changed, copy it to change it.
+
+    It is still a dict, so it is serialized to json like one.
+    """
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError('Parsed document is read-only, copy it first')
+
+    __setitem__ = _read_only
+    __delitem__ = _read_only
+    clear = _read_only
+    pop = _read_only
+    popitem = _read_only
+    setdefault = _read_only
+    update = _read_only
+
+    def copy(self):
+        """Return changeable shallow copy.
+
+        :rtype: dict
+        """
+        return dict(self)
+
+    def __copy__(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+
+def freeze(value):
+    """Return read-only view of parsed json, dicts become FrozenDict
+    and lists become tuples.
+
+    :param value: parsed json
+    :type value: dict, list, str, int, float, bool, None
+    """
+    if isinstance(value, dict):
+        return FrozenDict(
+            (key, freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value):
+    """Return changeable deep copy of frozen json.
+
+    :param value: frozen json
+    :type value: FrozenDict, tuple, str, int, float, bool, None
+    """
+    if isinstance(value, dict):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [thaw(item) for item in value]
+    return value
+
+
+class ParsedDocumentCache(object):
+    """
+    LRU of parsed json documents keyed by path, mtime and size of file.
+
+    Documents are frozen, so every request and insight function shares
+    one parsed copy. The memory budget is measured in bytes of memory
+    of the documents, estimated as their bytes of json times
+    FROZEN_SIZE_FACTOR, least recently used documents are dropped when
+    it is exceeded. Concurrent loads of a document parse it once.
+    """
+
+    def __init__(self, max_size):
+        """
+        :param max_size: budget of documents in bytes of memory
+        :type max_size: int
+        """
+        self.max_size = max_size
+        self.total_size = 0
+        self._documents = OrderedDict()
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _signature(file_path):
+        file_stat = os.stat(file_path)
+        return file_stat.st_mtime_ns, file_stat.st_size
+
+    def load(self, file_path):
+        """Return parsed document of json file.
+
+        :param file_path: path of cached json file
+        :type file_path: str
+
+        :raises: OSError, EOFError or ValueError when file can not be
+            read or parsed
+
+        :return: read-only document
+        :rtype: FrozenDict
+        """
+        signature = self._signature(file_path)
+        with self._lock:
+            cached = self._documents.get(file_path)
+            if cached and cached[0] == signature:
+                self._documents.move_to_end(file_path)
+                return cached[1]
+        return self._flight.do(
+            (file_path, signature), self._parse, file_path, signature)
+
+    def _parse(self, file_path, signature):
+        """Parse document and keep it if file did not change meanwhile."""
+        with open_cached_file(file_path) as file_handle:
+            content = file_handle.read()
+        document = freeze(json.loads(content.decode('utf-8')))
+        size = len(content) * FROZEN_SIZE_FACTOR
+        del content
+
+        if self._signature(file_path) != signature or size > self.max_size:
+            return document
+        with self._lock:
+            old = self._documents.pop(file_path, None)
+            if old:
+                self.total_size -= old[2]
+            self._documents[file_path] = (signature, document, size)
+            self.total_size += size
+            while self.total_size > self.max_size:
+                _, (_, _, old_size) = self._documents.popitem(last=False)
+                self.total_size -= old_size
+        return document
+
+    def clear(self):
+        """Drop all documents."""
+        with self._lock:
+            self._documents.clear()
+            self.total_size = 0
+
+
+parsed_document_cache = ParsedDocumentCache(
+    config.OVERPASS_PARSED_CACHE_SIZE)
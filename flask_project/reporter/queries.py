@@ -34,484 +34,62 @@ TAG_MAPPING_REVERSE = {
     'flood-prone': 'flood_prone'
 }
 
-POTENTIAL_IDP_OVERPASS_QUERY = (
-    '('
-    # Amenity school
-    'node["amenity"="school"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    'way["amenity"="school"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    'relation["amenity"="school"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-
-    # Amenity hospital
-    'node["amenity"="hospital"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    'way["amenity"="hospital"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    'relation["amenity"="hospital"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-
-    # Amenity university
-    'node["amenity"="university"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    'way["amenity"="university"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    'relation["amenity"="university"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-
-    # Amenity college
-    'node["amenity"="college"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    'way["amenity"="college"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    'relation["amenity"="college"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-
-    # Amenity place of worship
-    'node["amenity"="place_of_worship"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    'way["amenity"="place_of_worship"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    'relation["amenity"="place_of_worship"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-
-    # Building public
-    'node["building"="public"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    'way["building"="public"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    'relation["building"="public"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-
-    # Leisure sport centre
-    'node["leisure"="sport_centre"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    'way["leisure"="sport_centre"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    'relation["leisure"="sport_centre"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-
-    ');'
-    '(._;>;);'
-    'out {print_mode};'
-)
-
-POTENTIAL_IDP_OVERPASS_QUERY_POLYGON = (
-    '('
-    # Amenity school
-    'node["amenity"="school"]'
-    '(poly:"{polygon}");'
-    'way["amenity"="school"]'
-    '(poly:"{polygon}");'
-    'relation["amenity"="school"]'
-    '(poly:"{polygon}");'
-
-    # Amenity hospital
-    'node["amenity"="hospital"]'
-    '(poly:"{polygon}");'
-    'way["amenity"="hospital"]'
-    '(poly:"{polygon}");'
-    'relation["amenity"="hospital"]'
-    '(poly:"{polygon}");'
-
-    # Amenity university
-    'node["amenity"="university"]'
-    '(poly:"{polygon}");'
-    'way["amenity"="university"]'
-    '(poly:"{polygon}");'
-    'relation["amenity"="university"]'
-    '(poly:"{polygon}");'
-
-    # Amenity college
-    'node["amenity"="college"]'
-    '(poly:"{polygon}");'
-    'way["amenity"="college"]'
-    '(poly:"{polygon}");'
-    'relation["amenity"="college"]'
-    '(poly:"{polygon}");'
-
-    # Amenity place of worship
-    'node["amenity"="place_of_worship"]'
-    '(poly:"{polygon}");'
-    'way["amenity"="place_of_worship"]'
-    '(poly:"{polygon}");'
-    'relation["amenity"="place_of_worship"]'
-    '(poly:"{polygon}");'
-
-    # Building public
-    'node["building"="public"]'
-    '(poly:"{polygon}");'
-    'way["building"="public"]'
-    '(poly:"{polygon}");'
-    'relation["building"="public"]'
-    '(poly:"{polygon}");'
-
-    # Leisure sport centre
-    'node["leisure"="sport_centre"]'
-    '(poly:"{polygon}");'
-    'way["leisure"="sport_centre"]'
-    '(poly:"{polygon}");'
-    'relation["leisure"="sport_centre"]'
-    '(poly:"{polygon}");'
-
-    ');'
-    '(._;>;);'
-    'out {print_mode};'
-)
-
-EVACUATION_CENTERS_OVERPASS_QUERY = (
-    '('
-    'node["evacuation_center"="yes"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    'way["evacuation_center"="yes"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    'relation["evacuation_center"="yes"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    ');'
-    '(._;>;);'
-    'out {print_mode};')
-
-EVACUATION_CENTERS_OVERPASS_QUERY_POLYGON = (
-    '('
-    'node["evacuation_center"="yes"]'
-    '(poly:"{polygon}");'
-    'way["evacuation_center"="yes"]'
-    '(poly:"{polygon}");'
-    'relation["evacuation_center"="yes"]'
-    '(poly:"{polygon}");'
-    ');'
-    '(._;>;);'
-    'out {print_mode};')
-
-
-BUILDINGS_OVERPASS_QUERY = (
-    '('
-    'node["building"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    'way["building"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    'relation["building"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    ');'
-    '(._;>;);'
-    'out {print_mode};')
-
-BUILDINGS_OVERPASS_QUERY_POLYGON = (
-    '('
-    'node["building"]'
-    '(poly:"{polygon}");'
-    'way["building"]'
-    '(poly:"{polygon}");'
-    'relation["building"]'
-    '(poly:"{polygon}");'
-    ');'
-    '(._;>;);'
-    'out {print_mode};')
-
-ROADS_OVERPASS_QUERY = (
-    '('
-    'node["highway"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    'way["highway"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    'relation["highway"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    ');'
-    '(._;>;);'
-    'out {print_mode};')
-
-ROADS_OVERPASS_QUERY_POLYGON = (
-    '('
-    'node["highway"]'
-    '(poly:"{polygon}");'
-    'way["highway"]'
-    '(poly:"{polygon}");'
-    'relation["highway"]'
-    '(poly:"{polygon}");'
-    ');'
-    '(._;>;);'
-    'out {print_mode};')
-
-FLOOD_PRONE_OVERPASS_QUERY = (
-    '('
-    'way["flood_prone"="yes"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    'relation["flood_prone"="yes"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    ');'
-    '(._;>;);'
-    'out {print_mode};')
-
-FLOOD_PRONE_OVERPASS_QUERY_POLYGON = (
-    '('
-    'way["flood_prone"="yes"]'
-    '(poly:"{polygon}");'
-    'relation["flood_prone"="yes"]'
-    '(poly:"{polygon}");'
-    ');'
-    '(._;>;);'
-    'out {print_mode};')
-
-BOUNDARY_1_OVERPASS_QUERY = (
-    '('
-    'relation["boundary"="administrative"]["admin_level"="1"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    'way["boundary"="administrative"]["admin_level"="1"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    ');'
-    '(._;>;);'
-    'out {print_mode};')
-
-BOUNDARY_2_OVERPASS_QUERY = (
-    '('
-    'relation["boundary"="administrative"]["admin_level"="2"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    'way["boundary"="administrative"]["admin_level"="2"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    ');'
-    '(._;>;);'
-    'out {print_mode};')
-
-BOUNDARY_3_OVERPASS_QUERY = (
-    '('
-    'relation["boundary"="administrative"]["admin_level"="3"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    'way["boundary"="administrative"]["admin_level"="3"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    ');'
-    '(._;>;);'
-    'out {print_mode};')
-
-BOUNDARY_4_OVERPASS_QUERY = (
-    '('
-    'relation["boundary"="administrative"]["admin_level"="4"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    'way["boundary"="administrative"]["admin_level"="4"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    ');'
-    '(._;>;);'
-    'out {print_mode};')
-
-BOUNDARY_5_OVERPASS_QUERY = (
-    '('
-    'relation["boundary"="administrative"]["admin_level"="5"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    'way["boundary"="administrative"]["admin_level"="5"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    ');'
-    '(._;>;);'
-    'out {print_mode};')
-
-BOUNDARY_6_OVERPASS_QUERY = (
-    '('
-    'relation["boundary"="administrative"]["admin_level"="6"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    'way["boundary"="administrative"]["admin_level"="6"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    ');'
-    '(._;>;);'
-    'out {print_mode};')
-
-BOUNDARY_7_OVERPASS_QUERY = (
-    '('
-    'relation["boundary"="administrative"]["admin_level"="7"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    'way["boundary"="administrative"]["admin_level"="7"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    ');'
-    '(._;>;);'
-    'out {print_mode};')
-
-BOUNDARY_8_OVERPASS_QUERY = (
-    '('
-    'relation["boundary"="administrative"]["admin_level"="8"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    'way["boundary"="administrative"]["admin_level"="8"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    ');'
-    '(._;>;);'
-    'out {print_mode};')
-
-BOUNDARY_9_OVERPASS_QUERY = (
-    '('
-    'relation["boundary"="administrative"]["admin_level"="9"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    'way["boundary"="administrative"]["admin_level"="9"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    ');'
-    '(._;>;);'
-    'out {print_mode};')
-
-BOUNDARY_10_OVERPASS_QUERY = (
-    '('
-    'relation["boundary"="administrative"]["admin_level"="10"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    'way["boundary"="administrative"]["admin_level"="10"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    ');'
-    '(._;>;);'
-    'out {print_mode};')
-
-BOUNDARY_11_OVERPASS_QUERY = (
-    '('
-    'relation["boundary"="administrative"]["admin_level"="11"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    'way["boundary"="administrative"]["admin_level"="11"]'
-    '({SW_lat},{SW_lng},{NE_lat},{NE_lng});'
-    ');'
-    '(._;>;);'
-    'out {print_mode};')
-
-BOUNDARY_1_OVERPASS_QUERY_POLYGON = (
-    '('
-    'relation["boundary"="administrative"]["admin_level"="1"]'
-    '(poly:"{polygon}");'
-    'way["boundary"="administrative"]["admin_level"="1"]'
-    '(poly:"{polygon}");'
-    ');'
-    '(._;>;);'
-    'out {print_mode};')
-
-BOUNDARY_2_OVERPASS_QUERY_POLYGON = (
-    '('
-    'relation["boundary"="administrative"]["admin_level"="2"]'
-    '(poly:"{polygon}");'
-    'way["boundary"="administrative"]["admin_level"="2"]'
-    '(poly:"{polygon}");'
-    ');'
-    '(._;>;);'
-    'out {print_mode};')
-
-BOUNDARY_3_OVERPASS_QUERY_POLYGON = (
-    '('
-    'relation["boundary"="administrative"]["admin_level"="3"]'
-    '(poly:"{polygon}");'
-    'way["boundary"="administrative"]["admin_level"="3"]'
-    '(poly:"{polygon}");'
-    ');'
-    '(._;>;);'
-    'out {print_mode};')
-
-BOUNDARY_4_OVERPASS_QUERY_POLYGON = (
-    '('
-    'relation["boundary"="administrative"]["admin_level"="4"]'
-    '(poly:"{polygon}");'
-    'way["boundary"="administrative"]["admin_level"="4"]'
-    '(poly:"{polygon}");'
-    ');'
-    '(._;>;);'
-    'out {print_mode};')
-
-BOUNDARY_5_OVERPASS_QUERY_POLYGON = (
-    '('
-    'relation["boundary"="administrative"]["admin_level"="5"]'
-    '(poly:"{polygon}");'
-    'way["boundary"="administrative"]["admin_level"="5"]'
-    '(poly:"{polygon}");'
-    ');'
-    '(._;>;);'
-    'out {print_mode};')
-
-BOUNDARY_6_OVERPASS_QUERY_POLYGON = (
-    '('
-    'relation["boundary"="administrative"]["admin_level"="6"]'
-    '(poly:"{polygon}");'
-    'way["boundary"="administrative"]["admin_level"="6"]'
-    '(poly:"{polygon}");'
-    ');'
-    '(._;>;);'
-    'out {print_mode};')
-
-BOUNDARY_7_OVERPASS_QUERY_POLYGON = (
-    '('
-    'relation["boundary"="administrative"]["admin_level"="7"]'
-    '(poly:"{polygon}");'
-    'way["boundary"="administrative"]["admin_level"="7"]'
-    '(poly:"{polygon}");'
-    ');'
-    '(._;>;);'
-    'out {print_mode};')
-
-BOUNDARY_8_OVERPASS_QUERY_POLYGON = (
-    '('
-    'relation["boundary"="administrative"]["admin_level"="8"]'
-    '(poly:"{polygon}");'
-    'way["boundary"="administrative"]["admin_level"="8"]'
-    '(poly:"{polygon}");'
-    ');'
-    '(._;>;);'
-    'out {print_mode};')
-
-BOUNDARY_9_OVERPASS_QUERY_POLYGON = (
-    '('
-    'relation["boundary"="administrative"]["admin_level"="9"]'
-    '(poly:"{polygon}");'
-    'way["boundary"="administrative"]["admin_level"="9"]'
-    '(poly:"{polygon}");'
-    ');'
-    '(._;>;);'
-    'out {print_mode};')
-
-BOUNDARY_10_OVERPASS_QUERY_POLYGON = (
-    '('
-    'relation["boundary"="administrative"]["admin_level"="10"]'
-    '(poly:"{polygon}");'
-    'way["boundary"="administrative"]["admin_level"="10"]'
-    '(poly:"{polygon}");'
-    ');'
-    '(._;>;);'
-    'out {print_mode};')
-
-BOUNDARY_11_OVERPASS_QUERY_POLYGON = (
-    '('
-    'relation["boundary"="administrative"]["admin_level"="11"]'
-    '(poly:"{polygon}");'
-    'way["boundary"="administrative"]["admin_level"="11"]'
-    '(poly:"{polygon}");'
-    ');'
-    '(._;>;);'
-    'out {print_mode};')
+ALL_ELEMENTS = ('node', 'way', 'relation')
+
+POTENTIAL_IDP_TAGS = [
+    ('amenity', 'school'),
+    ('amenity', 'hospital'),
+    ('amenity', 'university'),
+    ('amenity', 'college'),
+    ('amenity', 'place_of_worship'),
+    ('building', 'public'),
+    ('leisure', 'sport_centre'),
+]
 
-OVERPASS_QUERY_MAP_POLYGON = {
-    'potential-idp': POTENTIAL_IDP_OVERPASS_QUERY_POLYGON,
-    'evacuation-centers': EVACUATION_CENTERS_OVERPASS_QUERY_POLYGON,
-    'buildings': BUILDINGS_OVERPASS_QUERY_POLYGON,
-    'building-points': BUILDINGS_OVERPASS_QUERY_POLYGON,
-    'flood-prone': FLOOD_PRONE_OVERPASS_QUERY_POLYGON,
-    'roads': ROADS_OVERPASS_QUERY_POLYGON,
-    'boundary-1': BOUNDARY_1_OVERPASS_QUERY_POLYGON,
-    'boundary-2': BOUNDARY_2_OVERPASS_QUERY_POLYGON,
-    'boundary-3': BOUNDARY_3_OVERPASS_QUERY_POLYGON,
-    'boundary-4': BOUNDARY_4_OVERPASS_QUERY_POLYGON,
-    'boundary-5': BOUNDARY_5_OVERPASS_QUERY_POLYGON,
-    'boundary-6': BOUNDARY_6_OVERPASS_QUERY_POLYGON,
-    'boundary-7': BOUNDARY_7_OVERPASS_QUERY_POLYGON,
-    'boundary-8': BOUNDARY_8_OVERPASS_QUERY_POLYGON,
-    'boundary-9': BOUNDARY_9_OVERPASS_QUERY_POLYGON,
-    'boundary-10': BOUNDARY_10_OVERPASS_QUERY_POLYGON,
-    'boundary-11': BOUNDARY_11_OVERPASS_QUERY_POLYGON,
-}
 
-OVERPASS_QUERY_MAP = {
-    'potential-idp': POTENTIAL_IDP_OVERPASS_QUERY,
-    'evacuation-centers': EVACUATION_CENTERS_OVERPASS_QUERY,
-    'buildings': BUILDINGS_OVERPASS_QUERY,
-    'building-points': BUILDINGS_OVERPASS_QUERY,
-    'flood-prone': FLOOD_PRONE_OVERPASS_QUERY,
-    'roads': ROADS_OVERPASS_QUERY,
-    'boundary-1': BOUNDARY_1_OVERPASS_QUERY,
-    'boundary-2': BOUNDARY_2_OVERPASS_QUERY,
-    'boundary-3': BOUNDARY_3_OVERPASS_QUERY,
-    'boundary-4': BOUNDARY_4_OVERPASS_QUERY,
-    'boundary-5': BOUNDARY_5_OVERPASS_QUERY,
-    'boundary-6': BOUNDARY_6_OVERPASS_QUERY,
-    'boundary-7': BOUNDARY_7_OVERPASS_QUERY,
-    'boundary-8': BOUNDARY_8_OVERPASS_QUERY,
-    'boundary-9': BOUNDARY_9_OVERPASS_QUERY,
-    'boundary-10': BOUNDARY_10_OVERPASS_QUERY,
-    'boundary-11': BOUNDARY_11_OVERPASS_QUERY,
+def boundary_selectors(admin_level):
+    """Selectors of administrative boundaries of admin level."""
+    return [
+        (element_type, (
+            ('boundary', '=', 'administrative'),
+            ('admin_level', '=', str(admin_level))))
+        for element_type in ('relation', 'way')
+    ]
+
+
+# Element types and tag filters of features, the tag filters are
+# (key, operator, value), see reporter.overpass_query.tag_filter
+OVERPASS_FEATURE_SELECTORS = {
+    'potential-idp': [
+        (element_type, ((key, '=', value),))
+        for key, value in POTENTIAL_IDP_TAGS
+        for element_type in ALL_ELEMENTS
+    ],
+    'evacuation-centers': [
+        (element_type, (('evacuation_center', '=', 'yes'),))
+        for element_type in ALL_ELEMENTS
+    ],
+    'buildings': [
+        (element_type, (('building', None, None),))
+        for element_type in ALL_ELEMENTS
+    ],
+    'building-points': [
+        (element_type, (('building', None, None),))
+        for element_type in ALL_ELEMENTS
+    ],
+    'flood-prone': [
+        (element_type, (('flood_prone', '=', 'yes'),))
+        for element_type in ('way', 'relation')
+    ],
+    'roads': [
+        (element_type, (('highway', None, None),))
+        for element_type in ALL_ELEMENTS
+    ],
 }
+OVERPASS_FEATURE_SELECTORS.update({
+    'boundary-%s' % admin_level: boundary_selectors(admin_level)
+    for admin_level in range(1, 12)
+})
 
 # Used to extract the features as a shapefile from pg
 # We don't store in an sql file as the sql needs to be escaped
@@ -0,0 +1,380 @@
+# coding=utf-8
+"""
+Bounded pool that refreshes cached Overpass documents in background.
+
+:license: GPLv3, see LICENSE for more details.
+"""
+
+import heapq
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from reporter import config
+from reporter import LOGGER
+from reporter.exceptions import OverpassConcurrentRequestException
+
+
+def endpoint_of(url):
+    """Return endpoint of url that concurrency is limited on.
+
+    :param url: url of Overpass request
+    :type url: str
+
+    :return: scheme and host of url
+    :rtype: str
+    """
+    parts = urlsplit(url)
+    return '%s://%s' % (parts.scheme, parts.netloc)
+
+
+class EndpointLimiter(object):
+    """
+    Limit of concurrent requests per Overpass endpoint.
+
+    When an endpoint answers that it is busy (HTTP 429 or 419), it gets
+    no request until a backoff passes. The backoff doubles on every
+    busy answer in a row, with jitter, and is reset by a success.
+    """
+
+    def __init__(self, concurrency=2, backoff=30, max_backoff=900):
+        """
+        :param concurrency: requests per endpoint at the same time
+        :type concurrency: int
+
+        :param backoff: seconds of first backoff
+        :type backoff: float
+
+        :param max_backoff: maximum seconds of backoff
+        :type max_backoff: float
+        """
+        self.concurrency = concurrency
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._running = {}
+        self._failures = {}
+        self._backoff_until = {}
+        self._condition = threading.Condition()
+
+    def _available(self, endpoint, now):
+        return self._running.get(endpoint, 0) < self.concurrency and \
+            self._backoff_until.get(endpoint, 0) <= now
+
+    def acquire(self, endpoint, timeout=None):
+        """Take a request slot of endpoint.
+
+        :param endpoint: endpoint of request
+        :type endpoint: str
+
+        :param timeout: seconds to wait for a slot, 0 does not wait,
+            None waits until a slot is free
+        :type timeout: float
+
+        :return: whether slot is taken
+        :rtype: bool
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._condition:
+            while True:
+                now = time.time()
+                if self._available(endpoint, now):
+                    self._running[endpoint] = \
+                        self._running.get(endpoint, 0) + 1
+                    return True
+                if deadline is not None and now >= deadline:
+                    return False
+                wait = self._backoff_until.get(endpoint, 0) - now
+                if wait <= 0:
+                    wait = None
+                if deadline is not None:
+                    wait = min(wait or deadline - now, deadline - now)
+                self._condition.wait(wait)
+
+    def release(self, endpoint, throttled=False):
+        """Give back request slot of endpoint.
+
+        :param endpoint: endpoint of request
+        :type endpoint: str
+
+        :param throttled: endpoint answered that it is busy
+        :type throttled: bool
+        """
+        with self._condition:
+            self._running[endpoint] = self._running.get(endpoint, 1) - 1
+            if throttled:
+                failures = self._failures.get(endpoint, 0) + 1
+                self._failures[endpoint] = failures
+                backoff = min(
+                    self.backoff * 2 ** (failures - 1), self.max_backoff)
+                backoff *= random.uniform(0.5, 1.5)
+                self._backoff_until[endpoint] = time.time() + backoff
+                LOGGER.info(
+                    '%s is busy, backing off for %.0f seconds' % (
+                        endpoint, backoff))
+            else:
+                self._failures.pop(endpoint, None)
+            self._condition.notify_all()
+
+    def backoff_until(self, endpoint):
+        """Return time until endpoint gets no request, in unix epoch.
+
+        :rtype: float
+        """
+        with self._condition:
+            return self._backoff_until.get(endpoint, 0)
+
+    @contextmanager
+    def slot(self, endpoint, timeout=None):
+        """Context that holds a request slot of endpoint.
+
+        :raises: OverpassConcurrentRequestException when no slot is free
+            in time
+        """
+        if not self.acquire(endpoint, timeout):
+            raise OverpassConcurrentRequestException
+        throttled = False
+        try:
+            yield
+        except OverpassConcurrentRequestException:
+            throttled = True
+            raise
+        finally:
+            self.release(endpoint, throttled)
+
+
+class RefreshTask(object):
+    """Queued refresh of a key."""
+
+    def __init__(self, key, endpoint, function, args, kwargs, priority):
+        self.key = key
+        self.endpoint = endpoint
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.attempts = 0
+        self.future = Future()
+
+
+class RefreshPool(object):
+    """
+    Fixed number of workers that run refreshes from a priority queue.
+
+    Queue holds one task per key, submitting a queued or running key
+    returns its future and raises its priority. Tasks with higher
+    priority run first, priority of a task is its base priority, e.g.
+    activity of campaign, plus a score of recent views of the key that
+    decays with a half-life. Workers only take tasks whose endpoint has
+    a free slot in the endpoint limiter, tasks that got a busy answer
+    are queued again until they run out of attempts.
+    """
+    poll_interval = 1
+    # views of keys whose score decayed below it are forgotten
+    min_view_score = 0.01
+
+    def __init__(
+            self,
+            limiter,
+            workers=4,
+            max_attempts=3,
+            view_half_life=3600):
+        """
+        :param limiter: limiter of requests per endpoint
+        :type limiter: EndpointLimiter
+
+        :param workers: number of worker threads
+        :type workers: int
+
+        :param max_attempts: attempts of a task that gets busy answers
+        :type max_attempts: int
+
+        :param view_half_life: seconds for score of views to halve
+        :type view_half_life: float
+        """
+        self.limiter = limiter
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.view_half_life = view_half_life
+        self._heap = []
+        self._tasks = {}
+        self._running = {}
+        self._views = {}
+        self._views_pruned_at = time.time()
+        self._counter = itertools.count()
+        self._threads = []
+        self._condition = threading.Condition()
+
+    def _decayed(self, score, since, now):
+        return score * 0.5 ** ((now - since) / self.view_half_life)
+
+    def record_view(self, key):
+        """Record that document of key is viewed.
+
+        :param key: key of refresh, e.g. path of cached file
+        :type key: str
+        """
+        now = time.time()
+        with self._condition:
+            score, since = self._views.get(key, (0, now))
+            self._views[key] = (self._decayed(score, since, now) + 1, now)
+            if now - self._views_pruned_at >= self.view_half_life:
+                self._prune_views(now)
+
+    def _prune_views(self, now):
+        """Forget views of keys whose score is negligible, so views of
+        keys that are not viewed anymore do not pile up."""
+        self._views = {
+            key: (score, since)
+            for key, (score, since) in self._views.items()
+            if self._decayed(score, since, now) >= self.min_view_score
+        }
+        self._views_pruned_at = now
+
+    def view_score(self, key):
+        """Return decayed number of recent views of key.
+
+        :rtype: float
+        """
+        with self._condition:
+            if key not in self._views:
+                return 0
+            score, since = self._views[key]
+            return self._decayed(score, since, time.time())
+
+    @property
+    def queue_depth(self):
+        """Number of queued tasks."""
+        with self._condition:
+            return len(self._tasks)
+
+    def submit(self, key, endpoint, function, *args, priority=0, **kwargs):
+        """Queue refresh of key unless it is queued or running.
+
+        :param key: key of refresh, e.g. path of cached file
+        :type key: str
+
+        :param endpoint: endpoint that the refresh requests
+        :type endpoint: str
+
+        :param function: function that refreshes, called with args
+            and kwargs
+        :type function: function
+
+        :param priority: base priority, higher runs first
+        :type priority: float
+
+        :return: future of refresh
+        :rtype: Future
+        """
+        priority += self.view_score(key)
+        with self._condition:
+            running = self._running.get(key)
+            if running is not None:
+                return running.future
+            task = self._tasks.get(key)
+            if task is None:
+                task = RefreshTask(
+                    key, endpoint, function, args, kwargs, priority)
+                self._tasks[key] = task
+            elif priority > task.priority:
+                task.priority = priority
+            else:
+                return task.future
+            heapq.heappush(
+                self._heap, (-task.priority, next(self._counter), task))
+            self._start_workers()
+            self._condition.notify()
+            return task.future
+
+    def _start_workers(self):
+        """Start worker threads that are not running yet."""
+        self._threads = [
+            thread for thread in self._threads if thread.is_alive()]
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def _take(self):
+        """Take task with highest priority that its endpoint is free,
+        called with condition held.
+
+        :rtype: RefreshTask
+        """
+        skipped = []
+        task = None
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            candidate = entry[2]
+            if self._tasks.get(candidate.key) is not candidate or \
+                    -entry[0] != candidate.priority:
+                # outdated entry of task
+                continue
+            if self.limiter.acquire(candidate.endpoint, timeout=0):
+                task = candidate
+                break
+            skipped.append(entry)
+        for entry in skipped:
+            heapq.heappush(self._heap, entry)
+        if task is not None:
+            del self._tasks[task.key]
+            self._running[task.key] = task
+        return task
+
+    def _work(self):
+        while True:
+            with self._condition:
+                task = self._take()
+                while task is None:
+                    self._condition.wait(self.poll_interval)
+                    task = self._take()
+            self._run(task)
+
+    def _run(self, task):
+        """Run task that holds a slot of its endpoint."""
+        task.attempts += 1
+        throttled = False
+        try:
+            result = task.function(*task.args, **task.kwargs)
+        except OverpassConcurrentRequestException as e:
+            throttled = True
+            error = e
+        except BaseException as e:
+            error = e
+        else:
+            error = None
+        self.limiter.release(task.endpoint, throttled)
+
+        with self._condition:
+            del self._running[task.key]
+            if throttled and task.attempts < self.max_attempts and \
+                    task.key not in self._tasks:
+                self._tasks[task.key] = task
+                heapq.heappush(
+                    self._heap,
+                    (-task.priority, next(self._counter), task))
+                self._condition.notify_all()
+                return
+            self._condition.notify_all()
+
+        if error is None:
+            task.future.set_result(result)
+        else:
+            LOGGER.error('Refresh of %s failed: %s' % (task.key, error))
+            task.future.set_exception(error)
+
+
+endpoint_limiter = EndpointLimiter(
+    concurrency=config.OVERPASS_ENDPOINT_CONCURRENCY,
+    backoff=config.OVERPASS_BACKOFF,
+    max_backoff=config.OVERPASS_MAX_BACKOFF)
+
+refresh_pool = RefreshPool(
+    endpoint_limiter,
+    workers=config.OVERPASS_REFRESH_WORKERS,
+    view_half_life=config.OVERPASS_VIEW_HALF_LIFE)
@@ -0,0 +1,86 @@
+# coding=utf-8
+"""
+Single-flight coalescing of concurrent identical calls.
+
+:license: GPLv3, see LICENSE for more details.
+"""
+
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight(object):
+    """
+    Runs one call per key at a time.
+
+    The first caller of a key runs the function, callers that come
+    while it runs wait on the same future instead of running it again.
+    The key is released when the call finishes, so the next call after
+    that runs the function again.
+    """
+
+    def __init__(self):
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def _join(self, key):
+        """Return future of running call of key, or a new one.
+
+        :return: future and whether caller should run the function
+        :rtype: (Future, bool)
+        """
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            future.set_running_or_notify_cancel()
+            self._futures[key] = future
+            return future, True
+
+    def _run(self, key, future, function, args, kwargs):
+        """Run function and resolve future of key with its result."""
+        try:
+            result = function(*args, **kwargs)
+        except BaseException as e:
+            with self._lock:
+                self._futures.pop(key, None)
+            future.set_exception(e)
+        else:
+            with self._lock:
+                self._futures.pop(key, None)
+            future.set_result(result)
+
+    def in_flight(self, key):
+        """Return whether a call of key is running.
+
+        :param key: key of call
+        :type key: str
+
+        :rtype: bool
+        """
+        with self._lock:
+            return key in self._futures
+
+    def do(self, key, function, *args, timeout=None, **kwargs):
+        """Run function, or wait for the running call of the same key.
+
+        :param key: key of call, e.g. cache key of the fetched document
+        :type key: str
+
+        :param function: function that is called with args and kwargs
+        :type function: function
+
+        :param timeout: seconds to wait for a call that another caller
+            runs, None waits until it finishes
+        :type timeout: float
+
+        :raises: concurrent.futures.TimeoutError when waiting times out,
+            or the exception of the call
+
+        :return: result of the call
+        """
+        future, leader = self._join(key)
+        if leader:
+            self._run(key, future, function, args, kwargs)
+        return future.result(timeout)
@@ -0,0 +1,98 @@
+# coding=utf-8
+"""Test cases for the store of merged contributions.
+:license: GPLv3, see LICENSE for more details.
+"""
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from reporter.contribution_store import ContributionStore
+from reporter.test.helpers import FIXTURE_PATH
+from reporter.utilities import (
+    contribution_records,
+    osm_element_contributions,
+    osm_object_contributions
+)
+
+# 2010-01-01 to 2020-01-01
+DATE_RANGE = (1262304000000, 1577836800000)
+
+DELTA = b"""<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6" generator="Overpass API">
+<meta osm_base="2017-08-01T10:00:00Z"/>
+<action type="modify">
+<old>
+  <way id="%(way)d" version="1" timestamp="2015-04-17T17:32:28Z"
+    user="someone"/>
+</old>
+<new>
+  <way id="%(way)d" version="2" timestamp="2017-07-30T08:00:00Z"
+    user="newcomer">
+    <nd ref="1"/>
+    <tag k="amenity" v="school"/>
+  </way>
+</new>
+</action>
+</osm>
+"""
+
+
+class ContributionStoreTestCase(unittest.TestCase):
+    """Test contribution store."""
+
+    def setUp(self):
+        """Constructor."""
+        self.folder = tempfile.mkdtemp()
+        self.store = ContributionStore(
+            os.path.join(self.folder, 'contributions.sqlite3'))
+
+    def tearDown(self):
+        """Destructor."""
+        shutil.rmtree(self.folder)
+
+    def ways(self, user_list):
+        return {
+            record['name']: record['ways']
+            for record in user_list if record['ways']}
+
+    def test_merge_delta(self):
+        with open(FIXTURE_PATH, 'rb') as osm_file:
+            elements, osm_base = osm_element_contributions(
+                osm_file, 'amenity', *DATE_RANGE)
+        self.assertEqual(osm_base, 1501221782000)
+        self.assertIsNone(self.store.state('key'))
+        self.store.merge('key', elements, osm_base)
+        self.assertEqual(self.store.state('key')[0], osm_base)
+
+        with open(FIXTURE_PATH, 'rb') as osm_file:
+            expected = osm_object_contributions(
+                osm_file, 'amenity', *DATE_RANGE)
+        merged = contribution_records(*self.store.counts('key'))
+        self.assertEqual(self.ways(merged), self.ways(expected))
+
+        way_id, (user, _, found) = next(
+            (key[1], version) for key, version in elements.items()
+            if key[0] == 'way' and version[2])
+        delta, high_water = osm_element_contributions(
+            io.BytesIO(DELTA % {b'way': way_id}), 'amenity', *DATE_RANGE)
+        current_ids = {
+            'node': [],
+            'way': [str(key[1]) for key in elements if key[0] == 'way'],
+            'relation': []
+        }
+        self.store.merge('key', delta, high_water, current_ids)
+        self.assertEqual(self.store.state('key')[0], high_water)
+
+        ways = self.ways(contribution_records(*self.store.counts('key')))
+        self.assertEqual(ways['newcomer'], 1)
+        self.assertEqual(
+            ways.get(user, 0), self.ways(expected)[user] - 1)
+        self.assertEqual(sum(ways.values()), sum(self.ways(expected).values()))
+        _, node_counts, _ = self.store.counts('key')
+        self.assertEqual(node_counts, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
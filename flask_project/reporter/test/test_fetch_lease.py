@@ -0,0 +1,67 @@
+# coding=utf-8
+"""Test cases for cross-process fetch leases.
+:license: GPLv3, see LICENSE for more details.
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from reporter.fetch_lease import FetchLease
+
+OWNER_SCRIPT = """
+import sys, time
+from reporter.fetch_lease import FetchLease
+lease = FetchLease(sys.argv[1])
+lease.acquire()
+print('acquired', flush=True)
+time.sleep(60)
+"""
+
+
+class FetchLeaseTestCase(unittest.TestCase):
+    """Test fetch leases."""
+
+    def setUp(self):
+        """Constructor."""
+        self.folder = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.folder, 'first.osm')
+
+    def tearDown(self):
+        """Destructor."""
+        shutil.rmtree(self.folder)
+
+    def test_lease_is_exclusive(self):
+        with FetchLease(self.file_path) as lease:
+            self.assertTrue(lease.acquired)
+            other_lease = FetchLease(self.file_path, timeout=0.2)
+            self.assertFalse(other_lease.acquire())
+        self.assertFalse(lease.acquired)
+        self.assertFalse(os.path.exists(lease.lock_path))
+
+        with FetchLease(self.file_path) as lease:
+            self.assertTrue(lease.acquired)
+
+    def test_lease_expires_when_owner_dies(self):
+        root = os.path.dirname(os.path.dirname(os.path.dirname(
+            os.path.abspath(__file__))))
+        owner = subprocess.Popen(
+            [sys.executable, '-c', OWNER_SCRIPT, self.file_path],
+            cwd=root, stdout=subprocess.PIPE)
+        try:
+            self.assertEqual(owner.stdout.readline().strip(), b'acquired')
+            self.assertFalse(FetchLease(self.file_path).acquire())
+        finally:
+            owner.kill()
+            owner.wait()
+            owner.stdout.close()
+
+        lease = FetchLease(self.file_path, timeout=5)
+        self.assertTrue(lease.acquire())
+        lease.release()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+# coding=utf-8
+"""Test cases for the shared HTTP client.
+:license: GPLv3, see LICENSE for more details.
+"""
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler
+from urllib.error import HTTPError, URLError
+
+from reporter.http_client import HttpClient
+from reporter.overpass_stand_in import ThreadingHTTPServer
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.client_ports.append(self.client_address[1])
+        status = 200
+        if self.path == '/missing':
+            status = 404
+        elif self.path == '/unavailable':
+            status = 503
+        body = b'{"count": 1}'
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.do_GET()
+
+    def log_message(self, *args):
+        pass
+
+
+class HttpClientTestCase(unittest.TestCase):
+    """Test shared HTTP client."""
+
+    def setUp(self):
+        """Constructor."""
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.client_ports = []
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.url = 'http://127.0.0.1:%s' % self.server.server_port
+        self.client = HttpClient(retries=0)
+
+    def tearDown(self):
+        """Destructor."""
+        self.client.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connection_is_kept_alive(self):
+        self.assertEqual(self.client.get(self.url + '/a').json()['count'], 1)
+        self.assertEqual(self.client.get(self.url + '/b').json()['count'], 1)
+        self.assertEqual(len(set(self.server.client_ports)), 1)
+
+    def test_errors(self):
+        response = self.client.get(self.url + '/missing', stream=True)
+        with self.assertRaises(HTTPError) as context:
+            self.client.raise_for_status(response)
+        self.assertEqual(context.exception.code, 404)
+        self.assertTrue(response.raw.closed)
+
+        self.server.shutdown()
+        self.server.server_close()
+        self.assertRaises(
+            URLError, self.client.get, 'http://127.0.0.1:1/', timeout=1)
+
+    def test_only_idempotent_requests_are_retried(self):
+        client = HttpClient(retries=2, backoff=0, backoff_jitter=0)
+        try:
+            response = client.get(self.url + '/unavailable')
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(len(self.server.client_ports), 3)
+
+            del self.server.client_ports[:]
+            response = client.post(self.url + '/unavailable', data='query')
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(len(self.server.client_ports), 1)
+        finally:
+            client.session.close()
+
+    def test_busy_pool_does_not_block(self):
+        client = HttpClient(pool_maxsize=1, retries=0)
+        try:
+            responses = [
+                client.get(self.url + '/a', stream=True) for _ in range(2)]
+            self.assertEqual(len(set(self.server.client_ports)), 2)
+            for response in responses:
+                response.close()
+        finally:
+            client.session.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
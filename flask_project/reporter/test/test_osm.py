@@ -4,14 +4,21 @@
 :license: GPLv3, see LICENSE for more details.
 """
 import os
+import shutil
+import tempfile
 
 import unittest
 from unittest import mock
 from reporter.utilities import LOGGER
+from reporter.exceptions import (
+    OverpassTimeoutException,
+    OverpassDoesNotReturnData)
 from reporter.osm import (
+    download_osm_document,
     load_osm_document,
     import_and_extract_shapefile,
     check_string)
+from reporter.overpass_cache import open_cached_file
 from reporter.test.helpers import FIXTURE_PATH
 
 from reporter.test.logged_unittest import LoggedTestCase
@@ -53,6 +60,22 @@ def mock_which(name, flags=os.X_OK):
     return result
 
 
+class StreamedResponse(object):
+    """Response that streams content in chunks."""
+
+    def __init__(self, content, chunk_size=7):
+        self.content = content
+        self.chunk_size = chunk_size
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        for index in range(0, len(self.content), self.chunk_size):
+            yield self.content[index:index + self.chunk_size]
+
+    def close(self):
+        self.closed = True
+
+
 class OsmTestCase(LoggedTestCase):
     """Test the OSM retrieval functions."""
 
@@ -161,3 +184,42 @@ class OsmTestCase(LoggedTestCase):
             self.assertTrue(
                 check_string(good),
                 '%s should be acceptible' % good)
+
+
+class DownloadOsmDocumentTestCase(unittest.TestCase):
+    """Test streamed downloads of Overpass responses."""
+
+    def setUp(self):
+        """Constructor."""
+        self.folder = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.folder, 'document.osm')
+        with open(self.file_path, 'wb') as _file:
+            _file.write(b'old')
+
+    def tearDown(self):
+        """Destructor."""
+        shutil.rmtree(self.folder)
+
+    def test_download(self):
+        content = b'{"elements": [' + b'{"id": 1},' * 1000 + b'{}]}'
+        response = StreamedResponse(content)
+        download_osm_document(response, self.file_path, compression='gzip')
+        self.assertTrue(response.closed)
+        with open_cached_file(self.file_path) as _file:
+            self.assertEqual(_file.read(), content)
+        self.assertEqual(os.listdir(self.folder), ['document.osm'])
+
+    def test_error_keeps_old_file(self):
+        content = b'<osm><meta/>' + b'<node/>' * 1000 + \
+            b'<remark> runtime error: timeout</remark></osm>'
+        self.assertRaises(
+            OverpassTimeoutException,
+            download_osm_document,
+            StreamedResponse(content), self.file_path)
+        self.assertRaises(
+            OverpassDoesNotReturnData,
+            download_osm_document,
+            StreamedResponse(b'<html>busy</html>'), self.file_path)
+        with open(self.file_path, 'rb') as _file:
+            self.assertEqual(_file.read(), b'old')
+        self.assertEqual(os.listdir(self.folder), ['document.osm'])
@@ -0,0 +1,61 @@
+# coding=utf-8
+"""Test cases for reading several OSM documents as one.
+:license: GPLv3, see LICENSE for more details.
+"""
+import io
+import unittest
+
+from reporter.osm_document_chain import OsmDocumentChain
+from reporter.test.helpers import FIXTURE_PATH
+from reporter.utilities import osm_object_contributions
+
+
+class OsmDocumentChainTestCase(unittest.TestCase):
+    """Test OSM document chain."""
+
+    def setUp(self):
+        """Constructor."""
+        with open(FIXTURE_PATH, 'rb') as fixture:
+            self.document = fixture.read()
+
+    def split(self, parts):
+        """Split fixture into documents at action elements."""
+        start = self.document.index(b'<action')
+        end = self.document.rindex(b'</osm>')
+        header = self.document[:start]
+        actions = self.document[start:end].split(b'\n<action')
+        size = len(actions) // parts + 1
+        documents = []
+        for index in range(0, len(actions), size):
+            body = b'\n<action'.join(actions[index:index + size])
+            if index:
+                body = b'<action' + body
+            documents.append(io.BytesIO(header + body + b'\n</osm>\n'))
+        return documents
+
+    def test_chain_is_read_as_one_document(self):
+        expected = osm_object_contributions(
+            io.BytesIO(self.document), 'amenity')
+        for parts in (1, 2, 5):
+            documents = self.split(parts)
+            self.assertEqual(len(documents), parts)
+            chain = OsmDocumentChain(documents)
+            self.assertIsInstance(chain, io.IOBase)
+            self.assertEqual(
+                osm_object_contributions(chain, 'amenity'), expected)
+            chain.close()
+            self.assertTrue(all(document.closed for document in documents))
+
+    def test_empty_documents(self):
+        chain = OsmDocumentChain([
+            io.BytesIO(b'<?xml version="1.0"?>\n<osm version="0.6"/>'),
+            io.BytesIO(b''),
+            io.BytesIO(b'<osm><node id="1"/></osm>')])
+        self.assertEqual(
+            chain.read(),
+            b'<?xml version="1.0"?>\n<osm version="0.6"><node id="1"/>'
+            b'</osm>\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+# coding=utf-8
+"""Test cases for the index of cached Overpass responses.
+:license: GPLv3, see LICENSE for more details.
+"""
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from reporter.overpass_cache import (
+    OverpassCache,
+    GZIP_MAGIC,
+    open_cached_file
+)
+from reporter.test.helpers import FIXTURE_PATH
+from reporter.utilities import osm_object_contributions
+
+
+class OverpassCacheTestCase(unittest.TestCase):
+    """Test overpass cache index."""
+
+    def setUp(self):
+        """Constructor."""
+        self.folder = tempfile.mkdtemp()
+        self.cache = OverpassCache(
+            os.path.join(self.folder, 'index.sqlite3'),
+            max_size=25,
+            default_ttl=60,
+            access_resolution=0)
+
+    def tearDown(self):
+        """Destructor."""
+        shutil.rmtree(self.folder)
+
+    def write(self, name, size=10):
+        file_path = os.path.join(self.folder, name)
+        with open(file_path, 'w') as _file:
+            _file.write('x' * size)
+        return file_path
+
+    def test_put(self):
+        file_path = self.write('first.osm')
+        self.assertIsNone(self.cache.get(file_path + '.missing'))
+
+        entry = self.cache.put(
+            file_path, query='node;out;', endpoint='http://overpass',
+            fetch_duration=1.5, ttl=120)
+        self.assertEqual(entry.size, 10)
+        self.assertEqual(entry.query, 'node;out;')
+        self.assertEqual(entry.ttl, 120)
+        self.assertTrue(entry.is_fresh())
+        self.assertFalse(entry.is_fresh(time.time() + 121))
+
+    def test_legacy_file_is_stale(self):
+        file_path = self.write('legacy.osm')
+        entry = self.cache.get(file_path)
+        self.assertEqual(entry.size, 10)
+        self.assertFalse(entry.is_fresh())
+
+    def test_least_recently_used_is_evicted(self):
+        first = self.write('first.osm')
+        second = self.write('second.osm')
+        third = self.write('third.osm')
+        self.cache.put(first)
+        self.cache.put(second)
+        self.cache.get(first)
+        self.cache.put(third)
+
+        self.assertFalse(os.path.exists(second))
+        self.assertIsNone(self.cache.get(second))
+        self.assertTrue(os.path.exists(first))
+        self.assertTrue(os.path.exists(third))
+        self.assertEqual(self.cache.total_size(), 20)
+
+    def test_access_is_recorded_coarsely(self):
+        file_path = self.write('first.osm')
+        cache = OverpassCache(
+            os.path.join(self.folder, 'index.sqlite3'),
+            access_resolution=60)
+        last_access = cache.put(file_path).last_access
+        self.assertEqual(cache.get(file_path).last_access, last_access)
+        self.assertEqual(cache.entries()[0].last_access, last_access)
+
+        time.sleep(0.01)
+        cache.access_resolution = 0
+        self.assertGreater(cache.get(file_path).last_access, last_access)
+        self.assertGreater(cache.entries()[0].last_access, last_access)
+
+    def test_files_of_cache_folder_are_adopted(self):
+        names = ['%s.osm' % (character * 32) for character in 'abc']
+        for index, name in enumerate(names):
+            os.utime(self.write(name), (1000 + index, 1000 + index))
+        other = self.write('notes.txt', 100)
+        cache = OverpassCache(
+            os.path.join(self.folder, 'index.sqlite3'),
+            max_size=25,
+            cache_folder=self.folder)
+        self.assertEqual(cache.total_size(), 20)
+        self.assertEqual(
+            sorted(os.path.basename(entry.path)
+                   for entry in cache.entries()),
+            names[1:])
+        self.assertFalse(cache.entries()[0].is_fresh())
+        self.assertFalse(os.path.exists(os.path.join(self.folder, names[0])))
+        self.assertTrue(os.path.exists(other))
+        self.assertEqual(cache.scan(), 0)
+
+    def test_deleted_file_is_removed(self):
+        file_path = self.write('first.osm')
+        self.cache.put(file_path)
+        os.remove(file_path)
+        self.assertIsNone(self.cache.get(file_path))
+        self.assertEqual(self.cache.entries(), [])
+
+    def test_compressed_entry(self):
+        cache = OverpassCache(os.path.join(self.folder, 'index.sqlite3'))
+        file_path = os.path.join(self.folder, 'swellendam.osm')
+        shutil.copyfile(FIXTURE_PATH, file_path)
+        with open_cached_file(file_path) as osm_file:
+            expected = osm_object_contributions(osm_file, 'building')
+
+        entry = cache.put(file_path, compression='gzip')
+        self.assertEqual(entry.compression, 'gzip')
+        self.assertLess(entry.size, os.path.getsize(FIXTURE_PATH))
+        with open(file_path, 'rb') as _file:
+            self.assertEqual(_file.read(2), GZIP_MAGIC)
+
+        with open_cached_file(file_path) as osm_file:
+            self.assertEqual(
+                osm_object_contributions(osm_file, 'building'), expected)
+
+        cache.put(file_path, compression='gzip')
+        with open_cached_file(file_path) as osm_file, \
+                open(FIXTURE_PATH, 'rb') as fixture:
+            self.assertEqual(osm_file.read(), fixture.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+# coding=utf-8
+"""Test cases for the pool of Overpass endpoints.
+:license: GPLv3, see LICENSE for more details.
+"""
+import time
+import unittest
+
+from reporter.exceptions import OverpassTimeoutException
+from reporter.overpass_endpoints import (
+    ATTIC,
+    CURRENT,
+    EndpointPool,
+    query_capability
+)
+from reporter.refresh_pool import EndpointLimiter
+
+MIRROR = 'http://mirror/api/interpreter'
+PUBLIC = 'http://public/api/interpreter'
+ATTIC_SERVER = 'http://attic/api/interpreter'
+
+
+class EndpointPoolTestCase(unittest.TestCase):
+    """Test endpoint pool."""
+
+    def setUp(self):
+        """Constructor."""
+        self.limiter = EndpointLimiter(backoff=10, max_backoff=10)
+        self.pool = EndpointPool(
+            limiter=self.limiter,
+            failure_threshold=2,
+            reset_timeout=0.1,
+            error_penalty=60)
+        self.pool.add(MIRROR)
+        self.pool.add(PUBLIC, (CURRENT,))
+        self.pool.add(ATTIC_SERVER, (ATTIC,))
+        self.pool.add(PUBLIC, (ATTIC,))
+
+    def test_query_capability(self):
+        self.assertEqual(query_capability('(way["a"];);out;'), CURRENT)
+        self.assertEqual(
+            query_capability('[adiff:"2017-01-01T00:00:00Z"];(way;);out;'),
+            ATTIC)
+
+    def test_route_by_capability_and_latency(self):
+        self.assertEqual(self.pool.candidates(CURRENT), [MIRROR, PUBLIC])
+        self.assertEqual(self.pool.candidates(ATTIC), [PUBLIC, ATTIC_SERVER])
+        self.pool.record(MIRROR, 2)
+        self.pool.record(PUBLIC, 1)
+        self.assertEqual(self.pool.route(CURRENT), PUBLIC)
+        self.pool.record(PUBLIC, error=OverpassTimeoutException())
+        self.assertEqual(self.pool.route(CURRENT), MIRROR)
+        with self.assertRaises(ValueError):
+            self.pool.route('other')
+
+    def test_failover(self):
+        self.assertEqual(
+            self.pool.failover(ATTIC_SERVER, '[diff:"a","b"];(way;);out;'),
+            [ATTIC_SERVER, PUBLIC])
+        self.assertEqual(
+            self.pool.failover(MIRROR, '(way;);out;'), [MIRROR, PUBLIC])
+        self.assertEqual(
+            self.pool.failover('http://other', '(way;);out;'),
+            ['http://other'])
+
+        self.limiter.acquire('http://public')
+        self.limiter.release('http://public', throttled=True)
+        self.assertEqual(self.pool.failover(MIRROR, '(way;);out;'), [MIRROR])
+        self.assertEqual(self.pool.candidates(CURRENT), [MIRROR, PUBLIC])
+
+    def test_circuit_breaker(self):
+        error = OverpassTimeoutException()
+        self.pool.record(MIRROR, error=error)
+        self.assertEqual(self.pool.stats()[0]['state'], 'closed')
+        self.pool.record(MIRROR, error=error)
+        stats = self.pool.stats()[0]
+        self.assertEqual(stats['state'], 'open')
+        self.assertFalse(stats['available'])
+        self.assertEqual(stats['error_rate'], 1)
+        self.assertEqual(stats['last_error'], 'OverpassTimeoutException')
+        self.assertEqual(self.pool.route(CURRENT), PUBLIC)
+
+        time.sleep(0.1)
+        self.assertEqual(self.pool.route(CURRENT), PUBLIC)
+        self.assertEqual(self.pool.stats()[0]['state'], 'half_open')
+        self.pool.record(MIRROR, error=error)
+        self.assertEqual(self.pool.stats()[0]['state'], 'open')
+
+        time.sleep(0.1)
+        self.pool.record(MIRROR, 0.5)
+        stats = self.pool.stats()[0]
+        self.assertEqual(stats['state'], 'closed')
+        self.assertEqual(stats['latency'], 0.5)
+        self.assertEqual(stats['requests'], 4)
+        self.assertEqual(stats['errors'], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
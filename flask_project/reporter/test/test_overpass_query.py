@@ -0,0 +1,82 @@
+# coding=utf-8
+"""Test cases for the canonical Overpass query.
+:license: GPLv3, see LICENSE for more details.
+"""
+import os
+import unittest
+
+from reporter import config
+from reporter.overpass_query import OverpassQuery, format_coordinate
+
+
+class OverpassQueryTestCase(unittest.TestCase):
+    """Test Overpass query."""
+
+    def test_format_coordinate(self):
+        self.assertEqual(format_coordinate(-25.775160586803431), '-25.7751606')
+        self.assertEqual(format_coordinate('28.50'), '28.5')
+        self.assertEqual(format_coordinate(-0.00000001), '0')
+
+    def test_equivalent_queries(self):
+        query = OverpassQuery.feature(
+            'amenity', ['school', 'hospital'],
+            polygon=[[-25.7751605868, 28.0151367187],
+                     [-25.5672203880, 28.8555908203],
+                     [-26.3426528093, 29.1687011718]],
+            verbosity='skeleton')
+        same_query = OverpassQuery.feature(
+            'amenity', ['hospital', 'school', 'school'],
+            element_types=('relation', 'way', 'node'),
+            polygon='-25.77516058 28.01513672 -25.56722039 28.85559082 '
+                    '-26.34265281 29.16870117',
+            verbosity='skel')
+        self.assertEqual(query, same_query)
+        self.assertEqual(hash(query), hash(same_query))
+        self.assertEqual(
+            str(query),
+            '(node["amenity"~"hospital|school"](poly:"-25.7751606 28.0151367 '
+            '-25.5672204 28.8555908 -26.3426528 29.1687012");'
+            'relation["amenity"~"hospital|school"](poly:"-25.7751606 '
+            '28.0151367 -25.5672204 28.8555908 -26.3426528 29.1687012");'
+            'way["amenity"~"hospital|school"](poly:"-25.7751606 28.0151367 '
+            '-25.5672204 28.8555908 -26.3426528 29.1687012"););'
+            '(._;>;);out skel;')
+        self.assertNotEqual(
+            query, OverpassQuery.feature(
+                'amenity', ['school'], polygon=query.polygon))
+
+    def test_time_window_and_ids(self):
+        query = OverpassQuery(
+            element_ids={'way': ['12', 3, '12'], 'node': []},
+            recurse=False,
+            date_from='1262304000000.5',
+            date_to=1577836800000,
+            augmented=True,
+            verbosity='meta',
+            response_format='json')
+        self.assertEqual(
+            str(query),
+            '[out:json][adiff:"2010-01-01T00:00:00Z","2020-01-01T00:00:00Z"];'
+            '(way(id:3,12););out meta;')
+
+        invalid_dates = OverpassQuery(
+            element_ids={'node': [1]}, date_from='x', date_to='y')
+        self.assertEqual(str(invalid_dates), '(node(id:1););(._;>;);out body;')
+
+    def test_cache_path(self):
+        query = OverpassQuery.feature('building', bbox=(1, 2, 3.00000001, 4))
+        self.assertEqual(
+            str(query),
+            '(node["building"](1,2,3,4);relation["building"](1,2,3,4);'
+            'way["building"](1,2,3,4););(._;>;);out body;')
+        self.assertEqual(
+            query.cache_path('_josm.osm'),
+            os.path.join(config.CACHE_DIR, query.cache_name('_josm.osm')))
+        self.assertTrue(query.cache_name().endswith('.osm'))
+        self.assertNotEqual(
+            query.cache_name(),
+            OverpassQuery.feature('building', bbox=(1, 2, 3, 5)).cache_name())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+# coding=utf-8
+"""Test cases for the local stand-in of an Overpass server.
+:license: GPLv3, see LICENSE for more details.
+"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from reporter.exceptions import (
+    OverpassBadRequestException,
+    OverpassConcurrentRequestException,
+    OverpassTimeoutException
+)
+from reporter.http_client import HttpClient
+from reporter.osm import fetch_osm, fetch_osm_with_post
+from reporter.overpass_query import OverpassQuery
+from reporter.overpass_stand_in import OverpassStandIn, parse_query
+from reporter.test.helpers import FIXTURE_PATH
+from reporter.utilities import osm_object_contributions
+
+BBOX = (-7.1, 110.3, -6.9, 110.5)
+
+
+class OverpassStandInTestCase(unittest.TestCase):
+    """Test Overpass stand-in."""
+
+    def setUp(self):
+        """Constructor."""
+        self.folder = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.folder, 'response.osm')
+        self.stand_in = OverpassStandIn(FIXTURE_PATH).start()
+
+    def tearDown(self):
+        """Destructor."""
+        self.stand_in.stop()
+        shutil.rmtree(self.folder)
+
+    def fetch(self, query):
+        fetch_osm_with_post(
+            self.file_path,
+            self.stand_in.url,
+            str(query),
+            returns_format=query.response_format)
+        with open(self.file_path, 'rb') as osm_file:
+            if query.response_format == 'json':
+                return json.load(osm_file)
+            return osm_file.read()
+
+    def test_parse_query(self):
+        query = parse_query(
+            '[out:json][adiff:"2010-01-01T00:00:00Z","2020-01-01T00:00:00Z"];'
+            '(way["amenity"~"hospital|school"](poly:"1 2 1 3 2 3");'
+            'node(id:1,2););(._;>;);out meta;')
+        self.assertEqual(query['response_format'], 'json')
+        self.assertEqual(query['time_window'], (1262304000, 1577836800))
+        self.assertTrue(query['augmented'])
+        self.assertTrue(query['recurse'])
+        self.assertEqual(query['verbosity'], 'meta')
+        self.assertEqual(
+            query['statements'][0]['filters'],
+            [('amenity', '~', 'hospital|school')])
+        self.assertEqual(query['statements'][1]['ids'], {1, 2})
+        with self.assertRaises(ValueError):
+            parse_query('(way["a"](around:10,1,2););out;')
+
+    def test_feature_query(self):
+        query = OverpassQuery.feature(
+            'amenity', ['hospital'], bbox=BBOX, verbosity='meta',
+            response_format='json')
+        elements = self.fetch(query)['elements']
+        hospitals = [
+            element for element in elements if 'tags' in element]
+        self.assertTrue(hospitals)
+        self.assertTrue(all(
+            element['tags']['amenity'] == 'hospital'
+            for element in hospitals))
+        way = next(
+            element for element in elements if element['type'] == 'way')
+        node_ids = set(
+            element['id'] for element in elements
+            if element['type'] == 'node')
+        # nodes of ways are recursed to, as far as extract has them
+        self.assertEqual(
+            set(way['nodes']) & set(
+                key[1] for key in self.stand_in.extract.elements
+                if key[0] == 'node'),
+            set(way['nodes']) & node_ids)
+        self.assertIn(3461892578, node_ids)
+        self.assertEqual(self.stand_in.queries, [str(query)])
+
+        outside = OverpassQuery.feature(
+            'amenity', bbox=(0, 0, 1, 1), response_format='json')
+        self.assertEqual(self.fetch(outside)['elements'], [])
+
+    def test_attic_query(self):
+        query = OverpassQuery(
+            element_ids={'node': [1883564943], 'way': [155565070]},
+            date_from=1262304000000,
+            date_to=1577836800000,
+            augmented=True,
+            verbosity='meta')
+        document = self.fetch(query)
+        self.assertEqual(document.count(b'<action'), 2)
+        with open(self.file_path, 'rb') as osm_file:
+            contributions = osm_object_contributions(
+                osm_file, 'amenity', 1262304000000, 1577836800000)
+        self.assertEqual(
+            [(record['name'], record['ways']) for record in contributions
+             if record['ways']],
+            [('Hanif Al Husaini', 1)])
+
+        fetch_osm(
+            self.file_path,
+            self.stand_in.url + '?data=' + str(OverpassQuery.feature(
+                'amenity', bbox=BBOX)))
+        self.assertTrue(os.path.exists(self.file_path))
+
+    def test_misbehaviour(self):
+        query = OverpassQuery.feature(
+            'amenity', bbox=BBOX, response_format='json')
+        self.stand_in.busy_rate = 1
+        with self.assertRaises(OverpassConcurrentRequestException):
+            self.fetch(query)
+        self.stand_in.busy_rate = 0
+        self.stand_in.timeout_rate = 1
+        with self.assertRaises(OverpassTimeoutException):
+            self.fetch(query)
+        self.assertEqual(
+            (self.stand_in.busy_answers, self.stand_in.timeouts), (1, 1))
+        with self.assertRaises(OverpassBadRequestException):
+            fetch_osm_with_post(
+                self.file_path, self.stand_in.url, '(way[a];);out;')
+        self.assertFalse(os.path.exists(self.file_path))
+
+    def test_error_response_is_released(self):
+        client = HttpClient(pool_maxsize=1, retries=0)
+        query = OverpassQuery.feature(
+            'amenity', bbox=BBOX, response_format='json')
+        try:
+            with mock.patch('reporter.osm.http_client', client):
+                self.stand_in.busy_rate = 1
+                for _ in range(3):
+                    with self.assertRaises(
+                            OverpassConcurrentRequestException):
+                        self.fetch(query)
+                self.stand_in.busy_rate = 0
+                self.assertTrue(self.fetch(query)['elements'])
+        finally:
+            client.session.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+# coding=utf-8
+"""Test cases for grid tiles of Overpass queries.
+:license: GPLv3, see LICENSE for more details.
+"""
+import unittest
+
+from reporter.overpass_tiles import (
+    polygon_from_overpass,
+    grid_tiles,
+    merge_tile_elements
+)
+
+
+class OverpassTilesTestCase(unittest.TestCase):
+    """Test grid tiles."""
+
+    def test_grid_tiles(self):
+        shape = polygon_from_overpass('0.1 0.1 0.1 0.6 0.4 0.1')
+        self.assertEqual(shape.bounds, (0.1, 0.1, 0.6, 0.4))
+        self.assertEqual(grid_tiles(shape, 0.25), [
+            (0.0, 0.0, 0.25, 0.25),
+            (0.0, 0.25, 0.25, 0.5),
+            (0.0, 0.5, 0.25, 0.75),
+            (0.25, 0.0, 0.5, 0.25),
+            (0.25, 0.25, 0.5, 0.5),
+        ])
+        moved = polygon_from_overpass(
+            [[0.1000001, 0.1], [0.1, 0.6], [0.4, 0.1]])
+        self.assertEqual(grid_tiles(moved, 0.25), grid_tiles(shape, 0.25))
+
+    def test_merge_tile_elements(self):
+        shape = polygon_from_overpass('0 0 0 1 1 1 1 0')
+        inside = {'type': 'node', 'id': 1, 'lat': 0.5, 'lon': 0.5}
+        outside = {'type': 'node', 'id': 2, 'lat': 2, 'lon': 2}
+        far = {'type': 'node', 'id': 3, 'lat': 3, 'lon': 3}
+        way = {'type': 'way', 'id': 1, 'nodes': [1, 2]}
+        far_way = {'type': 'way', 'id': 2, 'nodes': [3]}
+        relation = {'type': 'relation', 'id': 1, 'members': [
+            {'type': 'way', 'ref': 1}, {'type': 'way', 'ref': 2}]}
+        first = (inside, outside, way, relation)
+        second = (outside, far, way, far_way, relation)
+        self.assertEqual(
+            merge_tile_elements([first, second], shape),
+            [inside, outside, way, relation, far, far_way])
+        self.assertEqual(merge_tile_elements([(far, far_way)], shape), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+# coding=utf-8
+"""Test cases for the cache of parsed Overpass documents.
+:license: GPLv3, see LICENSE for more details.
+"""
+import copy
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from reporter.overpass_cache import compress_file
+from reporter.parsed_document_cache import (
+    FROZEN_SIZE_FACTOR,
+    ParsedDocumentCache
+)
+
+
+class ParsedDocumentCacheTestCase(unittest.TestCase):
+    """Test parsed document cache."""
+
+    def setUp(self):
+        """Constructor."""
+        self.folder = tempfile.mkdtemp()
+        self.cache = ParsedDocumentCache(max_size=800)
+
+    def tearDown(self):
+        """Destructor."""
+        shutil.rmtree(self.folder)
+
+    def write(self, name, elements):
+        file_path = os.path.join(self.folder, name)
+        with open(file_path, 'w') as _file:
+            json.dump({'elements': elements}, _file)
+        return file_path
+
+    def test_document_is_shared_and_read_only(self):
+        file_path = self.write(
+            'a.osm', [{'type': 'node', 'id': 1, 'tags': {'name': 'A'}}])
+        document = self.cache.load(file_path)
+        self.assertIs(self.cache.load(file_path), document)
+        self.assertEqual(json.loads(json.dumps(document))['elements'][0], {
+            'type': 'node', 'id': 1, 'tags': {'name': 'A'}})
+
+        element = document['elements'][0]
+        with self.assertRaises(TypeError):
+            element['error'] = 'True'
+        with self.assertRaises(TypeError):
+            element['tags'].update({'name': 'B'})
+        changed = dict(element)
+        changed['error'] = 'True'
+        copy.deepcopy(document)['elements'][0]['tags']['name'] = 'B'
+        self.assertEqual(element['tags'], {'name': 'A'})
+
+    def test_changed_file_is_parsed_again(self):
+        file_path = self.write('a.osm', [{'type': 'node', 'id': 1}])
+        document = self.cache.load(file_path)
+        self.write('a.osm', [{'type': 'node', 'id': 1}, {'type': 'way'}])
+        self.assertEqual(len(self.cache.load(file_path)['elements']), 2)
+        self.assertIsNot(self.cache.load(file_path), document)
+        self.assertEqual(len(self.cache._documents), 1)
+
+        compress_file(file_path, 'gzip')
+        self.assertEqual(len(self.cache.load(file_path)['elements']), 2)
+
+    def test_least_recently_used_document_is_dropped(self):
+        first = self.write('a.osm', [{'type': 'node', 'id': 1}] * 2)
+        second = self.write('b.osm', [{'type': 'node', 'id': 2}] * 2)
+        third = self.write('c.osm', [{'type': 'node', 'id': 3}] * 2)
+        first_document = self.cache.load(first)
+        self.cache.load(second)
+        self.cache.load(first)
+        self.cache.load(third)
+        self.assertLessEqual(self.cache.total_size, self.cache.max_size)
+        self.assertIs(self.cache.load(first), first_document)
+        self.assertEqual(list(self.cache._documents), [third, first])
+        self.assertEqual(
+            self.cache.total_size,
+            (os.path.getsize(first) + os.path.getsize(third)) *
+            FROZEN_SIZE_FACTOR)
+
+        large = self.write('d.osm', [{'type': 'node', 'id': 4}] * 20)
+        self.assertEqual(len(self.cache.load(large)['elements']), 20)
+        self.assertNotIn(large, self.cache._documents)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+# coding=utf-8
+"""Test cases for the pool that refreshes cached documents.
+:license: GPLv3, see LICENSE for more details.
+"""
+import threading
+import time
+import unittest
+
+from reporter.exceptions import OverpassConcurrentRequestException
+from reporter.refresh_pool import EndpointLimiter, RefreshPool, endpoint_of
+
+
+class RefreshPoolTestCase(unittest.TestCase):
+    """Test refresh pool."""
+
+    def setUp(self):
+        """Constructor."""
+        self.limiter = EndpointLimiter(
+            concurrency=1, backoff=0.05, max_backoff=0.1)
+        self.pool = RefreshPool(self.limiter, workers=1)
+        self.calls = []
+        self.release = threading.Event()
+
+    def tearDown(self):
+        """Destructor."""
+        self.release.set()
+
+    def refresh(self, key):
+        self.calls.append(key)
+        self.release.wait(10)
+        return key
+
+    def test_endpoint_of(self):
+        self.assertEqual(
+            endpoint_of('http://overpass-api.de/api/interpreter?data=x'),
+            'http://overpass-api.de')
+
+    def test_tasks_are_deduplicated_and_prioritised(self):
+        endpoint = 'http://overpass'
+        first = self.pool.submit('first', endpoint, self.refresh, 'first')
+        while not self.calls:
+            time.sleep(0.01)
+        self.assertIs(
+            self.pool.submit('first', endpoint, self.refresh, 'first'),
+            first)
+
+        self.pool.submit('low', endpoint, self.refresh, 'low')
+        self.pool.record_view('viewed')
+        viewed = self.pool.submit(
+            'viewed', endpoint, self.refresh, 'viewed', priority=0.5)
+        self.pool.submit(
+            'active', endpoint, self.refresh, 'active', priority=10)
+        self.assertIs(
+            self.pool.submit('viewed', endpoint, self.refresh, 'viewed'),
+            viewed)
+        self.assertEqual(self.pool.queue_depth, 3)
+
+        self.release.set()
+        self.assertEqual(first.result(10), 'first')
+        viewed.result(10)
+        while len(self.calls) < 4:
+            time.sleep(0.01)
+        self.assertEqual(self.calls, ['first', 'active', 'viewed', 'low'])
+
+    def test_old_views_are_forgotten(self):
+        pool = RefreshPool(self.limiter, view_half_life=0.01)
+        pool.record_view('old')
+        time.sleep(0.1)
+        pool.record_view('new')
+        self.assertEqual(list(pool._views), ['new'])
+        self.assertEqual(pool.view_score('old'), 0)
+
+    def test_busy_endpoint_backs_off(self):
+        self.release.set()
+        answers = [OverpassConcurrentRequestException, 'done']
+
+        def refresh():
+            answer = answers.pop(0)
+            if answer is OverpassConcurrentRequestException:
+                raise answer
+            return answer
+
+        future = self.pool.submit('first', 'http://overpass', refresh)
+        self.assertEqual(future.result(10), 'done')
+        self.assertGreater(self.limiter.backoff_until('http://overpass'), 0)
+
+    def test_endpoint_slot(self):
+        self.assertTrue(self.limiter.acquire('http://overpass'))
+        self.assertFalse(self.limiter.acquire('http://overpass', timeout=0))
+        self.assertTrue(self.limiter.acquire('http://other', timeout=0))
+        self.limiter.release('http://overpass')
+        with self.limiter.slot('http://overpass', timeout=0):
+            self.assertFalse(
+                self.limiter.acquire('http://overpass', timeout=0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+# coding=utf-8
+"""Test cases for single-flight coalescing of calls.
+:license: GPLv3, see LICENSE for more details.
+"""
+import threading
+import time
+import unittest
+from concurrent import futures
+
+from reporter.single_flight import SingleFlight
+
+
+class SingleFlightTestCase(unittest.TestCase):
+    """Test single-flight calls."""
+
+    def setUp(self):
+        """Constructor."""
+        self.flight = SingleFlight()
+        self.calls = []
+        self.release = threading.Event()
+
+    def fetch(self, value):
+        self.calls.append(value)
+        self.release.wait(10)
+        return value
+
+    def start_leader(self):
+        results = []
+        thread = threading.Thread(target=lambda: results.append(
+            self.flight.do('query', self.fetch, 'first')))
+        thread.start()
+        while not self.calls:
+            time.sleep(0.001)
+        return thread, results
+
+    def test_concurrent_calls_are_coalesced(self):
+        results = []
+        leader, leader_results = self.start_leader()
+        threads = [
+            threading.Thread(target=lambda: results.append(
+                self.flight.do('query', self.fetch, 'second', timeout=10)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        leader.join()
+
+        self.assertEqual(leader_results, ['first'])
+        self.assertEqual(results, ['first'] * 5)
+        self.assertEqual(self.calls, ['first'])
+        self.assertFalse(self.flight.in_flight('query'))
+
+        self.assertEqual(self.flight.do('query', self.fetch, 'third'), 'third')
+
+    def test_waiting_times_out(self):
+        leader, _ = self.start_leader()
+        self.assertRaises(
+            futures.TimeoutError,
+            self.flight.do, 'query', self.fetch, 'second', timeout=0.01)
+        self.release.set()
+        leader.join()
+
+    def test_exception_is_shared(self):
+        def fail():
+            raise ValueError('bad query')
+
+        self.assertRaises(ValueError, self.flight.do, 'query', fail)
+        self.assertFalse(self.flight.in_flight('query'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,13 +8,14 @@ import sys
 import getpass
 from tempfile import mkstemp
 import xml
+import calendar
 import time
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta
 import zipfile
 
 from reporter import config
 from reporter.osm_node_parser import OsmNodeParser
-from reporter.osm_way_parser import OsmParser
+from reporter.osm_way_parser import OsmParser, OsmElementParser
 from reporter.queries import RESOURCES_MAP
 from reporter import LOGGER
 
@@ -188,10 +189,68 @@ def osm_object_contributions(
         LOGGER.exception('Failed to parse OSM xml.')
         raise
 
-    way_count_dict = parser.wayCountDict
-    node_count_dict = parser.nodeCountDict
-    timelines = parser.userDayCountDict
+    return contribution_records(
+        parser.wayCountDict,
+        parser.nodeCountDict,
+        parser.userDayCountDict)
 
+
+def osm_element_contributions(
+        osm_file,
+        tag_name,
+        date_start=None,
+        date_end=None):
+    """Collect newest version of ways and nodes of an osm diff document.
+
+    :param osm_file: A file object reading from a .osm file.
+    :type osm_file: file, FileIO
+
+    :param tag_name: The tag name we want to filter on.
+    :type tag_name: str
+
+    :param date_start: The start date we want to filter
+    :type date_start: float
+
+    :param date_end: The end date we want to filter
+    :type date_end: float
+
+    :returns: Versions as {(type, id): (user, date, found)}, None for
+        versions out of date range, and osm base time of document in
+        milliseconds, None when document has no osm base.
+    :rtype: tuple
+    """
+    parser = OsmElementParser(
+            tag_name=tag_name,
+            start_date=date_start,
+            end_date=date_end)
+    try:
+        xml.sax.parse(osm_file, parser)
+    except xml.sax.SAXParseException:
+        LOGGER.exception('Failed to parse OSM xml.')
+        raise
+
+    osm_base = None
+    if parser.osmBase:
+        osm_base = calendar.timegm(datetime.strptime(
+            parser.osmBase, '%Y-%m-%dT%H:%M:%SZ').timetuple()) * 1000
+    return parser.elements, osm_base
+
+
+def contribution_records(way_count_dict, node_count_dict, timelines):
+    """Compile sorted summary of user contributions from their counts.
+
+    :param way_count_dict: number of ways per user
+    :type way_count_dict: dict
+
+    :param node_count_dict: number of nodes per user
+    :type node_count_dict: dict
+
+    :param timelines: number of edits per date per user
+    :type timelines: dict
+
+    :returns: A list of dicts, see `osm_object_contributions`
+    :rtype: list
+    """
     # Convert to a list of dicts so we can sort it.
     crew_list = config.CREW
     user_list = []